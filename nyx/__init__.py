@@ -26,6 +26,7 @@ __all__ = [
   'arguments',
   'controller',
   'curses',
+  'history',
   'log',
   'menu',
   'panel',
@@ -65,12 +65,13 @@ def show_message(message = None, *attr, **kwargs):
   return get_controller().header_panel().show_message(message, *attr, **kwargs)
 
 
-def input_prompt(msg, initial_value = ''):
+def input_prompt(msg, initial_value = '', on_change = None):
   """
   Prompts the user for input.
 
   :param str message: prompt for user input
   :param str initial_value: initial value of the prompt
+  :param function on_change: called with the input each time it's edited
 
   :returns: **str** with the user input, this is **None** if the prompt is
     canceled
@@ -79,7 +80,7 @@ def input_prompt(msg, initial_value = ''):
   header_panel = get_controller().header_panel()
 
   header_panel.show_message(msg)
-  user_input = nyx.curses.str_input(len(msg), header_panel.get_height() - 1, initial_value)
+  user_input = nyx.curses.str_input(len(msg), header_panel.get_height() - 1, initial_value, on_change)
   header_panel.show_message()
 
   return user_input
@@ -34,7 +34,8 @@ if we want Windows support in the future too.
     |- addstr_wrap - draws a string with line wrapping
     |- box - draws box with the given dimensions
     |- hline - draws a horizontal line
-    +- vline - draws a vertical line
+    |- vline - draws a vertical line
+    +- vfill - draws a vertical run of a character
 
   KeyInput - user keyboard input
     |- match - checks if this matches the given inputs
@@ -43,6 +44,7 @@ if we want Windows support in the future too.
 
   Scroller - scrolls content with keyboard navigation
     |- location - present scroll location
+    |- scroll_to - moves to a given location
     +- handle_key - moves scroll based on user input
 
   CursorScroller - scrolls content with a cursor for selecting items
@@ -131,6 +133,8 @@ CURSES_ATTRIBUTES = {
 
 DEFAULT_COLOR_ATTR = dict([(color, 0) for color in Color])
 COLOR_ATTR = None
+ENCODED_ATTR = {}  # (color override, attributes) => curses_attr() encoding
+WIDE_CHARACTERS_SUPPORTED = None
 
 SCROLL_KEYS = (curses.KEY_UP, curses.KEY_DOWN, curses.KEY_PPAGE, curses.KEY_NPAGE, curses.KEY_HOME, curses.KEY_END)
 
@@ -244,7 +248,7 @@ def key_input(input_timeout = None):
   return KeyInput(CURSES_SCREEN.getch())
 
 
-def str_input(x, y, initial_text = ''):
+def str_input(x, y, initial_text = '', on_change = None):
   """
   Provides a text field where the user can input a string, blocking until
   they've done so and returning the result. If the user presses escape then
@@ -257,6 +261,7 @@ def str_input(x, y, initial_text = ''):
   :param int x: horizontal location
   :param int y: vertical location
   :param str initial_text: initial input of the field
+  :param function on_change: called with our input each time it's edited
 
   :returns: **str** with the user input or **None** if the prompt is caneled
   """
@@ -281,6 +286,16 @@ def str_input(x, y, initial_text = ''):
       # (otherwise the input field is filled with nonprintable characters)
 
       return curses.ascii.BEL
+    elif on_change and key not in (curses.ascii.NL, curses.ascii.CR, curses.ascii.BEL, curses.KEY_ENTER):
+      # apply the keystroke ourselves so we can report the resulting input
+
+      textbox.do_command(key)
+      y, x = textbox.win.getyx()
+      on_change(textbox.gather().strip())
+      textbox.win.move(y, x)  # reverts cursor movement during gather call
+      textbox.win.refresh()
+
+      return 0  # already handled
     else:
       return key
 
@@ -319,17 +334,23 @@ def curses_attr(*attributes):
   :returns: **int** that can be used with curses
   """
 
+  override = get_color_override()
+  encoded = ENCODED_ATTR.get((override, attributes))
+
+  if encoded is not None:
+    return encoded
+
   encoded = curses.A_NORMAL
 
   for attr in attributes:
     if attr in Color:
-      override = get_color_override()
       encoded |= _color_attr()[override if override else attr]
     elif attr in Attr:
       encoded |= CURSES_ATTRIBUTES[attr]
     else:
       raise ValueError("'%s' isn't a valid curses text attribute" % attr)
 
+  ENCODED_ATTR[(override, attributes)] = encoded
   return encoded
 
 
@@ -469,6 +490,20 @@ def is_wide_characters_supported():
     **False** if it either can't or this can't be determined
   """
 
+  global WIDE_CHARACTERS_SUPPORTED
+
+  if WIDE_CHARACTERS_SUPPORTED is None:
+    WIDE_CHARACTERS_SUPPORTED = _is_wide_characters_supported()
+
+  return WIDE_CHARACTERS_SUPPORTED
+
+
+def _is_wide_characters_supported():
+  """
+  Checks our curses library for wide character support. This runs ldd or otool
+  so we only do this once.
+  """
+
   try:
     # Gets the dynamic library used by the interpretor for curses. This uses
     # 'ldd' on Linux or 'otool -L' on OSX.
@@ -717,6 +752,24 @@ class _Subwindow(object):
       except:
         pass
 
+  def vfill(self, x, y, length, char, *attr):
+    """
+    Draws a vertical run of a character. This is a single curses call, so it's
+    far cheaper than drawing each cell with :func:`~nyx.curses._Subwindow.addstr`.
+
+    :param int x: horizontal location
+    :param int y: vertical location of the top of the run
+    :param int length: number of cells to fill
+    :param str char: character to fill them with
+    :param list attr: text attributes to apply
+    """
+
+    if self.width > x and self.height > y and length > 0:
+      try:
+        self._curses_subwindow.vline(y, x, ord(char) | curses_attr(*attr), min(length, self.height - y))
+      except curses.error:
+        pass
+
 
 class KeyInput(object):
   """
@@ -796,6 +849,16 @@ class Scroller(object):
 
     return self._location
 
+  def scroll_to(self, location):
+    """
+    Moves to the given position. This is kept within a valid range the next
+    time our location is requested with the content and page height.
+
+    :param int location: position to scroll to
+    """
+
+    self._location = max(0, location)
+
   def handle_key(self, key, content_height, page_height):
     """
     Moves scrolling location according to the given input...
@@ -824,9 +887,18 @@ class Scroller(object):
 class CursorScroller(object):
   """
   Scroller that tracks a cursor's position.
+
+  By default content is copied and searched for our selection each time it's
+  provided. Large content can instead provide its own index() method that
+  finds items in constant time, raising a **ValueError** if it lacks them,
+  and be responsible for not changing while we use it.
+
+  :param bool indexed: content can locate items itself, so don't copy or
+    search it
   """
 
-  def __init__(self):
+  def __init__(self, indexed = False):
+    self._indexed = indexed
     self._location = 0
 
     # We track the cursor location by the item we have selected, so it stays
@@ -852,16 +924,19 @@ class CursorScroller(object):
       **None** if content is empty
     """
 
-    content = list(content)  # shallow copy for thread safety
+    if not self._indexed:
+      content = list(content)  # shallow copy for thread safety
 
     if not content:
       self._cursor_location = 0
       self._cursor_selection = None
-      return None if page_height is None else None, 0
+      return None if page_height is None else (None, 0)
+
+    selection_location = self._location_of(content, self._cursor_selection)
 
-    if self._cursor_selection in content:
+    if selection_location is not None:
       # moves cursor location to track the selection
-      self._cursor_location = content.index(self._cursor_selection)
+      self._cursor_location = selection_location
     else:
       # select the next closest entry
       self._cursor_location = max(0, min(self._cursor_location, len(content) - 1))
@@ -892,6 +967,17 @@ class CursorScroller(object):
     else:
       return False
 
+  def _location_of(self, content, item):
+    if self._indexed:
+      try:
+        return content.index(item)
+      except ValueError:
+        return None
+    elif item in content:
+      return content.index(item)
+    else:
+      return None
+
 
 def _scroll_position(location, key, content_height, page_height, is_cursor):
   if key.match('up'):
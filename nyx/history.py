@@ -0,0 +1,590 @@
+# Copyright 2016, Damian Johnson and The Tor Project
+# See LICENSE for licensing information
+
+"""
+Persistence of statistics between nyx runs. Values are stored in memory
+mapped files so they can be updated in place, without rewriting the file.
+
+::
+
+  RingFile - file of fixed size circular buffers
+    |- attrs - provides scalar attributes
+    |- set_attrs - sets scalar attributes
+    |- values - provides a buffer's contents, newest first
+    |- append - adds a value to a buffer, overwriting its oldest
+    +- close - flushes and closes the file
+
+  RoundRobinStore - multi-resolution time series, like rrdtool
+    |- add - records a sample
+    |- query - provides samples over a time range
+    |- resolution - seconds per sample we'd provide for a time range
+    +- close - flushes and closes the file
+
+  TopCounts - approximate counts of the most frequent labels
+    |- add - counts a label
+    |- counts - provides the labels we're tracking and their counts
+    |- errors - provides how much our counts might be overestimates
+    +- floor - provides the most an untracked label might have occurred
+
+  WindowedCounts - counts of labels over a sliding window of time
+    |- add - counts a label
+    |- counts - provides the counts over a period
+    |- errors - provides how much counts over a period might be off by
+    +- save - persists our window
+
+.. data:: TIERS
+
+  Default (step, rows) resolutions of a :class:`~nyx.history.RoundRobinStore`.
+  These are a second for an hour, a minute for two days, fifteen minutes for a
+  month, an hour for three months, and a day for two years.
+"""
+
+import collections
+import json
+import mmap
+import os
+import struct
+import time
+
+MAGIC = b'NYXRING1'
+HEADER = struct.Struct('<8sIII')  # magic, ring count, ring size, attribute count
+DOUBLE = struct.Struct('<d')
+INDEX = struct.Struct('<I')
+
+RRD_MAGIC = b'NYXRRD01'
+RRD_HEADER = struct.Struct('<8sII')  # magic, series count, tier count
+RRD_TIER = struct.Struct('<II')  # step, rows
+RRD_RECORD = struct.Struct('<5d')  # bucket start, count, sum, min, max
+
+TIERS = (
+  (1, 3600),
+  (60, 2880),
+  (900, 2976),
+  (3600, 2190),
+  (86400, 730),
+)
+
+Sample = collections.namedtuple('Sample', ['timestamp', 'average', 'minimum', 'maximum'])
+
+
+class RingFile(object):
+  """
+  Memory mapped file containing several fixed size circular buffers of
+  doubles, along with scalar attributes describing them. Appending to a
+  buffer is constant time, changing only its value and write position.
+
+  Files are laid out as...
+
+    * header - magic, ring count, ring size, and attribute count
+    * attributes - doubles
+    * heads - index of each ring's newest value
+    * rings - ring size doubles for each ring
+
+  If the file doesn't exist or has a different layout than what we're asked
+  for then it's replaced with a zeroed one.
+
+  :var bool is_new: **True** if we created this file, **False** if it existed
+
+  :param str path: location of our file
+  :param int ring_count: number of buffers we store
+  :param int ring_size: number of values in each buffer
+  :param int attr_count: number of scalar attributes we store
+
+  :raises: **IOError** or **OSError** if unable to read or create the file
+  """
+
+  def __init__(self, path, ring_count, ring_size, attr_count):
+    self._ring_count = ring_count
+    self._ring_size = ring_size
+    self._attr_count = attr_count
+
+    self._attr_offset = HEADER.size
+    self._head_offset = self._attr_offset + attr_count * DOUBLE.size
+    self._ring_offset = self._head_offset + ring_count * INDEX.size
+    self._attr_struct = struct.Struct('<%id' % attr_count)
+
+    file_size = self._ring_offset + ring_count * ring_size * DOUBLE.size
+    header = HEADER.pack(MAGIC, ring_count, ring_size, attr_count)
+
+    self._file, self._mmap, self.is_new = _open_mmap(path, header, file_size)
+
+  def attrs(self):
+    """
+    Provides our scalar attributes.
+
+    :returns: **tuple** of floats with our attributes
+    """
+
+    return self._attr_struct.unpack_from(self._mmap, self._attr_offset)
+
+  def set_attrs(self, start, values):
+    """
+    Sets a range of our attributes.
+
+    :param int start: index of the first attribute to set
+    :param list values: values to set, starting with that index
+    """
+
+    if start < 0 or start + len(values) > self._attr_count:
+      raise ValueError('Attributes %i-%i are out of range, we only have %i' % (start, start + len(values) - 1, self._attr_count))
+
+    struct.pack_into('<%id' % len(values), self._mmap, self._attr_offset + start * DOUBLE.size, *values)
+
+  def values(self, ring):
+    """
+    Provides the contents of a buffer.
+
+    :param int ring: index of the buffer
+
+    :returns: **list** of floats, newest first
+    """
+
+    head = self._head(ring)
+    values = struct.unpack_from('<%id' % self._ring_size, self._mmap, self._ring_start(ring))
+    return list(values[head:] + values[:head])
+
+  def append(self, ring, value):
+    """
+    Adds a value to a buffer, overwriting its oldest.
+
+    :param int ring: index of the buffer
+    :param float value: value to add
+    """
+
+    head = (self._head(ring) - 1) % self._ring_size
+    DOUBLE.pack_into(self._mmap, self._ring_start(ring) + head * DOUBLE.size, value)
+    INDEX.pack_into(self._mmap, self._head_offset + ring * INDEX.size, head)
+
+  def close(self):
+    self._mmap.flush()
+    self._mmap.close()
+    self._file.close()
+
+  def _head(self, ring):
+    if not 0 <= ring < self._ring_count:
+      raise ValueError('Ring %i is out of range, we only have %i' % (ring, self._ring_count))
+
+    return INDEX.unpack_from(self._mmap, self._head_offset + ring * INDEX.size)[0] % self._ring_size
+
+  def _ring_start(self, ring):
+    return self._ring_offset + ring * self._ring_size * DOUBLE.size
+
+
+class RoundRobinStore(object):
+  """
+  Round robin database of several time series. Each sample is consolidated
+  into a bucket of every tier (by default a second, minute, fifteen minutes,
+  hour, and day), which track the average, minimum, and maximum of their
+  samples. Tiers are a fixed number of buckets, so coarser ones retain data
+  longer at a bounded disk cost.
+
+  Buckets are addressed by their time, so adding a sample is constant time
+  and periods we lack samples for are simply empty.
+
+  :var bool is_new: **True** if we created this file, **False** if it existed
+
+  :param str path: location of our file
+  :param int series_count: number of time series we store
+  :param tuple tiers: (step, rows) for each resolution we consolidate into,
+    finest first
+
+  :raises: **IOError** or **OSError** if unable to read or create the file
+  """
+
+  def __init__(self, path, series_count = 1, tiers = TIERS):
+    self._series_count = series_count
+    self._tiers = tuple(tiers)
+
+    header = RRD_HEADER.pack(RRD_MAGIC, series_count, len(self._tiers)) + b''.join([RRD_TIER.pack(step, rows) for (step, rows) in self._tiers])
+
+    # offset of each tier within a series, and the size of a series
+
+    self._tier_offsets, series_size = [], 0
+
+    for step, rows in self._tiers:
+      self._tier_offsets.append(series_size)
+      series_size += rows * RRD_RECORD.size
+
+    self._data_offset = len(header)
+    self._series_size = series_size
+    file_size = self._data_offset + series_count * series_size
+
+    self._file, self._mmap, self.is_new = _open_mmap(path, header, file_size)
+
+  def add(self, series, timestamp, value):
+    """
+    Records a sample, consolidating it into each of our tiers.
+
+    :param int series: index of the time series to add to
+    :param float timestamp: unix timestamp of the sample
+    :param float value: value of the sample
+    """
+
+    self._check_series(series)
+
+    for tier, (step, rows) in enumerate(self._tiers):
+      bucket = int(timestamp // step) * step
+      offset = self._record_offset(series, tier, bucket)
+      start, count, total, minimum, maximum = RRD_RECORD.unpack_from(self._mmap, offset)
+
+      if start != bucket or not count:
+        count, total, minimum, maximum = 0, 0, value, value  # replacing a bucket from a past cycle
+
+      RRD_RECORD.pack_into(self._mmap, offset, bucket, count + 1, total + value, min(minimum, value), max(maximum, value))
+
+  def query(self, series, start, end = None):
+    """
+    Provides samples over a time range at the finest resolution that retains
+    all of it.
+
+    :param int series: index of the time series to provide
+    :param float start: unix timestamp for the start of the range
+    :param float end: unix timestamp for the end of the range, the present
+      time if **None**
+
+    :returns: **tuple** of the form (step, samples) where samples are a
+      **list** of :class:`~nyx.history.Sample`, oldest first, for buckets
+      we have data for
+    """
+
+    self._check_series(series)
+
+    now = time.time()
+    end = now if end is None else end
+    tier = self._tier_for(start, now)
+    step, rows = self._tiers[tier]
+
+    # we can't provide anything older than the tier retains
+
+    first_bucket = int(max(start, now - step * rows) // step) * step
+    last_bucket = int(end // step) * step
+    samples = []
+
+    for bucket in range(first_bucket, last_bucket + 1, step):
+      record_start, count, total, minimum, maximum = RRD_RECORD.unpack_from(self._mmap, self._record_offset(series, tier, bucket))
+
+      if record_start == bucket and count:
+        samples.append(Sample(bucket, total / count, minimum, maximum))
+
+    return step, samples
+
+  def resolution(self, start, now = None):
+    """
+    Provides the seconds per sample we'd query for a range that begins at the
+    given time.
+
+    :param float start: unix timestamp for the start of the range
+    :param float now: current unix timestamp, our system time if **None**
+
+    :returns: **int** seconds each sample represents
+    """
+
+    return self._tiers[self._tier_for(start, time.time() if now is None else now)][0]
+
+  def close(self):
+    self._mmap.flush()
+    self._mmap.close()
+    self._file.close()
+
+  def _tier_for(self, start, now):
+    for tier, (step, rows) in enumerate(self._tiers):
+      if now - step * rows <= start:
+        return tier
+
+    return len(self._tiers) - 1  # nothing covers it all, so use our longest
+
+  def _record_offset(self, series, tier, bucket):
+    step, rows = self._tiers[tier]
+    return self._data_offset + series * self._series_size + self._tier_offsets[tier] + ((bucket // step) % rows) * RRD_RECORD.size
+
+  def _check_series(self, series):
+    if not 0 <= series < self._series_count:
+      raise ValueError('Series %i is out of range, we only have %i' % (series, self._series_count))
+
+
+class TopCounts(object):
+  """
+  Counts of the most frequent labels within a fixed amount of memory, using
+  the Space-Saving algorithm of Metwally, Agrawal, and El Abbadi. We track at
+  most **capacity** labels. When a label we aren't tracking arrives while
+  we're full it replaces the label with the lowest count, inheriting that
+  count as its error.
+
+  If **N** is the sum of everything we've counted then...
+
+    * any label that occurred over N / capacity times is tracked
+    * counts are never underestimates, and overestimate by at most their
+      error, which is itself at most N / capacity
+
+  Without a capacity all labels are tracked and counts are exact.
+
+  :param int capacity: maximum number of labels we track, unbounded if **None**
+  """
+
+  def __init__(self, capacity = None):
+    self._capacity = capacity
+    self._counts = {}  # label => [count, error]
+
+  def add(self, label, count = 1, error = 0):
+    """
+    Counts occurrences of a label.
+
+    :param str label: label to count
+    :param int count: number of times it occurred
+    :param int error: portion of that count which might be an overestimate
+    """
+
+    entry = self._counts.get(label)
+
+    if entry:
+      entry[0] += count
+      entry[1] += error
+    elif self._capacity is None or len(self._counts) < self._capacity:
+      self._counts[label] = [count, error]
+    else:
+      evicted = min(self._counts, key = lambda k: self._counts[k][0])
+      floor = self._counts.pop(evicted)[0]
+      self._counts[label] = [floor + count, floor + error]
+
+  def counts(self):
+    """
+    Provides the labels we're tracking.
+
+    :returns: **dict** of labels to their estimated count
+    """
+
+    return dict([(label, entry[0]) for label, entry in self._counts.items()])
+
+  def errors(self):
+    """
+    Provides how much our counts might be overestimates.
+
+    :returns: **dict** of labels to their maximum error, omitting exact counts
+    """
+
+    return dict([(label, entry[1]) for label, entry in self._counts.items() if entry[1]])
+
+  def floor(self):
+    """
+    Provides the most any untracked label might have occurred.
+
+    :returns: **int** for the lowest count we're tracking if full, zero otherwise
+    """
+
+    if self._capacity is None or len(self._counts) < self._capacity:
+      return 0
+
+    return min([entry[0] for entry in self._counts.values()])
+
+
+class WindowedCounts(object):
+  """
+  Counts of labels, such as the countries clients connect from, bucketed by
+  time so we only retain a bounded window of them. Buckets are an hour by
+  default and we keep a day of them, along with a running total since we
+  were created.
+
+  Unlike our other stores the labels we count aren't known ahead of time, so
+  if a path is provided our window is persisted to it as json. Saving is
+  rate limited, so it's fine to call after each change.
+
+  If given a capacity each bucket is a :class:`~nyx.history.TopCounts`,
+  bounding our memory to the most frequent labels. Counts over a period then
+  sum each bucket's, and are off by at most the sum of each bucket's error
+  bound (N / capacity of what that bucket counted).
+
+  :param str path: location to persist our window, not persisted if **None**
+  :param int bucket_size: seconds each bucket counts
+  :param int bucket_count: number of buckets we retain
+  :param int save_rate: minimum seconds between writing to our path
+  :param int capacity: maximum number of labels each bucket tracks,
+    unbounded if **None**
+
+  :raises: **IOError**, **OSError**, or **ValueError** if unable to read the
+    file at our path
+  """
+
+  def __init__(self, path = None, bucket_size = 3600, bucket_count = 24, save_rate = 60, capacity = None):
+    self._path = path
+    self._bucket_size = bucket_size
+    self._bucket_count = bucket_count
+    self._save_rate = save_rate
+    self._capacity = capacity
+
+    self._buckets = collections.OrderedDict()  # bucket start => TopCounts, oldest first
+    self._total = TopCounts(capacity)  # counts since we were created
+    self._last_saved = -1
+
+    if path and os.path.exists(path):
+      with open(path) as persisted_file:
+        persisted = json.load(persisted_file)
+
+      if persisted.get('bucket_size') == bucket_size:
+        errors = persisted.get('errors', {})
+
+        for bucket, counts in sorted([(int(bucket), counts) for bucket, counts in persisted.get('buckets', {}).items()]):
+          bucket_errors = errors.get(str(bucket), {})
+          self._buckets[bucket] = TopCounts(capacity)
+
+          for label, count in sorted(counts.items(), key = lambda item: item[1], reverse = True):
+            self._buckets[bucket].add(label, count, bucket_errors.get(label, 0))
+
+        self._expire(time.time())
+
+  def add(self, label, count = 1, timestamp = None, in_window = True):
+    """
+    Counts occurrences of a label.
+
+    :param str label: label to count
+    :param int count: number of times it occurred
+    :param float timestamp: unix timestamp for when it occurred, the present
+      time if **None**
+    :param bool in_window: **False** if this should only be included in our
+      total, for instance because we don't know when it occurred
+    """
+
+    self._total.add(label, count)
+
+    if in_window:
+      timestamp = time.time() if timestamp is None else timestamp
+      bucket = int(timestamp // self._bucket_size) * self._bucket_size
+
+      if bucket not in self._buckets:
+        self._buckets[bucket] = TopCounts(self._capacity)
+        self._expire(timestamp)
+
+      self._buckets[bucket].add(label, count)
+
+  def counts(self, period = None, now = None):
+    """
+    Provides the number of times each label occurred over a period.
+
+    :param int period: seconds to provide counts for, rounded up to our bucket
+      size, or our total since we were created if **None**
+    :param float now: unix timestamp the period ends at, the present time if
+      **None**
+
+    :returns: **dict** of labels to the number of times they occurred
+    """
+
+    return self._merge(period, now)[0]
+
+  def errors(self, period = None, now = None):
+    """
+    Provides how much our counts over a period might be off by. This is empty
+    unless we have a capacity.
+
+    :param int period: seconds to provide errors for, as with
+      :func:`~nyx.history.WindowedCounts.counts`
+    :param float now: unix timestamp the period ends at, the present time if
+      **None**
+
+    :returns: **dict** of labels to their maximum error, omitting exact counts
+    """
+
+    return self._merge(period, now)[1]
+
+  def save(self, force = False):
+    """
+    Writes our window to our path, unless we've done so recently.
+
+    :param bool force: saves regardless of when we last did
+
+    :raises: **IOError** or **OSError** if unable to write the file
+    """
+
+    if not self._path or (not force and time.time() - self._last_saved < self._save_rate):
+      return
+
+    self._last_saved = time.time()
+    path_dir = os.path.dirname(self._path)
+
+    if path_dir and not os.path.exists(path_dir):
+      os.makedirs(path_dir)
+
+    persisted = {
+      'bucket_size': self._bucket_size,
+      'buckets': dict([(str(bucket), counts.counts()) for bucket, counts in self._buckets.items()]),
+      'errors': dict([(str(bucket), counts.errors()) for bucket, counts in self._buckets.items() if counts.errors()]),
+    }
+
+    with open(self._path, 'w') as persisted_file:
+      json.dump(persisted, persisted_file)
+
+  def _merge(self, period, now):
+    """
+    Sums the buckets within a period. Labels a full bucket didn't track might
+    have occurred up to its floor, so that's included in their error.
+    """
+
+    if period is None:
+      return self._total.counts(), self._total.errors()
+
+    now = time.time() if now is None else now
+    start = int((now - period) // self._bucket_size) * self._bucket_size  # include the bucket 'now - period' falls in
+    buckets = [counts for bucket, counts in list(self._buckets.items()) if bucket >= start]
+    result, errors = {}, {}
+
+    for counts in buckets:
+      for label, count in counts.counts().items():
+        result[label] = result.get(label, 0) + count
+
+      for label, error in counts.errors().items():
+        errors[label] = errors.get(label, 0) + error
+
+    for counts in buckets:
+      floor = counts.floor()
+
+      if floor:
+        tracked = counts.counts()
+
+        for label in result:
+          if label not in tracked:
+            errors[label] = errors.get(label, 0) + floor
+
+    if self._capacity is not None and len(result) > self._capacity:
+      for label in sorted(result, key = lambda k: result[k])[:len(result) - self._capacity]:
+        del result[label]
+        errors.pop(label, None)
+
+    return result, errors
+
+  def _expire(self, now):
+    oldest = int(now // self._bucket_size - self._bucket_count + 1) * self._bucket_size
+
+    while self._buckets and next(iter(self._buckets)) < oldest:
+      self._buckets.popitem(last = False)
+
+
+def _open_mmap(path, header, file_size):
+  """
+  Memory maps a file with the given header and size. If it doesn't exist or
+  doesn't match then it's replaced with a zeroed one.
+
+  :param str path: location of the file
+  :param bytes header: content the file should start with
+  :param int file_size: size of the file
+
+  :returns: **tuple** of the form (file, mmap, is_new)
+
+  :raises: **IOError** or **OSError** if unable to read or create the file
+  """
+
+  path_dir = os.path.dirname(path)
+
+  if path_dir and not os.path.exists(path_dir):
+    os.makedirs(path_dir)
+
+  is_new = True
+
+  if os.path.exists(path) and os.path.getsize(path) == file_size:
+    with open(path, 'rb') as existing_file:
+      is_new = existing_file.read(len(header)) != header
+
+  if is_new:
+    with open(path, 'wb') as new_file:
+      new_file.write(header)
+      new_file.truncate(file_size)
+
+  mapped_file = open(path, 'r+b')
+  return mapped_file, mmap.mmap(mapped_file.fileno(), file_size), is_new
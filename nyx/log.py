@@ -22,16 +22,35 @@ runlevels.
 
   LogGroup - thread safe, deduplicated grouping of events
     |- add - adds an event to the group
+    |- extend - adds several events to the group
     |- pop - removes and returns an event
+    |- search - provides events that contain the given words
     +- clone - deep copy of this LogGroup
 
   LogEntry - individual log event
     |- is_duplicate_of - checks if a duplicate message of another LogEntry
+    |- dedup_key - key shared by likely duplicates of this message
     |- day_count - number of days since this even occured
     +- clone - deep copy of this LogEntry
 
   LogFileOutput - writes log events to a file
-    +- write - persist a given message
+    |- write - persist a given message
+    |- dropped - number of messages we were unable to write
+    +- close - flushes pending messages and closes the file
+
+  LogIngestor - batches events for processing by a background thread
+    |- add - queues an event for processing
+    |- flush - processes everything that's presently queued
+    |- stop - processes remaining events and halts our thread
+    |- queue_depth - number of events awaiting processing
+    +- drain_latency - how long our last batch waited to be processed
+
+  LogRateLimiter - token bucket limits for floods of log events
+    |- allow - checks if a LogEntry is within our rate limits
+    +- summaries - entries noting messages we've suppressed
+
+  LogFileFollower - notifies a handler of new entries in tor's log file
+    +- stop - halts following the file
 
   LogFilters - regex filtering of log events
     |- select - filters by this regex
@@ -43,11 +62,15 @@ runlevels.
 
 import collections
 import datetime
+import gzip
 import os
 import re
+import select
+import shutil
 import time
 import threading
 
+import stem.prereq
 import stem.util.conf
 import stem.util.log
 import stem.util.system
@@ -60,10 +83,27 @@ try:
 except ImportError:
   from stem.util.lru_cache import lru_cache
 
+try:
+  # renamed in python 3.0
+  import queue
+except ImportError:
+  import Queue as queue
+
 TOR_RUNLEVELS = ['DEBUG', 'INFO', 'NOTICE', 'WARN', 'ERR']
 NYX_RUNLEVELS = ['NYX_DEBUG', 'NYX_INFO', 'NYX_NOTICE', 'NYX_WARNING', 'NYX_ERROR']
 TIMEZONE_OFFSET = time.altzone if time.localtime()[8] else time.timezone
 
+# Words we index log messages by. Addresses and relay fingerprints are kept
+# intact, though address:port pairs are also indexed by their components.
+
+SEARCH_TOKEN = re.compile('[\\w.:]+')
+
+# inotify flags for directory changes that can concern a file we're following
+
+INOTIFY_NONBLOCK = 0o4000
+INOTIFY_CLOEXEC = 0o2000000
+INOTIFY_MASK = 0x2 | 0x4 | 0x40 | 0x80 | 0x100 | 0x200  # modify, attrib, moved from/to, create, delete
+
 
 def day_count(timestamp):
   """
@@ -219,45 +259,92 @@ def _common_log_messages():
   return messages
 
 
+def _search_tokens(message):
+  """
+  Provides the words a message can be searched by. This is case insensitive,
+  so all tokens are lowercase.
+
+  :param str message: message to be tokenized
+
+  :returns: **set** of words within the message
+  """
+
+  tokens = set()
+
+  for token in SEARCH_TOKEN.findall(message.lower()):
+    token = token.strip('.:')
+
+    if token:
+      tokens.add(token)
+
+      if ':' in token:
+        tokens.update([comp for comp in token.split(':') if comp])
+
+  return tokens
+
+
 class LogGroup(object):
   """
   Thread safe collection of LogEntry instancs, which maintains a certain size
   and supports deduplication.
+
+  Entries are indexed by the words they contain so they can be quickly
+  searched. Each entry is given an incrementing id as its added, so since we
+  only add to the front and pop from the end an entry's position in our list is
+  simply its offset from the newest id.
   """
 
   def __init__(self, max_size, group_by_day = False):
     self._max_size = max_size
     self._group_by_day = group_by_day
     self._entries = []
+    self._index = {}  # search token => ids of the entries with it
+    self._next_id = 0
     self._lock = threading.RLock()
 
   def add(self, entry):
+    self.extend([entry])
+
+  def extend(self, entries):
+    """
+    Adds several entries, oldest first, while only acquiring our lock once.
+
+    :param list entries: :class:`~nyx.log.LogEntry` instances to add
+    """
+
     with self._lock:
-      duplicate = None
-      our_day = entry.day_count()
+      for entry in entries:
+        duplicate = None
+        our_day = entry.day_count()
 
-      for existing_entry in self._entries:
-        if self._group_by_day and our_day != existing_entry.day_count():
-          break
-        elif entry.is_duplicate_of(existing_entry):
-          duplicate = existing_entry
-          break
+        for existing_entry in self._entries:
+          if self._group_by_day and our_day != existing_entry.day_count():
+            break
+          elif entry.is_duplicate_of(existing_entry):
+            duplicate = existing_entry
+            break
+
+        if duplicate:
+          if not duplicate.duplicates:
+            duplicate.duplicates = [duplicate]
 
-      if duplicate:
-        if not duplicate.duplicates:
-          duplicate.duplicates = [duplicate]
+          duplicate.is_duplicate = True
+          entry.duplicates = duplicate.duplicates
+          entry.duplicates.insert(0, entry)
 
-        duplicate.is_duplicate = True
-        entry.duplicates = duplicate.duplicates
-        entry.duplicates.insert(0, entry)
+        self._entries.insert(0, entry)
 
-      self._entries.insert(0, entry)
+        for token in _search_tokens('%s %s' % (entry.type, entry.message)):
+          self._index.setdefault(token, set()).add(self._next_id)
+
+        self._next_id += 1
 
       while len(self._entries) > self._max_size:
         self.pop()
 
   def pop(self):
     with self._lock:
+      last_entry_id = self._next_id - len(self._entries)
       last_entry = self._entries.pop()
 
       # By design if the last entry is a duplicate it will also be the last
@@ -266,10 +353,59 @@ class LogGroup(object):
       if last_entry.is_duplicate:
         last_entry.duplicates.pop()
 
+      # drop the evicted entry from our search index
+
+      for token in _search_tokens('%s %s' % (last_entry.type, last_entry.message)):
+        entry_ids = self._index.get(token)
+
+        if entry_ids is not None:
+          entry_ids.discard(last_entry_id)
+
+          if not entry_ids:
+            del self._index[token]
+
+      return last_entry
+
+  def search(self, query):
+    """
+    Provides the entries that contain all words within the given query. This is
+    case insensitive.
+
+    :param str query: words to search for
+
+    :returns: **list** of matching :class:`~nyx.log.LogEntry`, newest first
+    """
+
+    tokens = _search_tokens(query)
+
+    if not tokens:
+      return []
+
+    with self._lock:
+      matches = None
+
+      # intersect starting with our rarest token, since that's the smallest set
+
+      for token in sorted(tokens, key = lambda token: len(self._index.get(token, ()))):
+        entry_ids = self._index.get(token)
+
+        if not entry_ids:
+          return []
+
+        matches = set(entry_ids) if matches is None else matches.intersection(entry_ids)
+
+        if not matches:
+          return []
+
+      newest_id = self._next_id - 1
+      return [self._entries[newest_id - entry_id] for entry_id in sorted(matches, reverse = True)]
+
   def clone(self):
     with self._lock:
       copy = LogGroup(self._max_size, self._group_by_day)
       copy._entries = [entry.clone() for entry in self._entries]
+      copy._index = dict([(token, set(entry_ids)) for (token, entry_ids) in self._index.items()])
+      copy._next_id = self._next_id
       return copy
 
   def __len__(self):
@@ -297,6 +433,8 @@ class LogEntry(object):
   :var bool is_duplicate: true if this matches other messages in the group and
     isn't the first
   :var list duplicates: messages that are identical to this one
+  :var tuple summary_of: dedup key of the messages this summarizes if it's a
+    note of rate limited messages, **None** otherwise
   """
 
   def __init__(self, timestamp, type, message):
@@ -309,6 +447,7 @@ class LogEntry(object):
 
     self.is_duplicate = False
     self.duplicates = None
+    self.summary_of = None
 
   @lru_cache()
   def is_duplicate_of(self, entry):
@@ -320,6 +459,8 @@ class LogEntry(object):
 
     if self.type != entry.type:
       return False
+    elif self.summary_of or entry.summary_of:
+      return self.summary_of == entry.summary_of
     elif self.message == entry.message:
       return True
 
@@ -342,6 +483,29 @@ class LogEntry(object):
 
     return False
 
+  def dedup_key(self):
+    """
+    Provides a key that's shared by messages that are likely duplicates of
+    each other. This is coarser than :func:`~nyx.log.LogEntry.is_duplicate_of`
+    but, unlike it, can be used to bucket messages.
+
+    :returns: **tuple** of the form (type, message or common prefix)
+    """
+
+    if self.summary_of:
+      return self.summary_of
+    elif self.type == 'NYX_DEBUG' and 'runtime:' in self.message:
+      return (self.type, self.message[:self.message.find('runtime:')])
+
+    for common_msg in _common_log_messages().get(self.type, []):
+      if common_msg[0] == '*':
+        if common_msg[1:] in self.message:
+          return (self.type, common_msg)
+      elif self.message.startswith(common_msg):
+        return (self.type, common_msg)
+
+    return (self.type, self.message)
+
   def day_count(self):
     """
     Provides the day this event occured on by local time.
@@ -355,6 +519,7 @@ class LogEntry(object):
     copy = LogEntry(self.timestamp, self.type, self.message)
     copy.is_duplicate = self.is_duplicate
     copy.duplicates = None if self.duplicates is None else list(self.duplicates)
+    copy.summary_of = self.summary_of
 
     return copy
 
@@ -370,36 +535,534 @@ class LogEntry(object):
 
 class LogFileOutput(object):
   """
-  File where log messages we receive are written. If unable to do so then a
-  notification is logged and further write attempts are skipped.
+  File where log messages we receive are written. Messages are queued and
+  written in batches by a background thread so callers never block on disk
+  activity. If the queue fills up then further messages are dropped, with a
+  note of how many in the file once we catch up.
+
+  If unable to write then a notification is logged and further write attempts
+  are skipped.
+
+  :param str path: location to write log messages to
+  :param int max_size: size in bytes at which the file is rotated, no rotation
+    is done if zero
+  :param int backup_count: number of rotated files we retain
+  :param bool compress: gzips rotated files if **True**
+  :param int queue_size: maximum number of messages we'll queue before
+    dropping them
+  :param float flush_rate: maximum seconds buffered messages wait to be flushed
+  :param int flush_size: buffered bytes at which we flush regardless of time
   """
 
-  def __init__(self, path):
+  def __init__(self, path, max_size = 0, backup_count = 5, compress = False, queue_size = 10000, flush_rate = 1.0, flush_size = 65536):
+    self._path = path
     self._file = None
 
+    self._max_size = max_size
+    self._backup_count = backup_count
+    self._compress = compress
+    self._flush_rate = flush_rate
+    self._flush_size = flush_size
+
+    self._queue = queue.Queue(queue_size)
+    self._dropped = 0  # messages dropped since we last noted it in the file
+    self._dropped_total = 0
+    self._dropped_lock = threading.Lock()
+    self._thread = None
+
     if path:
       try:
         path_dir = os.path.dirname(path)
 
-        if not os.path.exists(path_dir):
+        if path_dir and not os.path.exists(path_dir):
           os.makedirs(path_dir)
 
         self._file = open(path, 'a')
         notice('panel.log.opening_log_file', version = nyx.__version__, path = path)
       except IOError as exc:
-        error('msg.panel.log.unable_to_open_log_file', reason = exc.strerror)
+        error('panel.log.unable_to_open_log_file', reason = exc.strerror)
       except OSError as exc:
-        error('msg.panel.log.unable_to_open_log_file', reason = exc)
+        error('panel.log.unable_to_open_log_file', reason = exc)
+
+    if self._file:
+      self._thread = threading.Thread(target = self._run, name = 'log file writer')
+      self._thread.setDaemon(True)
+      self._thread.start()
 
   def write(self, msg):
     if self._file:
       try:
-        self._file.write(msg + '\n')
-        self._file.flush()
-      except IOError as exc:
-        error('msg.panel.log.unable_to_open_log_file', reason = exc.strerror)
+        self._queue.put_nowait(msg)
+      except queue.Full:
+        with self._dropped_lock:
+          self._dropped += 1
+          self._dropped_total += 1
+
+  def dropped(self):
+    """
+    Provides the number of messages we've dropped because our queue was full.
+
+    :returns: **int** for the number of messages we've been unable to write
+    """
+
+    return self._dropped_total
+
+  def close(self, timeout = 5):
+    """
+    Writes any queued messages and closes our file.
+
+    :param float timeout: maximum seconds to wait for queued messages to be
+      written
+    """
+
+    if self._thread:
+      try:
+        self._queue.put(None, timeout = timeout)  # signals our thread to finish up
+        self._thread.join(timeout)
+      except queue.Full:
+        pass
+
+      self._thread = None
+
+  def _run(self):
+    unflushed_size, last_flushed = 0, time.time()
+    is_halted = False
+
+    while not is_halted and self._file:
+      try:
+        msg = self._queue.get(timeout = max(0.01, self._flush_rate - (time.time() - last_flushed)))
+        batch = [msg]
+      except queue.Empty:
+        batch = []
+
+      # take whatever else is queued so we write it together
+
+      try:
+        while len(batch) < 1000:
+          batch.append(self._queue.get_nowait())
+      except queue.Empty:
+        pass
+
+      if None in batch:
+        is_halted = True
+        batch = batch[:batch.index(None)]
+
+      with self._dropped_lock:
+        dropped, self._dropped = self._dropped, 0
+
+      if dropped:
+        batch.append(nyx.msg('panel.log.dropped_log_file_entries', count = dropped))
+
+      try:
+        if batch:
+          content = '\n'.join(batch) + '\n'
+          self._file.write(content)
+          unflushed_size += len(content)
+
+        if unflushed_size and (is_halted or unflushed_size >= self._flush_size or time.time() - last_flushed >= self._flush_rate):
+          self._file.flush()
+          unflushed_size, last_flushed = 0, time.time()
+
+          if self._max_size and self._file.tell() >= self._max_size:
+            self._rotate()
+        elif not unflushed_size:
+          last_flushed = time.time()
+      except (IOError, OSError) as exc:
+        error('panel.log.unable_to_open_log_file', reason = getattr(exc, 'strerror', exc))
         self._file = None
 
+    if self._file:
+      self._file.close()
+      self._file = None
+
+  def _rotate(self):
+    """
+    Moves our present file aside, shifting older backups and removing anything
+    beyond our backup_count.
+    """
+
+    self._file.close()
+    self._file = None
+
+    suffix = '.gz' if self._compress else ''
+
+    if self._backup_count > 0:
+      for i in range(self._backup_count - 1, 0, -1):
+        backup_path = '%s.%i%s' % (self._path, i, suffix)
+
+        if os.path.exists(backup_path):
+          os.rename(backup_path, '%s.%i%s' % (self._path, i + 1, suffix))
+
+      rotated_path = '%s.1' % self._path
+      os.rename(self._path, rotated_path)
+
+      if self._compress:
+        with open(rotated_path, 'rb') as rotated_file:
+          with gzip.open(rotated_path + '.gz', 'wb') as compressed_file:
+            shutil.copyfileobj(rotated_file, compressed_file)
+
+        os.remove(rotated_path)
+    else:
+      os.remove(self._path)
+
+    self._file = open(self._path, 'a')
+
+
+class LogIngestor(object):
+  """
+  Decouples receipt of events from their processing. Listeners such as stem's
+  event thread only append to a deque (which is atomic, so this takes no
+  locks), while a background thread periodically hands whatever has
+  accumulated to our handler as a batch.
+
+  If events arrive faster than we can process them then our queue fills up,
+  after which further events are dropped, with a count of how many we've
+  discarded.
+
+  :param function handler: called with a **list** of queued events, oldest
+    first
+  :param float drain_rate: seconds between checks for new events
+  :param int batch_size: maximum number of events handed to our handler at once
+  :param int queue_size: maximum number of events we'll queue before dropping
+    them
+  """
+
+  def __init__(self, handler, drain_rate = 0.1, batch_size = 1000, queue_size = 100000):
+    self._handler = handler
+    self._drain_rate = drain_rate
+    self._batch_size = batch_size
+    self._queue_size = queue_size
+
+    self._queue = collections.deque()  # tuples of the form (arrival, event)
+    self._drain_latency = 0.0
+    self._dropped = 0
+    self._drain_lock = threading.Lock()
+
+    self._halt = threading.Event()
+    self._thread = threading.Thread(target = self._run, name = 'log ingestor')
+    self._thread.setDaemon(True)
+    self._thread.start()
+
+  def add(self, event):
+    if len(self._queue) >= self._queue_size:
+      self._dropped += 1  # not locked, so this might undercount concurrent drops
+    else:
+      self._queue.append((time.time(), event))
+
+  def flush(self):
+    """
+    Processes all queued events in the calling thread.
+    """
+
+    while self._drain():
+      pass
+
+  def stop(self, timeout = 5):
+    """
+    Halts our thread, then processes anything that remains in our queue.
+
+    :param float timeout: maximum seconds to wait for our thread to finish
+    """
+
+    self._halt.set()
+    self._thread.join(timeout)
+    self.flush()
+
+  def queue_depth(self):
+    """
+    Provides the number of events that are waiting to be processed.
+
+    :returns: **int** for our queue's length
+    """
+
+    return len(self._queue)
+
+  def drain_latency(self):
+    """
+    Provides how long the oldest event of our last batch waited before being
+    processed. If this climbs then our handler isn't keeping pace with the
+    rate events arrive.
+
+    :returns: **float** for the seconds our last batch waited
+    """
+
+    return self._drain_latency
+
+  def dropped(self):
+    """
+    Provides the number of events we've dropped because our queue was full.
+
+    :returns: **int** for the number of events we've discarded
+    """
+
+    return self._dropped
+
+  def _run(self):
+    while not self._halt.is_set():
+      if not self._drain():
+        self._halt.wait(self._drain_rate)
+
+  def _drain(self):
+    """
+    Hands a batch of queued events to our handler.
+
+    :returns: **True** if we processed anything, **False** otherwise
+    """
+
+    with self._drain_lock:
+      batch = []
+
+      try:
+        while len(batch) < self._batch_size:
+          batch.append(self._queue.popleft())
+      except IndexError:
+        pass
+
+      if not batch:
+        return False
+
+      self._drain_latency = time.time() - batch[0][0]
+
+      try:
+        self._handler([event for (arrival, event) in batch])
+      except Exception as exc:
+        warn('panel.log.unable_to_process_events', count = len(batch), reason = exc)
+
+      return True
+
+
+class LogFileFollower(threading.Thread):
+  """
+  Follows tor's log file, notifying a handler of entries as they're appended.
+  This is an alternative to listening for tor's runlevel events, which can be
+  costly at DEBUG or INFO, or if our control port is remote.
+
+  We use inotify (via ctypes) to be woken when the file's directory changes,
+  falling back to polling if it's unavailable. Either way we only read bytes
+  appended since our last check, and reopen the file if it's rotated or
+  truncated.
+
+  :param str path: tor log file to follow
+  :param function handler: called with a **list** of new
+    :class:`~nyx.log.LogEntry`, oldest first
+  :param float poll_rate: maximum seconds between checks of the file
+
+  :raises: **IOError** if unable to read the file
+  """
+
+  def __init__(self, path, handler, poll_rate = 1.0):
+    threading.Thread.__init__(self, name = 'log file follower')
+    self.setDaemon(True)
+
+    self._path = path
+    self._handler = handler
+    self._poll_rate = poll_rate
+    self._halt = threading.Event()
+
+    # start at the end since prior content is read when prepopulating
+
+    self._file = open(path, 'rb')
+    self._file.seek(0, os.SEEK_END)
+    self._inode = os.fstat(self._file.fileno()).st_ino
+    self._partial_line = b''
+
+  def stop(self):
+    self._halt.set()
+
+  def run(self):
+    watch_fd = _inotify_watch(os.path.dirname(self._path) or '.')
+
+    try:
+      while not self._halt.is_set():
+        self._check_file()
+
+        if watch_fd is None:
+          self._halt.wait(self._poll_rate)
+        elif select.select([watch_fd], [], [], self._poll_rate)[0]:
+          try:
+            while os.read(watch_fd, 4096):
+              pass  # we only use these events to be woken up
+          except OSError:
+            pass  # nothing more to read
+    finally:
+      if watch_fd is not None:
+        os.close(watch_fd)
+
+      if self._file:
+        self._file.close()
+
+  def _check_file(self):
+    """
+    Reads any new content, accounting for rotation and truncation.
+    """
+
+    try:
+      stat = os.stat(self._path)
+      current_inode, current_size = stat.st_ino, stat.st_size
+    except OSError:
+      current_inode, current_size = None, None  # rotated and not yet recreated
+
+    if self._file and current_inode is not None and current_inode != self._inode:
+      self._read_lines()  # remainder of the rotated file
+      self._file.close()
+      self._file = None
+
+    if not self._file:
+      if current_inode is None:
+        return
+
+      try:
+        self._file = open(self._path, 'rb')
+        self._inode = os.fstat(self._file.fileno()).st_ino
+        self._partial_line = b''
+      except IOError:
+        return
+    elif current_size is not None and current_size < self._file.tell():
+      self._file.seek(0)  # truncated
+      self._partial_line = b''
+
+    self._read_lines()
+
+  def _read_lines(self):
+    """
+    Parses content that's been appended to our file since we last read it.
+    """
+
+    isdst = time.localtime().tm_isdst
+
+    while True:
+      data = self._file.read(65536)
+
+      if not data:
+        break
+
+      lines = (self._partial_line + data).split(b'\n')
+      self._partial_line = lines.pop()  # incomplete until there's a newline
+      entries = []
+
+      for line in lines:
+        if stem.prereq.is_python_3():
+          line = line.decode('utf-8', 'replace')
+
+        if not line.strip():
+          continue
+
+        try:
+          entries.append(_parse_tor_log_line(self._path, line, isdst))
+        except ValueError:
+          pass  # not a tor log entry, such as a partially written line when truncated
+
+      if entries:
+        self._handler(entries)
+
+
+class LogRateLimiter(object):
+  """
+  Token bucket rate limiting of log entries, both by their type and by their
+  :func:`~nyx.log.LogEntry.dedup_key`. This way a flood of a single message
+  (or runlevel) can't evict everything else from our LogGroup.
+
+  Entries beyond our limit are counted rather than kept, and once our summary
+  interval has passed we provide a single entry noting how many were
+  suppressed. Buckets hold a second's worth of tokens, so short bursts are
+  allowed through.
+
+  :param int type_rate: entries per second allowed for each event type, zero
+    if unlimited
+  :param int message_rate: entries per second allowed for each set of similar
+    messages, zero if unlimited
+  :param int summary_interval: seconds we count suppressed messages before
+    summarizing them
+  :param dict type_rates: mapping of event types to rates overriding our
+    type_rate
+  :param int max_keys: maximum number of message buckets we retain
+  """
+
+  def __init__(self, type_rate = 100, message_rate = 10, summary_interval = 10, type_rates = None, max_keys = 1000):
+    self._type_rate = type_rate
+    self._message_rate = message_rate
+    self._summary_interval = summary_interval
+    self._type_rates = type_rates if type_rates else {}
+    self._max_keys = max_keys
+
+    self._type_buckets = {}  # event type => (tokens, last refilled)
+    self._message_buckets = collections.OrderedDict()  # dedup key => (tokens, last refilled), least recently used first
+    self._suppressed = collections.OrderedDict()  # dedup key => [count, first suppressed at, latest entry]
+    self._lock = threading.RLock()
+
+  def allow(self, entry, now = None):
+    """
+    Checks if this entry is within our rate limits, counting it as suppressed
+    if not.
+
+    :param nyx.log.LogEntry entry: entry to check
+    :param float now: current unix timestamp, our system time if **None**
+
+    :returns: **True** if this entry should be kept, **False** otherwise
+    """
+
+    now = time.time() if now is None else now
+    key = entry.dedup_key()
+
+    with self._lock:
+      # only spend tokens if both buckets have one, so entries our type
+      # bucket rejects don't drain their message's budget
+
+      message_tokens = _refill(self._message_buckets, key, self._message_rate, now)
+      type_tokens = _refill(self._type_buckets, entry.type, self._type_rates.get(entry.type, self._type_rate), now)
+      is_allowed = message_tokens >= 1 and type_tokens >= 1
+
+      if is_allowed:
+        _take_token(self._message_buckets, key)
+        _take_token(self._type_buckets, entry.type)
+      else:
+        if message_tokens >= 1:
+          key = (entry.type, None)  # throttled by type, so summarize them together
+
+        if key not in self._suppressed and len(self._suppressed) >= self._max_keys:
+          key = (entry.type, None)  # too many distinct messages, lump the rest together
+
+        if key in self._suppressed:
+          suppressed = self._suppressed[key]
+          suppressed[0] += 1
+          suppressed[2] = entry
+        else:
+          self._suppressed[key] = [1, now, entry]
+
+      while len(self._message_buckets) > self._max_keys:
+        self._message_buckets.popitem(last = False)
+
+      return is_allowed
+
+  def summaries(self, now = None):
+    """
+    Provides entries summarizing messages that have been suppressed for our
+    summary interval, and resets their counts.
+
+    :param float now: current unix timestamp, our system time if **None**
+
+    :returns: **list** of :class:`~nyx.log.LogEntry` summarizing suppressed
+      messages, oldest first
+    """
+
+    now = time.time() if now is None else now
+    summaries = []
+
+    with self._lock:
+      # ordered by when suppression started, so stop at the first that's not
+      # yet due
+
+      for key, (count, since, entry) in list(self._suppressed.items()):
+        if now - since < self._summary_interval:
+          break
+
+        summary = LogEntry(int(now), entry.type, nyx.msg('panel.log.suppressed_entries', count = count, seconds = int(now - since), msg = entry.message))
+        summary.summary_of = key
+        summaries.append(summary)
+        del self._suppressed[key]
+
+    return summaries
+
 
 class LogFilters(object):
   """
@@ -458,6 +1121,124 @@ class LogFilters(object):
       return copy
 
 
+def _inotify_watch(path):
+  """
+  Uses inotify to watch a directory for changes.
+
+  :param str path: directory to watch
+
+  :returns: **int** file descriptor that becomes readable when the directory
+    changes, or **None** if inotify is unavailable
+  """
+
+  try:
+    import ctypes
+    import ctypes.util
+
+    libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno = True)
+    watch_fd = libc.inotify_init1(INOTIFY_NONBLOCK | INOTIFY_CLOEXEC)
+  except (AttributeError, ImportError, OSError):
+    return None  # not linux, or no ctypes
+
+  if watch_fd < 0:
+    return None
+
+  if not isinstance(path, bytes):
+    path = path.encode('utf-8')
+
+  if libc.inotify_add_watch(watch_fd, ctypes.c_char_p(path), INOTIFY_MASK) < 0:
+    os.close(watch_fd)
+    return None
+
+  return watch_fd
+
+
+def _parse_tor_log_line(path, line, isdst):
+  """
+  Parses a line from tor's log file.
+
+  :param str path: log file the line came from
+  :param str line: line to be parsed
+  :param int isdst: daylight savings flag of our local time
+
+  :returns: :class:`~nyx.log.LogEntry` for the line
+
+  :raises: **ValueError** if the line isn't in the format we expect
+  """
+
+  # entries look like:
+  # Jul 15 18:29:48.806 [notice] Parsing GEOIP file.
+
+  line_comp = line.split()
+
+  # Checks that we have all the components we expect. This could happen if
+  # we're either not parsing a tor log or in weird edge cases (like being
+  # out of disk space).
+
+  if len(line_comp) < 4:
+    raise ValueError("Log located at %s has a line that doesn't match the format we expect: %s" % (path, line))
+  elif len(line_comp[3]) < 3 or line_comp[3][1:-1].upper() not in TOR_RUNLEVELS:
+    raise ValueError('Log located at %s has an unrecognized runlevel: %s' % (path, line_comp[3]))
+
+  runlevel = line_comp[3][1:-1].upper()
+  msg = ' '.join(line_comp[4:])
+  current_year = str(datetime.datetime.now().year)
+
+  # Pretending it's the current year. We don't know the actual year (#15607)
+  # and this may fail due to leap years when picking Feb 29th (#5265).
+
+  try:
+    timestamp_str = current_year + ' ' + ' '.join(line_comp[:3])
+    timestamp_str = timestamp_str.split('.', 1)[0]  # drop fractional seconds
+    timestamp_comp = list(time.strptime(timestamp_str, '%Y %b %d %H:%M:%S'))
+    timestamp_comp[8] = isdst
+
+    timestamp = int(time.mktime(tuple(timestamp_comp)))  # converts local to unix time
+
+    if timestamp > time.time():
+      # log entry is from before a year boundary
+      timestamp_comp[0] -= 1
+      timestamp = int(time.mktime(tuple(timestamp_comp)))
+  except ValueError:
+    raise ValueError("Log located at %s has a timestamp we don't recognize: %s" % (path, ' '.join(line_comp[:3])))
+
+  return LogEntry(timestamp, runlevel, msg)
+
+
+def _refill(buckets, key, rate, now):
+  """
+  Refills the given token bucket. Buckets hold up to a second's worth of
+  tokens.
+
+  :param dict buckets: mapping of keys to a (tokens, last refilled) tuple
+  :param object key: bucket to refill
+  :param int rate: tokens added each second, unlimited if zero
+  :param float now: current unix timestamp
+
+  :returns: **float** for the tokens available, infinite if unlimited
+  """
+
+  if rate <= 0:
+    return float('inf')
+
+  tokens, last_refilled = buckets.pop(key, (rate, now))  # popped so it becomes most recently used
+  tokens = min(rate, tokens + (now - last_refilled) * rate)
+  buckets[key] = (tokens, now)
+
+  return tokens
+
+
+def _take_token(buckets, key):
+  """
+  Takes a token from a bucket we've just refilled. This is a no-op for
+  unlimited buckets, which we don't track.
+  """
+
+  if key in buckets:
+    tokens, last_refilled = buckets[key]
+    buckets[key] = (tokens - 1, last_refilled)
+
+
 def trace(msg, **attr):
   _log(stem.util.log.TRACE, msg, **attr)
 
@@ -512,46 +1293,12 @@ def read_tor_log(path, read_limit = None):
   count, isdst = 0, time.localtime().tm_isdst
 
   for line in stem.util.system.tail(path, read_limit):
-    # entries look like:
-    # Jul 15 18:29:48.806 [notice] Parsing GEOIP file.
-
-    line_comp = line.split()
-
-    # Checks that we have all the components we expect. This could happen if
-    # we're either not parsing a tor log or in weird edge cases (like being
-    # out of disk space).
-
-    if len(line_comp) < 4:
-      raise ValueError("Log located at %s has a line that doesn't match the format we expect: %s" % (path, line))
-    elif len(line_comp[3]) < 3 or line_comp[3][1:-1].upper() not in TOR_RUNLEVELS:
-      raise ValueError('Log located at %s has an unrecognized runlevel: %s' % (path, line_comp[3]))
-
-    runlevel = line_comp[3][1:-1].upper()
-    msg = ' '.join(line_comp[4:])
-    current_year = str(datetime.datetime.now().year)
-
-    # Pretending it's the current year. We don't know the actual year (#15607)
-    # and this may fail due to leap years when picking Feb 29th (#5265).
-
-    try:
-      timestamp_str = current_year + ' ' + ' '.join(line_comp[:3])
-      timestamp_str = timestamp_str.split('.', 1)[0]  # drop fractional seconds
-      timestamp_comp = list(time.strptime(timestamp_str, '%Y %b %d %H:%M:%S'))
-      timestamp_comp[8] = isdst
-
-      timestamp = int(time.mktime(tuple(timestamp_comp)))  # converts local to unix time
-
-      if timestamp > time.time():
-        # log entry is from before a year boundary
-        timestamp_comp[0] -= 1
-        timestamp = int(time.mktime(timestamp_comp))
-    except ValueError:
-      raise ValueError("Log located at %s has a timestamp we don't recognize: %s" % (path, ' '.join(line_comp[:3])))
+    entry = _parse_tor_log_line(path, line, isdst)
 
     count += 1
-    yield LogEntry(timestamp, runlevel, msg)
+    yield entry
 
-    if 'opening log file' in msg:
+    if 'opening log file' in entry.message:
       break  # this entry marks the start of this tor instance
 
   info('panel.log.read_from_log_file', count = count, path = path, read_limit = read_limit if read_limit else 'none', runtime = '%0.3f' % (time.time() - start_time))
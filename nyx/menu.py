@@ -194,6 +194,7 @@ def make_log_menu(log_panel):
   Submenu for the log panel, consisting of...
     Events...
     Snapshot...
+    Search...
     Clear
     Show / Hide Duplicates
     Filter (Submenu)
@@ -206,6 +207,7 @@ def make_log_menu(log_panel):
 
   log_menu.add(MenuItem('Events...', log_panel.show_event_selection_prompt))
   log_menu.add(MenuItem('Snapshot...', log_panel.show_snapshot_prompt))
+  log_menu.add(MenuItem('Search...', log_panel.show_search_prompt))
   log_menu.add(MenuItem('Clear', log_panel.clear))
 
   if CONFIG['features.log.showDuplicateEntries']:
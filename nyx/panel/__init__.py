@@ -14,6 +14,7 @@ Panels consisting the nyx interface.
   Panel - panel within the interface
     |- DaemonPanel - panel that triggers actions at a set rate
     |  |- run - starts triggering daemon actions
+    |  |- request_update - triggers our action without waiting
     |  +- stop - stops triggering daemon actions
     |
     |- get_top - top position we're rendered into on the screen
@@ -174,10 +175,21 @@ class DaemonPanel(Panel, threading.Thread):
     self._pause_condition = threading.Condition()
     self._halt = False  # terminates thread if true
     self._update_rate = update_rate
+    self._update_requested = False
 
   def _update(self):
     pass
 
+  def request_update(self):
+    """
+    Performs our _update() action as soon as we can, rather than waiting for
+    our next scheduled run.
+    """
+
+    with self._pause_condition:
+      self._update_requested = True
+      self._pause_condition.notifyAll()
+
   def run(self):
     """
     Performs our _update() action at the given rate.
@@ -189,13 +201,14 @@ class DaemonPanel(Panel, threading.Thread):
     nyx_controller = nyx.controller.get_controller()
 
     while not self._halt:
-      if nyx_controller.is_paused() or (time.time() - last_ran) < self._update_rate:
+      if nyx_controller.is_paused() or (not self._update_requested and (time.time() - last_ran) < self._update_rate):
         with self._pause_condition:
           if not self._halt:
             self._pause_condition.wait(0.2)
 
         continue  # done waiting, try again
 
+      self._update_requested = False
       self._update()
       last_ran = time.time()
 
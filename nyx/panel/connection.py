@@ -5,29 +5,29 @@
 Listing of the currently established connections tor has made.
 """
 
+import os
 import re
 import time
+import bisect
 import collections
 import curses
+import functools
 import itertools
+import threading
 
 import nyx.controller
 import nyx.curses
+import nyx.history
+import nyx.log
 import nyx.panel
 import nyx.popups
 import nyx.tracker
 
 from nyx.curses import WHITE, NORMAL, BOLD, HIGHLIGHT
-from nyx import tor_controller
+from nyx import DATA_DIR, tor_controller
 
-from stem.control import Listener
-from stem.util import datetime_to_unix, conf, connection, enum, str_tools
-
-try:
-  # added in python 3.2
-  from functools import lru_cache
-except ImportError:
-  from stem.util.lru_cache import lru_cache
+from stem.control import EventType, Listener
+from stem.util import datetime_to_unix, conf, connection, enum, log, str_tools
 
 # height of the detail panel content, not counting top and bottom border
 
@@ -36,10 +36,15 @@ DETAILS_HEIGHT = 7
 EXIT_USAGE_WIDTH = 15
 UPDATE_RATE = 5  # rate in seconds at which we refresh
 
+# periods we can show client locale and exit port usage for
+
+USAGE_PERIODS = (('last hour', 3600), ('last day', 86400), ('since start', None))
+
 # cached information from our last _update() call
 
 LAST_RETRIEVED_HS_CONF = None
 LAST_RETRIEVED_CIRCUITS = None
+CLASSIFICATION_CONTEXT = None
 
 # Connection Categories:
 #   Inbound      Relay connection, coming to us.
@@ -52,8 +57,29 @@ LAST_RETRIEVED_CIRCUITS = None
 #   Control      Tor controller (nyx, vidalia, etc).
 
 Category = enum.Enum('INBOUND', 'OUTBOUND', 'EXIT', 'HIDDEN', 'SOCKS', 'CIRCUIT', 'DIRECTORY', 'CONTROL')
-SortAttr = enum.Enum('CATEGORY', 'UPTIME', 'IP_ADDRESS', 'PORT', 'FINGERPRINT', 'NICKNAME', 'COUNTRY')
-LineType = enum.Enum('CONNECTION', 'CIRCUIT_HEADER', 'CIRCUIT')
+SortAttr = enum.Enum('CATEGORY', 'UPTIME', 'IP_ADDRESS', 'PORT', 'FINGERPRINT', 'NICKNAME', 'COUNTRY', 'RATE')
+LineType = enum.Enum('CONNECTION', 'CIRCUIT_HEADER', 'CIRCUIT', 'GROUP')
+GroupBy = enum.Enum('NONE', 'RELAY', 'COUNTRY', 'PORT', 'CATEGORY')
+FilterAttr = enum.Enum('CATEGORY', 'COUNTRY', 'PORT', 'FINGERPRINT', 'NICKNAME', 'UPTIME', 'ADDRESS')
+
+# filter attributes looked up by value, and those that are looked up by range
+
+INVERTED_FILTER_ATTR = (FilterAttr.CATEGORY, FilterAttr.COUNTRY, FilterAttr.PORT)
+SORTED_FILTER_ATTR = (FilterAttr.FINGERPRINT, FilterAttr.NICKNAME, FilterAttr.UPTIME, FilterAttr.ADDRESS)
+
+TIME_UNITS = {'': 1, 's': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+ClassificationContext = collections.namedtuple('ClassificationContext', [
+  'inbound_ports',
+  'socks_ports',
+  'control_ports',
+  'hidden_service_ports',
+  'directory_fingerprints',
+  'has_circuits',
+  'exit_policy',
+])
+
+CacheStats = collections.namedtuple('CacheStats', ['hits', 'misses', 'evictions', 'size'])
 
 Line = collections.namedtuple('Line', [
   'entry',
@@ -69,6 +95,14 @@ Line = collections.namedtuple('Line', [
 def conf_handler(key, value):
   if key == 'features.connection.order':
     return conf.parse_enum_csv(key, value[0], SortAttr, 3)
+  elif key == 'features.connection.groupBy':
+    matches = [group_by for group_by in GroupBy if group_by.lower() == value.lower()]
+
+    if not matches:
+      log.warn("'%s' isn't a valid connection grouping, options are: %s" % (value, ', '.join([group_by.lower() for group_by in GroupBy])))
+      return CONFIG['features.connection.groupBy']  # keep the default
+
+    return matches[0]
 
 
 CONFIG = conf.config_dict('nyx', {
@@ -76,18 +110,779 @@ CONFIG = conf.config_dict('nyx', {
   'attr.connection.sort_color': {},
   'features.connection.resolveApps': True,
   'features.connection.order': [SortAttr.CATEGORY, SortAttr.IP_ADDRESS, SortAttr.UPTIME],
+  'features.connection.groupBy': GroupBy.NONE,
   'features.connection.showIps': True,
+  'features.connection.saveUsage': False,
+  'features.connection.usageLimit': 100,
 }, conf_handler)
 
 
+def _classification_context(controller, circuits, hs_conf):
+  """
+  Gathers what we need to determine the category of connections, so they can
+  each be classified with a few set lookups.
+
+  :param stem.control.Controller controller: tor controller to query
+  :param list circuits: circuits tor presently has
+  :param dict hs_conf: tor's hidden service configuration
+
+  :returns: :class:`~nyx.panel.connection.ClassificationContext` for tor's
+    present state
+  """
+
+  hidden_service_ports = set()
+
+  for hs_config in (hs_conf or {}).values():
+    for port_config in hs_config.get('HiddenServicePort', []):
+      if isinstance(port_config, tuple):
+        hidden_service_ports.add(port_config[-1])  # (virtual port, target address, target port)
+
+  return ClassificationContext(
+    inbound_ports = set(controller.get_ports(Listener.OR, [])).union(controller.get_ports(Listener.DIR, [])),
+    socks_ports = set(controller.get_ports(Listener.SOCKS, [])),
+    control_ports = set(controller.get_ports(Listener.CONTROL, [])),
+    hidden_service_ports = hidden_service_ports,
+    directory_fingerprints = set([circ.path[0][0] for circ in (circuits or []) if circ.path and len(circ.path) == 1 and circ.status == 'BUILT']),
+    has_circuits = bool(circuits),
+    exit_policy = controller.get_exit_policy(None),
+  )
+
+
+def _cached(func):
+  """
+  Memoizes an entry's method until the entry cache is invalidated. Unlike
+  lru_cache results are kept on the entry itself, so they're discarded with
+  it rather than keeping it alive.
+  """
+
+  @functools.wraps(func)
+  def wrapped(self):
+    generation = ENTRY_CACHE.generation()
+
+    if self._cache_generation != generation:
+      self._cache, self._cache_generation = {}, generation
+
+    try:
+      return self._cache[func.__name__]
+    except KeyError:
+      result = self._cache[func.__name__] = func(self)
+      return result
+
+  return wrapped
+
+
+class EntryCache(object):
+  """
+  Entries for the connections and circuits tor presently has, keyed by their
+  identity. Entries are retained for as long as their connection or circuit
+  exists, regardless of how many there are, and the information they derive
+  is invalidated when the consensus or our configuration changes.
+  """
+
+  def __init__(self):
+    self._lock = threading.RLock()
+    self._entries = {}  # identity => Entry
+    self._updated = []  # entries that changed during our last get_entries() call
+    self._generation = 0
+
+    self._hits = 0
+    self._misses = 0
+    self._evictions = 0
+
+  def get_entries(self, connections, circuits):
+    """
+    Provides entries for the given connections and circuits, reusing those we
+    made for them earlier. Entries for anything that's no longer present are
+    evicted.
+
+    :param list connections: :class:`~nyx.tracker.Connection` tor presently has
+    :param list circuits: :class:`~stem.response.events.CircuitEvent` tor
+      presently has
+
+    :returns: **list** of :class:`~nyx.panel.connection.Entry` for them
+    """
+
+    with self._lock:
+      new_entries, entries, self._updated = {}, [], []
+      keys = [(conn, ConnectionEntry) for conn in connections] + [(circ, CircuitEntry) for circ in circuits]
+
+      for target, entry_type in keys:
+        key = _circuit_key(target) if entry_type == CircuitEntry else target
+        entry = new_entries.get(key)
+
+        if entry is None:
+          entry = self._entries.get(key)
+
+          if entry is None:
+            entry = entry_type(target)
+            self._misses += 1
+          else:
+            self._hits += 1
+
+            if entry_type == CircuitEntry and entry.set_circuit(target):
+              self._updated.append(entry)
+
+          new_entries[key] = entry
+
+        entries.append(entry)
+
+      self._evictions += len(set(self._entries).difference(new_entries))
+      self._entries = new_entries
+      return entries
+
+  def updated_entries(self):
+    """
+    Provides the entries whose circuit changed during our last
+    :func:`~nyx.panel.connection.EntryCache.get_entries` call. These are
+    updated in place, so their sort order may have changed.
+
+    :returns: **list** of :class:`~nyx.panel.connection.Entry` that changed
+    """
+
+    return list(self._updated)
+
+  def generation(self):
+    """
+    Provides a value that changes whenever information derived for our entries
+    might be stale.
+
+    :returns: **tuple** that changes when our entries should be refreshed
+    """
+
+    return (self._generation, nyx.tracker.get_consensus_tracker().generation())
+
+  def invalidate(self):
+    """
+    Discards the information our entries have derived, so it's fetched again
+    when next requested.
+    """
+
+    self._generation += 1
+
+  def stats(self):
+    """
+    Provides how effective we've been at reusing entries.
+
+    :returns: :class:`~nyx.panel.connection.CacheStats` for our lookups
+    """
+
+    with self._lock:
+      return CacheStats(self._hits, self._misses, self._evictions, len(self._entries))
+
+
+def _reset_classification():
+  """
+  Discards the categories we've determined for connections, for instance
+  because tor's ports or exit policy changed.
+  """
+
+  global CLASSIFICATION_CONTEXT
+
+  CLASSIFICATION_CONTEXT = None
+  ENTRY_CACHE.invalidate()
+
+
+def _circuit_key(circuit):
+  # circuits are reported anew with each change, so we identify them by their
+  # id rather than the instance
+
+  return ('circuit', circuit.id)
+
+
+ENTRY_CACHE = EntryCache()
+
+# attributes that change while an entry exists, so can't be sorted by once
+
+VOLATILE_SORT_ATTR = (SortAttr.RATE,)
+
+
+class SortedEntries(object):
+  """
+  Entries ordered by a list of sort attributes. Each entry's sort values are
+  computed once and kept for its lifetime, so as entries come and go they're
+  inserted and removed by bisection rather than sorting everything again.
+
+  :param list order: :data:`~nyx.panel.connection.SortAttr` to sort by
+  """
+
+  def __init__(self, order):
+    self._order = list(order)
+    self._generation = None
+
+    self._keys = []  # sorted (sort values, serial) tuples
+    self._entries = []  # entries in the same order as our keys
+    self._entry_keys = {}  # entry => its key
+    self._sort_values = {}  # entry => {attr => sort value}
+    self._serial = itertools.count()
+    self._lock = threading.RLock()
+
+  def entries(self):
+    """
+    Provides our entries in sorted order.
+
+    :returns: **list** of :class:`~nyx.panel.connection.Entry`
+    """
+
+    with self._lock:
+      return list(self._entries)
+
+  def update(self, entries, updated = ()):
+    """
+    Changes the entries we order, only sorting those that are new.
+
+    :param list entries: :class:`~nyx.panel.connection.Entry` we should have
+    :param list updated: entries whose sort values may have changed
+    """
+
+    generation = ENTRY_CACHE.generation()
+    entries = list(collections.OrderedDict.fromkeys(entries))
+
+    with self._lock:
+      if generation != self._generation or any([attr in VOLATILE_SORT_ATTR for attr in self._order]):
+        # values our sort is based on may have changed, so start over
+
+        self._generation = generation
+        self._sort_values = {}
+        self._entry_keys = dict([(entry, (self._sort_key(entry), next(self._serial))) for entry in entries])
+        self._resort()
+        return
+
+      new_entries, updated = set(entries), set(updated)
+
+      for entry in [entry for entry in self._entries if entry not in new_entries or entry in updated]:
+        index = bisect.bisect_left(self._keys, self._entry_keys.pop(entry))
+        del self._keys[index]
+        del self._entries[index]
+        self._sort_values.pop(entry, None)
+
+      for entry in entries:
+        if entry not in self._entry_keys:
+          key = (self._sort_key(entry), next(self._serial))
+          index = bisect.bisect_right(self._keys, key)
+
+          self._entry_keys[entry] = key
+          self._keys.insert(index, key)
+          self._entries.insert(index, entry)
+
+  def set_order(self, order):
+    """
+    Changes the attributes we sort by, reusing the values we have for them.
+
+    :param list order: :data:`~nyx.panel.connection.SortAttr` to sort by
+    """
+
+    with self._lock:
+      self._order = list(order)
+      self._entry_keys = dict([(entry, (self._sort_key(entry), key[1])) for entry, key in self._entry_keys.items()])
+      self._resort()
+
+  def _sort_key(self, entry):
+    values = self._sort_values.setdefault(entry, {})
+
+    for attr in self._order:
+      if attr not in values or attr in VOLATILE_SORT_ATTR:
+        values[attr] = entry.sort_value(attr)
+
+    return tuple([values[attr] for attr in self._order])
+
+  def _resort(self):
+    ordered = sorted(self._entry_keys.items(), key = lambda item: item[1])
+    self._keys = [key for entry, key in ordered]
+    self._entries = [entry for entry, key in ordered]
+
+
+def parse_filter(text):
+  """
+  Parses criteria for the connections to show. These are space separated
+  terms that must all match, of the form...
+
+  ::
+
+    category:<category>   connection type, such as 'inbound' or 'exit'
+    country:<locale>      two letter country code
+    port:<port>           local or remote port
+    fingerprint:<prefix>  start of a relay's fingerprint
+    nickname:<prefix>     start of a relay's nickname
+    address:<prefix>      start of the remote address
+    uptime:<duration>     established at least this long ago, or more
+                          recently if prefixed with '<' (ex. 'uptime:<5m')
+    <prefix>              start of an address, fingerprint, or nickname
+
+  :param str text: criteria to parse
+
+  :returns: **list** of (attribute, value) tuples, the attribute being
+    **None** for terms that aren't qualified
+
+  :raises: **ValueError** if the criteria is malformed
+  """
+
+  criteria = []
+
+  for term in text.split():
+    if ':' not in term:
+      criteria.append((None, term))
+      continue
+
+    keyword, value = term.split(':', 1)
+    attr = keyword.upper()
+
+    if attr not in FilterAttr.keys():
+      raise ValueError("'%s' isn't something we can filter by, options are: %s" % (keyword, ', '.join([key.lower() for key in FilterAttr.keys()])))
+    elif not value:
+      raise ValueError("'%s' lacks a value" % term)
+
+    attr = FilterAttr[attr]
+
+    if attr == FilterAttr.CATEGORY:
+      matches = [category for category in Category if category.lower() == value.lower()]
+
+      if not matches:
+        raise ValueError("'%s' isn't a connection category, options are: %s" % (value, ', '.join([category.lower() for category in Category])))
+
+      value = matches[0]
+    elif attr == FilterAttr.PORT:
+      if not connection.is_valid_port(value):
+        raise ValueError("'%s' isn't a valid port" % value)
+
+      value = int(value)
+    elif attr == FilterAttr.UPTIME:
+      is_newer = value.startswith('<')
+      match = re.match('^([0-9]+)([smhd]?)$', value.lstrip('<>'))
+
+      if not match:
+        raise ValueError("'%s' isn't a duration like '30s', '5m', or '2h'" % value)
+
+      value = (is_newer, int(match.group(1)) * TIME_UNITS[match.group(2)])
+    elif attr == FilterAttr.COUNTRY:
+      value = value.lower()
+    elif attr == FilterAttr.FINGERPRINT:
+      value = value.upper()
+    elif attr == FilterAttr.NICKNAME:
+      value = value.lower()
+
+    criteria.append((attr, value))
+
+  return criteria
+
+
+class FilterIndex(object):
+  """
+  Indexes of entries by the attributes we can filter on, so the entries
+  matching a filter can be found without checking each of them. Categories,
+  countries, and ports are inverted maps of their value to entries. The others
+  are sorted arrays, for looking up prefixes and uptime ranges by bisection.
+  Like :class:`~nyx.panel.connection.SortedEntries` these are updated with the
+  entries that come and go.
+  """
+
+  def __init__(self):
+    self._lock = threading.RLock()
+    self._generation = None
+    self._serial = itertools.count()
+
+    self._inverted = dict([(attr, {}) for attr in INVERTED_FILTER_ATTR])  # attr => {value => set of entries}
+    self._sorted = dict([(attr, ([], [])) for attr in SORTED_FILTER_ATTR])  # attr => (sorted (value, serial) tuples, entries)
+    self._indexed = {}  # entry => (serial, set of (attr, value) it's indexed by)
+
+  def update(self, entries, updated = ()):
+    """
+    Changes the entries we index, only indexing those that are new.
+
+    :param list entries: :class:`~nyx.panel.connection.Entry` we should have
+    :param list updated: entries whose attributes may have changed
+    """
+
+    generation = ENTRY_CACHE.generation()
+    new_entries, updated = set(entries), set(updated)
+
+    with self._lock:
+      if generation != self._generation:
+        # attributes we indexed by may have changed, so start over
+
+        self._generation = generation
+        updated = set(self._indexed)
+
+      for entry in [entry for entry in self._indexed if entry not in new_entries or entry in updated]:
+        self._remove(entry)
+
+      for entry in new_entries:
+        if entry not in self._indexed:
+          self._add(entry)
+
+  def select(self, criteria, current_time = None):
+    """
+    Provides the entries that match all the given criteria.
+
+    :param list criteria: (attribute, value) tuples from
+      :func:`~nyx.panel.connection.parse_filter`
+    :param float current_time: unix timestamp uptimes are relative to
+
+    :returns: **set** of :class:`~nyx.panel.connection.Entry` that match
+    """
+
+    current_time = time.time() if current_time is None else current_time
+
+    with self._lock:
+      if not criteria:
+        return set(self._indexed)
+
+      matches = []
+
+      for attr, value in criteria:
+        if attr is None:
+          matches.append(self._prefixed(FilterAttr.ADDRESS, value).union(self._prefixed(FilterAttr.FINGERPRINT, value.upper()), self._prefixed(FilterAttr.NICKNAME, value.lower())))
+        elif attr in INVERTED_FILTER_ATTR:
+          matches.append(set(self._inverted[attr].get(value, ())))
+        elif attr == FilterAttr.UPTIME:
+          is_newer, seconds = value
+          keys, entries = self._sorted[attr]
+          index = bisect.bisect_right(keys, (current_time - seconds, float('inf')))
+          matches.append(set(entries[index:] if is_newer else entries[:index]))
+        else:
+          matches.append(self._prefixed(attr, value))
+
+    matches.sort(key = len)
+    return matches[0].intersection(*matches[1:])
+
+  def _prefixed(self, attr, prefix):
+    keys, entries = self._sorted[attr]
+    start = bisect.bisect_left(keys, (prefix,))
+    end = bisect.bisect_left(keys, (prefix + u'\uffff',))
+    return set(entries[start:end])
+
+  def _add(self, entry):
+    serial, values = next(self._serial), _filter_values(entry)
+
+    for attr, value in values:
+      if attr in INVERTED_FILTER_ATTR:
+        self._inverted[attr].setdefault(value, set()).add(entry)
+      else:
+        keys, entries = self._sorted[attr]
+        index = bisect.bisect_right(keys, (value, serial))
+        keys.insert(index, (value, serial))
+        entries.insert(index, entry)
+
+    self._indexed[entry] = (serial, values)
+
+  def _remove(self, entry):
+    serial, values = self._indexed.pop(entry)
+
+    for attr, value in values:
+      if attr in INVERTED_FILTER_ATTR:
+        matches = self._inverted[attr][value]
+        matches.discard(entry)
+
+        if not matches:
+          del self._inverted[attr][value]
+      else:
+        keys, entries = self._sorted[attr]
+        index = bisect.bisect_left(keys, (value, serial))
+        del keys[index]
+        del entries[index]
+
+
+def _filter_values(entry):
+  """
+  Provides the (attribute, value) tuples an entry can be filtered by. We don't
+  include addresses or countries for connections we scrub, since filtering
+  on them would reveal those.
+  """
+
+  lines = entry.get_lines()
+  values = set([(FilterAttr.CATEGORY, entry.get_type()), (FilterAttr.UPTIME, lines[0].connection.start_time)])
+
+  for line in lines:
+    values.add((FilterAttr.PORT, line.connection.remote_port))
+
+    if line.line_type == LineType.CONNECTION:
+      values.add((FilterAttr.PORT, line.connection.local_port))
+
+    if line.fingerprint:
+      values.add((FilterAttr.FINGERPRINT, line.fingerprint))
+
+    if line.nickname:
+      values.add((FilterAttr.NICKNAME, line.nickname.lower()))
+
+    if not entry.is_private():
+      values.add((FilterAttr.ADDRESS, line.connection.remote_address))
+
+      if line.locale:
+        values.add((FilterAttr.COUNTRY, line.locale.lower()))
+
+  return values
+
+
+class ConnectionGroup(object):
+  """
+  Entries that share a relay, country, port, or category. Counts and uptimes
+  are updated as entries are added and removed, so they're available without
+  looking at our members.
+
+  :var str group_by: :data:`~nyx.panel.connection.GroupBy` of this group
+  :var object key: value our members share, **None** if it's unknown
+
+  :param str group_by: :data:`~nyx.panel.connection.GroupBy` of this group
+  :param object key: value our members share
+  """
+
+  def __init__(self, group_by, key):
+    self.group_by = group_by
+    self.key = key
+
+    self._members = set()
+    self._start_times = []  # sorted start times of our members
+    self._start_time_total = 0.0
+
+  def add(self, entry):
+    start_time = entry.get_lines()[0].connection.start_time
+
+    self._members.add(entry)
+    bisect.insort(self._start_times, start_time)
+    self._start_time_total += start_time
+
+    return start_time
+
+  def remove(self, entry, start_time):
+    self._members.discard(entry)
+    del self._start_times[bisect.bisect_left(self._start_times, start_time)]
+    self._start_time_total -= start_time
+
+  def members(self):
+    """
+    Provides the entries within this group.
+
+    :returns: **set** of :class:`~nyx.panel.connection.Entry` in this group
+    """
+
+    return set(self._members)
+
+  def count(self):
+    """
+    Provides the number of entries within this group.
+
+    :returns: **int** for the number of entries we have
+    """
+
+    return len(self._start_times)
+
+  def uptime(self, current_time):
+    """
+    Provides the shortest and average uptime of our entries.
+
+    :param float current_time: unix timestamp uptimes are relative to
+
+    :returns: **tuple** of the form (minimum, average) in seconds
+    """
+
+    if not self._start_times:
+      return 0, 0
+
+    return current_time - self._start_times[-1], current_time - self._start_time_total / len(self._start_times)
+
+  def get_rate(self):
+    """
+    Provides the combined throughput of our entries.
+
+    :returns: :class:`~nyx.tracker.Rate` for our entries, **None** if tor
+      hasn't reported any
+    """
+
+    rates = [rate for rate in [entry.get_rate() for entry in list(self._members)] if rate]
+
+    if not rates:
+      return None
+
+    return nyx.tracker.Rate(sum([rate.read for rate in rates]), sum([rate.written for rate in rates]))
+
+  def get_lines(self):
+    fingerprint = self.key if self.group_by == GroupBy.RELAY else None
+    locale = self.key if self.group_by == GroupBy.COUNTRY else None
+
+    return [Line(self, LineType.GROUP, None, None, fingerprint, None, locale)]
+
+  def get_type(self):
+    return self.key if self.group_by == GroupBy.CATEGORY else None
+
+  def is_private(self):
+    return False
+
+
+class ConnectionGroups(object):
+  """
+  Our entries grouped by a shared attribute. As with
+  :class:`~nyx.panel.connection.SortedEntries` we're updated with the entries
+  that come and go, so only those are regrouped.
+
+  :param str group_by: :data:`~nyx.panel.connection.GroupBy` to group entries by
+  """
+
+  def __init__(self, group_by):
+    self._group_by = group_by
+    self._generation = None
+
+    self._groups = {}  # key => ConnectionGroup
+    self._membership = {}  # entry => (key, start time)
+    self._lock = threading.RLock()
+
+  def group_by(self):
+    return self._group_by
+
+  def set_group_by(self, group_by):
+    """
+    Changes the attribute we group by, regrouping all our entries.
+
+    :param str group_by: :data:`~nyx.panel.connection.GroupBy` to group entries by
+    """
+
+    with self._lock:
+      entries = list(self._membership) if group_by != GroupBy.NONE else []
+      self._group_by, self._groups, self._membership = group_by, {}, {}
+      self.update(entries)
+
+  def update(self, entries, updated = ()):
+    """
+    Changes the entries we group, only grouping those that are new.
+
+    :param list entries: :class:`~nyx.panel.connection.Entry` we should have
+    :param list updated: entries whose attributes may have changed
+    """
+
+    generation = ENTRY_CACHE.generation()
+    new_entries, updated = set(entries), set(updated)
+
+    with self._lock:
+      if generation != self._generation:
+        self._generation = generation
+        updated = set(self._membership)  # attributes may have changed
+
+      for entry in [entry for entry in self._membership if entry not in new_entries or entry in updated]:
+        key, start_time = self._membership.pop(entry)
+        group = self._groups[key]
+        group.remove(entry, start_time)
+
+        if not group.count():
+          del self._groups[key]
+
+      for entry in new_entries:
+        if entry not in self._membership:
+          key = _group_key(entry, self._group_by)
+          group = self._groups.get(key)
+
+          if group is None:
+            group = self._groups[key] = ConnectionGroup(self._group_by, key)
+
+          self._membership[entry] = (key, group.add(entry))
+
+  def groups(self):
+    """
+    Provides our groups, largest first.
+
+    :returns: **list** of :class:`~nyx.panel.connection.ConnectionGroup`
+    """
+
+    with self._lock:
+      return sorted(self._groups.values(), key = lambda group: (-group.count(), str(group.key)))
+
+  def key_of(self, entry):
+    """
+    Provides the group an entry belongs to.
+
+    :param nyx.panel.connection.Entry entry: entry to look up
+
+    :returns: key of the entry's group, **None** if it's unknown
+    """
+
+    with self._lock:
+      return self._membership.get(entry, (None, None))[0]
+
+
+def _group_key(entry, group_by):
+  line = entry.get_lines()[0]
+
+  if group_by == GroupBy.RELAY:
+    return line.fingerprint
+  elif group_by == GroupBy.COUNTRY:
+    return line.locale if (line.locale and not entry.is_private()) else None
+  elif group_by == GroupBy.PORT:
+    return line.connection.remote_port
+  elif group_by == GroupBy.CATEGORY:
+    return entry.get_type()
+  else:
+    return None
+
+
+class LineIndex(object):
+  """
+  Flattened lines of a list of entries, along with the offset each entry's
+  lines start at. This lets us look up a line's position in constant time
+  rather than searching every line. Lines are fetched again if the entry cache
+  is invalidated.
+
+  :param list entries: :class:`~nyx.panel.connection.Entry` we provide lines for
+  """
+
+  def __init__(self, entries):
+    self._entries = list(entries)
+    self._state = self._build()
+
+  def index(self, line):
+    """
+    Provides the position of a line.
+
+    :param nyx.panel.connection.Line line: line to locate
+
+    :returns: **int** position of the line
+
+    :raises: **ValueError** if we don't have this line
+    """
+
+    generation, lines, offsets = self._current()
+    offset = offsets.get(getattr(line, 'entry', None))
+
+    if offset is not None:
+      for i, entry_line in enumerate(line.entry.get_lines()):
+        if entry_line == line:
+          return offset + i
+
+    raise ValueError('%s is not among our lines' % (line,))
+
+  def _current(self):
+    state = self._state
+
+    if state[0] != ENTRY_CACHE.generation():
+      state = self._state = self._build()
+
+    return state
+
+  def _build(self):
+    generation, lines, offsets = ENTRY_CACHE.generation(), [], {}
+
+    for entry in self._entries:
+      offsets.setdefault(entry, len(lines))
+      lines.extend(entry.get_lines())
+
+    return generation, lines, offsets
+
+  def __getitem__(self, index):
+    return self._current()[1][index]
+
+  def __iter__(self):
+    return iter(self._current()[1])
+
+  def __len__(self):
+    return len(self._current()[1])
+
+
 class Entry(object):
+  def __init__(self):
+    self._cache = {}
+    self._cache_generation = None
+
   @staticmethod
-  @lru_cache()
   def from_connection(connection):
     return ConnectionEntry(connection)
 
   @staticmethod
-  @lru_cache()
   def from_circuit(circuit):
     return CircuitEntry(circuit)
 
@@ -120,6 +915,18 @@ class Entry(object):
 
     raise NotImplementedError('should be implemented by subclasses')
 
+  def get_rate(self):
+    """
+    Provides the throughput tor has recently reported for this entry. This
+    changes with every bandwidth event so unlike our other attributes it isn't
+    cached.
+
+    :returns: :class:`~nyx.tracker.Rate` for this entry, **None** if tor
+      hasn't reported any
+    """
+
+    raise NotImplementedError('should be implemented by subclasses')
+
   def sort_value(self, attr):
     """
     Provides a heuristic for sorting by a given value.
@@ -150,15 +957,19 @@ class Entry(object):
       return line.connection.start_time
     elif attr == SortAttr.COUNTRY:
       return line.locale if (line.locale and not self.is_private()) else at_end
+    elif attr == SortAttr.RATE:
+      rate = self.get_rate()
+      return -(rate.read + rate.written) if rate else 0  # busiest first
     else:
       return ''
 
 
 class ConnectionEntry(Entry):
   def __init__(self, connection):
+    Entry.__init__(self)
     self._connection = connection
 
-  @lru_cache()
+  @_cached
   def get_lines(self):
     fingerprint, nickname, locale = None, None, None
 
@@ -171,41 +982,38 @@ class ConnectionEntry(Entry):
 
     return [Line(self, LineType.CONNECTION, self._connection, None, fingerprint, nickname, locale)]
 
-  @lru_cache()
+  def get_rate(self):
+    return nyx.tracker.get_throughput_tracker().get_connection_rate(self._connection.remote_address, self._connection.remote_port, self.get_lines()[0].fingerprint)
+
+  @_cached
   def get_type(self):
-    controller = tor_controller()
+    global CLASSIFICATION_CONTEXT
 
-    if self._connection.local_port in controller.get_ports(Listener.OR, []):
-      return Category.INBOUND
-    elif self._connection.local_port in controller.get_ports(Listener.DIR, []):
+    context = CLASSIFICATION_CONTEXT
+
+    if context is None:
+      context = CLASSIFICATION_CONTEXT = _classification_context(tor_controller(), LAST_RETRIEVED_CIRCUITS, LAST_RETRIEVED_HS_CONF)
+
+    if self._connection.local_port in context.inbound_ports:
       return Category.INBOUND
-    elif self._connection.local_port in controller.get_ports(Listener.SOCKS, []):
+    elif self._connection.local_port in context.socks_ports:
       return Category.SOCKS
-    elif self._connection.local_port in controller.get_ports(Listener.CONTROL, []):
+    elif self._connection.local_port in context.control_ports:
       return Category.CONTROL
-
-    if LAST_RETRIEVED_HS_CONF:
-      for hs_config in LAST_RETRIEVED_HS_CONF.values():
-        if self._connection.remote_port == hs_config['HiddenServicePort']:
-          return Category.HIDDEN
+    elif self._connection.remote_port in context.hidden_service_ports:
+      return Category.HIDDEN
 
     fingerprint = nyx.tracker.get_consensus_tracker().get_relay_fingerprints(self._connection.remote_address).get(self._connection.remote_port)
 
-    if fingerprint and LAST_RETRIEVED_CIRCUITS:
-      for circ in LAST_RETRIEVED_CIRCUITS:
-        if circ.path and len(circ.path) == 1 and circ.path[0][0] == fingerprint and circ.status == 'BUILT':
-          return Category.DIRECTORY  # one-hop circuit to retrieve directory information
-    else:
-      # not a known relay, might be an exit connection
-
-      exit_policy = controller.get_exit_policy(None)
-
-      if exit_policy and exit_policy.can_exit_to(self._connection.remote_address, self._connection.remote_port):
-        return Category.EXIT
+    if fingerprint and context.has_circuits:
+      if fingerprint in context.directory_fingerprints:
+        return Category.DIRECTORY  # one-hop circuit to retrieve directory information
+    elif context.exit_policy and context.exit_policy.can_exit_to(self._connection.remote_address, self._connection.remote_port):
+      return Category.EXIT  # not a known relay, might be an exit connection
 
     return Category.OUTBOUND
 
-  @lru_cache()
+  @_cached
   def is_private(self):
     if not CONFIG['features.connection.showIps']:
       return True
@@ -226,9 +1034,27 @@ class ConnectionEntry(Entry):
 
 class CircuitEntry(Entry):
   def __init__(self, circuit):
+    Entry.__init__(self)
     self._circuit = circuit
 
-  @lru_cache()
+  def set_circuit(self, circuit):
+    """
+    Updates us with the latest information tor has reported for our circuit.
+
+    :param stem.response.events.CircuitEvent circuit: newest state of our circuit
+
+    :returns: **True** if its status or path changed, **False** otherwise
+    """
+
+    is_changed = (circuit.status, circuit.path) != (self._circuit.status, self._circuit.path)
+    self._circuit = circuit
+
+    if is_changed:
+      self._cache = {}
+
+    return is_changed
+
+  @_cached
   def get_lines(self):
     def line(fingerprint, line_type):
       address, port, nickname, locale = '0.0.0.0', 0, None, None
@@ -239,7 +1065,8 @@ class CircuitEntry(Entry):
         nickname = consensus_tracker.get_relay_nickname(fingerprint)
         locale = tor_controller().get_info('ip-to-country/%s' % address, None)
 
-      connection = nyx.tracker.Connection(datetime_to_unix(self._circuit.created), False, '127.0.0.1', 0, address, port, 'tcp', False)
+      start_time = datetime_to_unix(self._circuit.created) if self._circuit.created else time.time()
+      connection = nyx.tracker.Connection(start_time, False, '127.0.0.1', 0, address, port, 'tcp', False)
       return Line(self, line_type, connection, self._circuit, fingerprint, nickname, locale)
 
     header_line = line(self._circuit.path[-1][0] if self._circuit.status == 'BUILT' else None, LineType.CIRCUIT_HEADER)
@@ -248,6 +1075,9 @@ class CircuitEntry(Entry):
   def get_type(self):
     return Category.CIRCUIT
 
+  def get_rate(self):
+    return nyx.tracker.get_throughput_tracker().get_circuit_rate(self._circuit.id)
+
   def is_private(self):
     return False
 
@@ -261,17 +1091,40 @@ class ConnectionPanel(nyx.panel.DaemonPanel):
   def __init__(self):
     nyx.panel.DaemonPanel.__init__(self, UPDATE_RATE)
 
-    self._scroller = nyx.curses.CursorScroller()
+    self._scroller = nyx.curses.CursorScroller(indexed = True)
     self._entries = []            # last fetched display entries
+    self._lines = LineIndex([])   # lines of our entries
     self._show_details = False    # presents the details panel if true
     self._sort_order = CONFIG['features.connection.order']
+    self._sorted_entries = SortedEntries(self._sort_order)
+    self._filter_index = FilterIndex()
+    self._filter = None           # text of our present filter
+    self._filter_criteria = []    # parsed criteria of our present filter
+    self._groups = ConnectionGroups(CONFIG['features.connection.groupBy'])
+    self._expanded_groups = set()  # keys of groups we're showing the members of
+    self._lock = threading.RLock()  # guards the above, which our update and ui threads both change
 
     self._last_resource_fetch = -1  # timestamp of the last ConnectionResolver results used
 
-    # Tracks exiting port and client country statistics
+    nyx.tracker.get_throughput_tracker()  # start listening for bandwidth events
+
+    # refresh as soon as our circuits change
+
+    nyx.tracker.get_circuit_tracker()
+    tor_controller().add_event_listener(lambda event: self.request_update(), EventType.CIRC)
+    self._last_circuit_generation = None
+
+    # Entries derive their type and privacy from tor's configuration and ours,
+    # so refresh them when either changes.
 
-    self._client_locale_usage = {}
-    self._exit_port_usage = {}
+    tor_controller().add_event_listener(lambda event: _reset_classification(), EventType.CONF_CHANGED)
+    conf.get_config('nyx').add_listener(lambda config, key: ENTRY_CACHE.invalidate() if key.startswith('features.connection.') else None, backfill = False)
+
+    # Tracks exiting port and client country statistics. Connections are
+    # only counted once, so we remember those we've counted until they close.
+
+    self._client_locale_usage = _usage_counts('client_locales')
+    self._exit_port_usage = _usage_counts('exit_ports')
     self._counted_connections = set()
 
     # If we're a bridge and been running over a day then prepopulates with the
@@ -294,7 +1147,7 @@ class ConnectionPanel(nyx.panel.DaemonPanel):
         for entry in country_summary.split(','):
           if re.match('^..=[0-9]+$', entry):
             locale, count = entry.split('=', 1)
-            self._client_locale_usage[locale] = int(count)
+            self._client_locale_usage.add(locale, int(count), in_window = False)  # we don't know when these were seen
 
   def show_sort_dialog(self):
     """
@@ -305,8 +1158,125 @@ class ConnectionPanel(nyx.panel.DaemonPanel):
     results = nyx.popups.select_sort_order('Connection Ordering:', SortAttr, self._sort_order, sort_colors)
 
     if results:
-      self._sort_order = results
-      self._entries = sorted(self._entries, key = lambda entry: [entry.sort_value(attr) for attr in self._sort_order])
+      with self._lock:
+        self._sort_order = results
+        self._sorted_entries.set_order(results)
+        self._apply_filter()
+
+  def set_filter(self, text):
+    """
+    Only shows the connections that match the given criteria.
+
+    :param str text: criteria in the form described by
+      :func:`~nyx.panel.connection.parse_filter`, showing everything if
+      **None** or blank
+
+    :raises: **ValueError** if the criteria is malformed
+    """
+
+    criteria = parse_filter(text) if text else []
+
+    with self._lock:
+      self._filter, self._filter_criteria = text if criteria else None, criteria
+      self._apply_filter()
+
+  def show_filter_prompt(self):
+    """
+    Prompts the user for criteria to filter connections by, which are applied
+    as they're typed.
+    """
+
+    original_filter = self._filter
+
+    def _on_change(text):
+      try:
+        self.set_filter(text)
+        self.redraw()
+      except ValueError:
+        pass  # likely incomplete, so keep our prior filter until it's finished
+
+    user_input = nyx.controller.input_prompt('Filter: ', original_filter if original_filter else '', _on_change)
+
+    try:
+      self.set_filter(original_filter if user_input is None else user_input)
+    except ValueError as exc:
+      nyx.log.notice('panel.connection.bad_filter', reason = exc, criteria = user_input)
+      self.set_filter(original_filter)
+
+    self.redraw()
+
+  def set_group_by(self, group_by):
+    """
+    Collapses our connections into groups that share an attribute.
+
+    :param str group_by: :data:`~nyx.panel.connection.GroupBy` to group by
+    """
+
+    with self._lock:
+      self._groups.set_group_by(group_by)
+      self._expanded_groups = set()
+      self._apply_filter()
+
+  def toggle_group(self, group):
+    """
+    Shows or hides the members of a group.
+
+    :param nyx.panel.connection.ConnectionGroup group: group to toggle
+    """
+
+    with self._lock:
+      if group.key in self._expanded_groups:
+        self._expanded_groups.remove(group.key)
+      else:
+        self._expanded_groups.add(group.key)
+
+      self._apply_filter()
+
+  def _apply_filter(self, updated = ()):
+    """
+    Rebuilds the lines we display from our sorted entries, filter, and
+    groups. This is called from both our update and ui threads.
+    """
+
+    with self._lock:
+      entries = self._sorted_entries.entries()
+
+      if self._filter_criteria:
+        matches = self._filter_index.select(self._filter_criteria)
+        entries = [entry for entry in entries if entry in matches]
+
+      self._entries = entries
+
+      if self._groups.group_by() == GroupBy.NONE:
+        self._lines = LineIndex(entries)
+        return
+
+      self._groups.update(entries, updated)
+      members = {}
+
+      if self._expanded_groups:
+        for entry in entries:
+          key = self._groups.key_of(entry)
+
+          if key in self._expanded_groups:
+            members.setdefault(key, []).append(entry)
+
+      rows = []
+
+      for group in self._groups.groups():
+        rows.append(group)
+        rows += members.get(group.key, [])
+
+      self._lines = LineIndex(rows)
+
+  def run(self):
+    """
+    Performs our updates until we're stopped, then persists our usage
+    statistics, which are otherwise only saved periodically.
+    """
+
+    nyx.panel.DaemonPanel.run(self)
+    self._save_usage(force = True)
 
   def key_handlers(self):
     def _scroll(key):
@@ -315,22 +1285,30 @@ class ConnectionPanel(nyx.panel.DaemonPanel):
       if self._show_details:
         page_height -= (DETAILS_HEIGHT + 1)
 
-      lines = list(itertools.chain.from_iterable([entry.get_lines() for entry in self._entries]))
-      is_changed = self._scroller.handle_key(key, lines, page_height)
+      is_changed = self._scroller.handle_key(key, self._lines, page_height)
 
       if is_changed:
         self.redraw()
 
     def _show_details():
-      self._show_details = not self._show_details
+      selected = self._scroller.selection(self._lines)
+
+      if selected and selected.line_type == LineType.GROUP:
+        self.toggle_group(selected.entry)
+      else:
+        self._show_details = not self._show_details
+
       self.redraw()
 
-    def _show_descriptor():
-      entries = self._entries
+    def _pick_grouping():
+      options = [group_by.lower() for group_by in GroupBy]
+      selected = nyx.popups.select_from_list('Group Connections By:', options, self._groups.group_by().lower())
+      self.set_group_by([group_by for group_by in GroupBy if group_by.lower() == selected][0])
+      self.redraw()
 
+    def _show_descriptor():
       while True:
-        lines = list(itertools.chain.from_iterable([entry.get_lines() for entry in entries]))
-        selected = self._scroller.selection(lines)
+        selected = self._scroller.selection(self._lines)
 
         if not selected:
           break
@@ -361,21 +1339,14 @@ class ConnectionPanel(nyx.panel.DaemonPanel):
       self.redraw()
 
     def _show_client_locales():
-      nyx.popups.show_counts('Client Locales', self._client_locale_usage)
+      nyx.popups.show_counts('Client Locales', _usage_periods(self._client_locale_usage))
 
-    def _show_exiting_port_usage():
-      counts = {}
-      key_width = max(map(len, self._exit_port_usage.keys()))
+    def _exit_port_label(port, key_width):
+      usage = connection.port_usage(int(port))
+      return port.ljust(key_width + 3) + usage.ljust(EXIT_USAGE_WIDTH) if usage else port
 
-      for k, v in self._exit_port_usage.items():
-        usage = connection.port_usage(k)
-
-        if usage:
-          k = k.ljust(key_width + 3) + usage.ljust(EXIT_USAGE_WIDTH)
-
-        counts[k] = v
-
-      nyx.popups.show_counts('Exiting Port Usage', counts)
+    def _show_exiting_port_usage():
+      nyx.popups.show_counts('Exiting Port Usage', _usage_periods(self._exit_port_usage, _exit_port_label))
 
     resolver = nyx.tracker.get_connection_tracker().get_custom_resolver()
     user_traffic_allowed = tor_controller().is_user_traffic_allowed()
@@ -385,6 +1356,8 @@ class ConnectionPanel(nyx.panel.DaemonPanel):
       nyx.panel.KeyHandler('enter', 'show connection details', _show_details, key_func = lambda key: key.is_selection()),
       nyx.panel.KeyHandler('d', 'raw consensus descriptor', _show_descriptor),
       nyx.panel.KeyHandler('s', 'sort ordering', self.show_sort_dialog),
+      nyx.panel.KeyHandler('f', 'filter connections', self.show_filter_prompt, self._filter if self._filter else 'none'),
+      nyx.panel.KeyHandler('g', 'group connections', _pick_grouping, self._groups.group_by().lower()),
       nyx.panel.KeyHandler('r', 'connection resolver', _pick_connection_resolver, 'auto' if resolver is None else resolver),
     ]
 
@@ -399,13 +1372,16 @@ class ConnectionPanel(nyx.panel.DaemonPanel):
   def _draw(self, subwindow):
     controller = tor_controller()
     nyx_controller = nyx.controller.get_controller()
-    entries = self._entries
+    entries, lines = self._entries, self._lines
 
-    lines = list(itertools.chain.from_iterable([entry.get_lines() for entry in entries]))
     is_showing_details = self._show_details and lines
     details_offset = DETAILS_HEIGHT + 1 if is_showing_details else 0
     selected, scroll = self._scroller.selection(lines, subwindow.height - details_offset - 1)
 
+    if is_showing_details and selected.line_type == LineType.GROUP:
+      is_showing_details, details_offset = False, 0  # groups lack details
+      selected, scroll = self._scroller.selection(lines, subwindow.height - 1)
+
     if nyx_controller.is_paused():
       current_time = nyx_controller.get_pause_time()
     elif not controller.is_alive():
@@ -436,49 +1412,74 @@ class ConnectionPanel(nyx.panel.DaemonPanel):
       if y >= subwindow.height:
         break
 
+  def _save_usage(self, force = False):
+    for usage in (self._client_locale_usage, self._exit_port_usage):
+      try:
+        usage.save(force)
+      except (IOError, OSError) as exc:
+        nyx.log.info('panel.connection.unable_to_save_usage', error = exc)
+
   def _update(self):
     """
     Fetches the newest resolved connections.
     """
 
-    global LAST_RETRIEVED_CIRCUITS, LAST_RETRIEVED_HS_CONF
+    global LAST_RETRIEVED_CIRCUITS, LAST_RETRIEVED_HS_CONF, CLASSIFICATION_CONTEXT
 
     controller = tor_controller()
-    LAST_RETRIEVED_CIRCUITS = controller.get_circuits([])
+    circuit_tracker = nyx.tracker.get_circuit_tracker()
+    LAST_RETRIEVED_CIRCUITS = circuit_tracker.get_circuits()
     LAST_RETRIEVED_HS_CONF = controller.get_hidden_service_conf({})
 
     conn_resolver = nyx.tracker.get_connection_tracker()
     current_resolution_count = conn_resolver.run_counter()
+    current_circuit_generation = circuit_tracker.generation()
 
     if not conn_resolver.is_alive():
       return  # if we're not fetching connections then this is a no-op
-    elif current_resolution_count == self._last_resource_fetch:
-      return  # no new connections to process
+    elif current_resolution_count == self._last_resource_fetch and current_circuit_generation == self._last_circuit_generation:
+      return  # no new connections or circuits to process
 
-    new_entries = [Entry.from_connection(conn) for conn in conn_resolver.get_value()]
+    # Skips established single-hop circuits (these are for directory
+    # fetches, not client circuits)
 
-    for circ in LAST_RETRIEVED_CIRCUITS:
-      # Skips established single-hop circuits (these are for directory
-      # fetches, not client circuits)
+    circuits = [circ for circ in LAST_RETRIEVED_CIRCUITS if not (circ.status == 'BUILT' and len(circ.path) == 1)]
+    new_entries = ENTRY_CACHE.get_entries(conn_resolver.get_value(), circuits)
 
-      if not (circ.status == 'BUILT' and len(circ.path) == 1):
-        new_entries.append(Entry.from_circuit(circ))
+    # classify new connections in a single pass against tor's present state
+
+    CLASSIFICATION_CONTEXT = _classification_context(controller, LAST_RETRIEVED_CIRCUITS, LAST_RETRIEVED_HS_CONF)
+
+    for entry in new_entries:
+      entry.get_type()
 
     # update stats for client and exit connections
 
+    present_connections = set()
+
     for entry in new_entries:
       line = entry.get_lines()[0]
+      present_connections.add(line.connection)
 
       if entry.is_private() and line.connection not in self._counted_connections:
         if entry.get_type() == Category.INBOUND and line.locale:
-          self._client_locale_usage[line.locale] = self._client_locale_usage.get(line.locale, 0) + 1
+          self._client_locale_usage.add(line.locale)
         elif entry.get_type() == Category.EXIT:
-          self._exit_port_usage[line.connection.remote_port] = self._exit_port_usage.get(line.connection.remote_port, 0) + 1
+          self._exit_port_usage.add(str(line.connection.remote_port))
 
         self._counted_connections.add(line.connection)
 
-    self._entries = sorted(new_entries, key = lambda entry: [entry.sort_value(attr) for attr in self._sort_order])
+    self._counted_connections.intersection_update(present_connections)  # forget closed connections
+    self._save_usage()
+
+    updated_entries = ENTRY_CACHE.updated_entries()
+
+    with self._lock:
+      self._sorted_entries.update(new_entries, updated_entries)
+      self._filter_index.update(new_entries, updated_entries)
+      self._apply_filter(updated_entries)
     self._last_resource_fetch = current_resolution_count
+    self._last_circuit_generation = current_circuit_generation
 
     if CONFIG['features.connection.resolveApps']:
       local_ports, remote_ports = [], []
@@ -494,6 +1495,60 @@ class ConnectionPanel(nyx.panel.DaemonPanel):
       nyx.tracker.get_port_usage_tracker().query(local_ports, remote_ports)
 
 
+def _usage_counts(name):
+  """
+  Provides counts of a usage statistic over the last day. These are persisted
+  to our data directory if configured, specific to the relay we're attached
+  to.
+
+  :param str name: statistic we're counting
+
+  :returns: :class:`~nyx.history.WindowedCounts` for the statistic
+  """
+
+  path = None
+
+  if CONFIG['features.connection.saveUsage']:
+    fingerprint = tor_controller().get_info('fingerprint', None)
+    path = os.path.join(DATA_DIR, 'connection_usage', '%s.%s' % (fingerprint if fingerprint else 'client', name))
+
+  capacity = CONFIG['features.connection.usageLimit'] if CONFIG['features.connection.usageLimit'] > 0 else None
+
+  try:
+    return nyx.history.WindowedCounts(path, capacity = capacity)
+  except (IOError, OSError, ValueError) as exc:
+    nyx.log.info('panel.connection.unable_to_load_usage', path = path, error = exc)
+    return nyx.history.WindowedCounts(capacity = capacity)
+
+
+def _usage_periods(usage, label_func = None):
+  """
+  Provides the counts of a usage statistic for each of our USAGE_PERIODS, as
+  expected by :func:`~nyx.popups.show_counts`.
+
+  :param nyx.history.WindowedCounts usage: statistic to provide counts of
+  :param function label_func: translates labels for display, called with the
+    label and width of the longest one
+
+  :returns: **list** of (period, counts, estimated) tuples
+  """
+
+  periods = []
+
+  for period_label, period in USAGE_PERIODS:
+    counts, estimated = usage.counts(period), usage.errors(period)
+
+    if label_func:
+      key_width = max([len(label) for label in counts] + [0])
+      labels = dict([(label, label_func(label, key_width)) for label in counts])
+      counts = dict([(labels[label], count) for label, count in counts.items()])
+      estimated = [labels[label] for label in estimated if label in labels]
+
+    periods.append((period_label, counts, set(estimated)))
+
+  return periods
+
+
 def _draw_title(subwindow, entries, showing_details):
   """
   Panel title with the number of connections we presently have.
@@ -515,6 +1570,10 @@ def _draw_line(subwindow, x, y, line, is_selected, width, current_time):
 
   subwindow.addstr(x, y, ' ' * (width - x), *attr)
 
+  if line.line_type == LineType.GROUP:
+    _draw_group_line(subwindow, x + 1, y, line.entry, width, current_time, attr)
+    return
+
   if line.line_type == LineType.CIRCUIT:
     if line.circuit.path[-1][0] == line.fingerprint:
       prefix = (ord(' '), curses.ACS_LLCORNER, curses.ACS_HLINE, ord(' '))
@@ -527,10 +1586,38 @@ def _draw_line(subwindow, x, y, line, is_selected, width, current_time):
     x += 1  # offset from edge
 
   _draw_address_column(subwindow, x, y, line, attr)
-  _draw_line_details(subwindow, 57, y, line, width - 57 - 20, attr)
+  _draw_line_details(subwindow, 57, y, line, width - 57 - 30, attr)
+  _draw_rate_column(subwindow, width - 28, y, line, attr)
   _draw_right_column(subwindow, width - 18, y, line, current_time, attr)
 
 
+def _draw_group_line(subwindow, x, y, group, width, current_time, attr):
+  if group.group_by == GroupBy.RELAY:
+    nickname = nyx.tracker.get_consensus_tracker().get_relay_nickname(group.key) if group.key else None
+    label = '%s (%s)' % (nickname if nickname else 'Unnamed', group.key) if group.key else 'Unknown relay'
+  elif group.group_by == GroupBy.COUNTRY:
+    label = group.key if group.key else '??'
+  elif group.group_by == GroupBy.PORT:
+    purpose = connection.port_usage(group.key)
+    label = '%s (%s)' % (group.key, purpose) if purpose else str(group.key)
+  else:
+    label = str(group.key)
+
+  count = group.count()
+  min_uptime, avg_uptime = group.uptime(current_time)
+  summary = '%i %s, newest: %s' % (count, 'connection' if count == 1 else 'connections', str_tools.time_label(min_uptime, 1))
+
+  rate = group.get_rate()
+
+  subwindow.addstr(x, y, str_tools.crop(label, 26), BOLD, *attr)
+  subwindow.addstr(30, y, str_tools.crop(summary, width - 30 - (30 if rate else 20)), *attr)
+
+  if rate:
+    subwindow.addstr(width - 28, y, '%9s' % (str_tools.size_label(rate.read + rate.written) + '/s'), *attr)
+
+  subwindow.addstr(width - 18, y, ' %5s (AVG)' % str_tools.time_label(avg_uptime, 1), *attr)
+
+
 def _draw_address_column(subwindow, x, y, line, attr):
   src = tor_controller().get_info('address', line.connection.local_address)
   src += ':%s' % line.connection.local_port if line.line_type == LineType.CONNECTION else ''
@@ -615,6 +1702,14 @@ def _draw_details(subwindow, selected):
   subwindow.box(0, 0, subwindow.width, DETAILS_HEIGHT + 2)
 
 
+def _draw_rate_column(subwindow, x, y, line, attr):
+  if line.line_type in (LineType.CONNECTION, LineType.CIRCUIT_HEADER):
+    rate = line.entry.get_rate()
+
+    if rate:
+      subwindow.addstr(x, y, '%9s' % (str_tools.size_label(rate.read + rate.written) + '/s'), *attr)
+
+
 def _draw_line_details(subwindow, x, y, line, width, attr):
   if line.line_type == LineType.CIRCUIT_HEADER:
     comp = ['Purpose: %s' % line.circuit.purpose.capitalize(), ', Circuit ID: %s' % line.circuit.id]
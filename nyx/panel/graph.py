@@ -14,23 +14,32 @@ Downloaded (0.0 B/sec):           Uploaded (0.0 B/sec):
          25s  50   1m   1.6  2.0           25s  50   1m   1.6  2.0
 """
 
+import collections
 import copy
+import itertools
+import math
+import os
+import threading
 import time
+import weakref
 
 import nyx.controller
 import nyx.curses
+import nyx.history
 import nyx.panel
 import nyx.popups
 import nyx.tracker
+import stem.prereq
 
-from nyx import join, msg, tor_controller
+from nyx import DATA_DIR, join, msg, tor_controller
 from nyx.curses import RED, GREEN, CYAN, BOLD, HIGHLIGHT
 from stem.control import EventType, Listener
 from stem.util import conf, enum, log, str_tools, system
 
-GraphStat = enum.Enum(('BANDWIDTH', 'bandwidth'), ('CONNECTIONS', 'connections'), ('SYSTEM_RESOURCES', 'resources'))
+GraphStat = enum.Enum(('BANDWIDTH', 'bandwidth'), ('CONNECTIONS', 'connections'), ('SYSTEM_RESOURCES', 'resources'), ('TALKERS', 'talkers'))
 Interval = enum.Enum(('EACH_SECOND', 'each second'), ('FIVE_SECONDS', '5 seconds'), ('THIRTY_SECONDS', '30 seconds'), ('MINUTELY', 'minutely'), ('FIFTEEN_MINUTE', '15 minute'), ('THIRTY_MINUTE', '30 minute'), ('HOURLY', 'hourly'), ('DAILY', 'daily'))
 Bounds = enum.Enum(('GLOBAL_MAX', 'global_max'), ('LOCAL_MAX', 'local_max'), ('TIGHT', 'tight'))
+Style = enum.Enum(('BLOCK', 'block'), ('EIGHTHS', 'eighths'), ('BRAILLE', 'braille'))
 
 INTERVAL_SECONDS = {
   Interval.EACH_SECOND: 1,
@@ -43,8 +52,48 @@ INTERVAL_SECONDS = {
   Interval.DAILY: 86400,
 }
 
+Distribution = collections.namedtuple('Distribution', ['p50', 'p95', 'p99', 'peak_to_mean'])
+Downsampled = collections.namedtuple('Downsampled', ['average', 'minimum', 'maximum'])
+Zoom = collections.namedtuple('Zoom', ['step', 'offset'])
+
+# Seconds each column can span as we zoom in and out, and the number of
+# columns we move when panning.
+
+ZOOM_STEPS = (1, 2, 5, 10, 15, 30, 60, 120, 300, 600, 900, 1800, 3600, 7200, 21600, 43200, 86400, 172800, 604800)
+PAN_COLUMNS = 20
+GRAPH_CACHE_SIZE = 32  # maximum renderings we cache for each GraphData
+
 PRIMARY_COLOR, SECONDARY_COLOR = GREEN, CYAN
 
+# Resolution of each character for our graph styles. This is the number of
+# values it spans horizontally, and the levels it can show vertically.
+
+STYLE_RESOLUTION = {
+  Style.BLOCK: (1, 1),
+  Style.EIGHTHS: (1, 8),
+  Style.BRAILLE: (2, 4),
+}
+
+# Eighth blocks (U+2581 - U+2588) for a given number of filled eighths, and
+# braille dot bits for a given number of filled dots in the left and right
+# columns of a character. Dots are filled from the bottom.
+
+EIGHTHS_GLYPHS = [' '] + [u'%c' % (0x2580 + i) for i in range(1, 9)]
+BRAILLE_LEFT = (0x00, 0x40, 0x44, 0x46, 0x47)
+BRAILLE_RIGHT = (0x00, 0x80, 0xA0, 0xB0, 0xB8)
+
+# Histogram buckets for values below one, then each doubling of the value is
+# split into eight buckets (each about 9% wider than the last). This covers up
+# to 2^48 (256 TB), with larger values counted in our last bucket.
+
+HISTOGRAM_BUCKETS_PER_DOUBLING = 8
+HISTOGRAM_BUCKETS = 1 + 48 * HISTOGRAM_BUCKETS_PER_DOUBLING
+
+# Attributes we persist for each GraphData are its last update time, tick,
+# total, latest value, then the in-process and max value of each interval.
+
+HISTORY_ATTRS = 4 + 2 * len(list(Interval))
+
 ACCOUNTING_RATE = 5
 DEFAULT_CONTENT_HEIGHT = 4  # space needed for labeling above and below the graph
 WIDE_LABELING_GRAPH_COL = 50  # minimum graph columns to use wide spacing for x-axis labels
@@ -67,6 +116,10 @@ def conf_handler(key, value):
     if value not in Bounds:
       log.warn("'%s' isn't a valid graph bounds, options are: %s" % (value, ', '.join(Bounds)))
       return CONFIG['features.graph.bound']  # keep the default
+  elif key == 'features.graph.style':
+    if value not in Style:
+      log.warn("'%s' isn't a valid graph style, options are: %s" % (value, ', '.join(Style)))
+      return CONFIG['features.graph.style']  # keep the default
 
 
 CONFIG = conf.config_dict('nyx', {
@@ -78,13 +131,339 @@ CONFIG = conf.config_dict('nyx', {
   'features.graph.type': GraphStat.BANDWIDTH,
   'features.graph.interval': Interval.EACH_SECOND,
   'features.graph.bound': Bounds.LOCAL_MAX,
+  'features.graph.style': Style.BLOCK,
   'features.graph.max_width': 300,  # we need some sort of max size so we know how much graph data to retain
+  'features.graph.saveHistory': True,
+  'features.graph.showPercentiles': False,
   'features.panels.show.connection': True,
   'features.graph.bw.transferInBytes': False,
   'features.graph.bw.accounting.show': True,
+  'features.graph.talkers.count': 5,
 }, conf_handler)
 
 
+class _RingBufferView(object):
+  """
+  Read access shared by ring buffers and their snapshots. Subclasses provide
+  our slot and segment tree node values.
+  """
+
+  def _value(self, slot):
+    raise NotImplementedError('Should be implemented by subclasses')
+
+  def _node(self, node):
+    raise NotImplementedError('Should be implemented by subclasses')
+
+  def view(self, count = None):
+    """
+    Iterates over our values from newest to oldest without copying them.
+
+    :param int count: maximum number of values to provide, all of them if
+      **None**
+
+    :returns: **iterator** for our values, newest first
+    """
+
+    size = len(self._values)
+    count = size if count is None else max(0, min(count, size))
+
+    for i in range(count):
+      yield self._value((self._head + i) % size)
+
+  def bounds(self, count = None):
+    """
+    Provides the minimum and maximum of our newest values. This is a segment
+    tree query so it's logarithmic in our size.
+
+    :param int count: number of values to take into account, all of them if
+      **None**
+
+    :returns: **tuple** of the form (min, max), or (0, 0) if count is zero
+    """
+
+    size = len(self._values)
+    count = size if count is None else max(0, min(count, size))
+
+    if count == 0:
+      return 0, 0
+
+    # the newest values may wrap around the end of our list
+
+    end = self._head + count
+    ranges = [(self._head, min(size, end))]
+
+    if end > size:
+      ranges.append((0, end - size))
+
+    min_value, max_value = None, None
+
+    for start, end in ranges:
+      start, end = start + size, end + size
+
+      while start < end:
+        if start & 1:
+          min_value, max_value = _merge_bounds(min_value, max_value, self._node(start))
+          start += 1
+
+        if end & 1:
+          end -= 1
+          min_value, max_value = _merge_bounds(min_value, max_value, self._node(end))
+
+        start, end = start >> 1, end >> 1
+
+    return min_value, max_value
+
+  def __getitem__(self, index):
+    if isinstance(index, slice):
+      return [self[i] for i in range(*index.indices(len(self._values)))]
+
+    size = len(self._values)
+
+    if index < 0:
+      index += size
+
+    if not 0 <= index < size:
+      raise IndexError('ring buffer index out of range')
+
+    return self._value((self._head + index) % size)
+
+  def __iter__(self):
+    return self.view()
+
+  def __len__(self):
+    return len(self._values)
+
+
+class RingBuffer(_RingBufferView):
+  """
+  Fixed size circular buffer of values. This is indexed from newest to oldest,
+  and adding a value overwrites the oldest so updates are constant time
+  regardless of our size.
+
+  Alongside our values we keep a segment tree of their minimum and maximum so
+  graph bounds can be found without scanning what's visible.
+
+  Snapshots provide a frozen view without copying our values. Rather, when we
+  overwrite a slot (or tree node) a live snapshot can still see we first hand
+  it the old value.
+
+  :param int size: number of values we retain
+  :param object default: initial value of our contents
+  """
+
+  def __init__(self, size, default = 0):
+    self._values = [default] * size
+    self._head = 0  # index of our newest value
+
+    # Segment tree where node 1 is the root, node i has children 2i and 2i + 1,
+    # and the leaf for slot i is node size + i.
+
+    self._max_tree = [default] * (2 * size)
+    self._min_tree = [default] * (2 * size)
+
+    self._snapshots = weakref.WeakSet()
+    self._lock = threading.Lock()
+
+  def append(self, value):
+    """
+    Adds a value, replacing our oldest.
+
+    :param object value: value to be added
+    """
+
+    with self._lock:
+      size = len(self._values)
+      head = (self._head - 1) % size
+
+      # Snapshots must have the old value before we overwrite it, since they
+      # read our slot before checking what we've handed them.
+
+      for snapshot in self._snapshots:
+        snapshot._preserve(head, self._values[head])
+
+      self._values[head] = value
+      self._set_node(head + size, value, value)
+
+      node = (head + size) >> 1
+
+      while node >= 1:
+        left, right = 2 * node, 2 * node + 1
+        self._set_node(node, max(self._max_tree[left], self._max_tree[right]), min(self._min_tree[left], self._min_tree[right]))
+        node >>= 1
+
+      self._head = head
+
+  def snapshot(self):
+    """
+    Provides a read-only view of our present values which is unaffected by
+    future appends. This is constant time, with our appends copying only the
+    values they overwrite while the snapshot's alive.
+
+    :returns: :class:`~nyx.panel.graph.RingBufferSnapshot` of our values
+    """
+
+    with self._lock:
+      snapshot = RingBufferSnapshot(self)
+      self._snapshots.add(snapshot)
+      return snapshot
+
+  def view(self, count = None):
+    values = itertools.chain(itertools.islice(self._values, self._head, None), itertools.islice(self._values, 0, self._head))
+    return values if count is None else itertools.islice(values, max(0, count))
+
+  def _set_node(self, node, max_value, min_value):
+    for snapshot in self._snapshots:
+      snapshot._preserve_node(node, self._max_tree[node], self._min_tree[node])
+
+    self._max_tree[node] = max_value
+    self._min_tree[node] = min_value
+
+  def _value(self, slot):
+    return self._values[slot]
+
+  def _node(self, node):
+    return self._min_tree[node], self._max_tree[node]
+
+
+class RingBufferSnapshot(_RingBufferView):
+  """
+  Read-only view of a :class:`~nyx.panel.graph.RingBuffer` at a point in time.
+  This reads through to the buffer's values, except for slots that have since
+  been overwritten.
+  """
+
+  def __init__(self, ring):
+    self._values = ring._values
+    self._max_tree = ring._max_tree
+    self._min_tree = ring._min_tree
+    self._head = ring._head
+
+    self._preserved = {}  # slot => value it had when we were made
+    self._preserved_nodes = {}  # tree node => (min, max) it had when we were made
+
+  def snapshot(self):
+    return self  # already immutable
+
+  def _preserve(self, slot, value):
+    if slot not in self._preserved:
+      self._preserved[slot] = value
+
+  def _preserve_node(self, node, max_value, min_value):
+    if node not in self._preserved_nodes:
+      self._preserved_nodes[node] = (min_value, max_value)
+
+  # Checking for preserved values *after* reading from the buffer. If the
+  # buffer overwrote something in the meantime then the original is already
+  # preserved.
+
+  def _value(self, slot):
+    value = self._values[slot]
+    return self._preserved.get(slot, value)
+
+  def _node(self, node):
+    bounds = (self._min_tree[node], self._max_tree[node])
+    return self._preserved_nodes.get(node, bounds)
+
+
+class LogHistogram(object):
+  """
+  Streaming distribution of values for estimating their percentiles. Values
+  are counted in logarithmically sized buckets so memory is small and fixed,
+  and estimates are within a few percent however many values we've seen.
+  Histograms are merged by summing their buckets.
+
+  :var int count: number of values we've seen
+  :var float total: sum of our values
+  :var float minimum: smallest value we've seen
+  :var float maximum: largest value we've seen
+  """
+
+  def __init__(self):
+    self.count = 0
+    self.total = 0
+    self.minimum = None
+    self.maximum = None
+    self._buckets = [0] * HISTOGRAM_BUCKETS
+
+  def add(self, value, count = 1):
+    """
+    Records a value.
+
+    :param float value: value to record
+    :param int count: number of times to record it
+    """
+
+    if count <= 0:
+      return
+
+    self._buckets[_histogram_bucket(value)] += count
+    self.count += count
+    self.total += value * count
+    self.minimum = value if self.minimum is None else min(self.minimum, value)
+    self.maximum = value if self.maximum is None else max(self.maximum, value)
+
+  def merge(self, histogram):
+    """
+    Adds another histogram's values to ours.
+
+    :param LogHistogram histogram: values to add
+    """
+
+    if not histogram.count:
+      return
+
+    self._buckets = [ours + theirs for ours, theirs in zip(self._buckets, histogram._buckets)]
+    self.count += histogram.count
+    self.total += histogram.total
+    self.minimum = histogram.minimum if self.minimum is None else min(self.minimum, histogram.minimum)
+    self.maximum = histogram.maximum if self.maximum is None else max(self.maximum, histogram.maximum)
+
+  def mean(self):
+    return self.total / float(self.count) if self.count else 0
+
+  def percentiles(self, *percentiles):
+    """
+    Estimates the values at the given percentiles. This is a single pass over
+    our buckets, so percentiles must be in ascending order.
+
+    :param list percentiles: percentiles to provide, from zero to a hundred
+
+    :returns: **list** with the estimated value at each percentile, these are
+      **None** if we lack any values
+    """
+
+    if not self.count:
+      return [None] * len(percentiles)
+
+    results, cumulative, bucket = [], 0, -1
+
+    for percentile in percentiles:
+      rank = max(1, int(math.ceil(self.count * percentile / 100.0)))
+
+      if percentile <= 0:
+        results.append(self.minimum)
+        continue
+      elif rank >= self.count:
+        results.append(self.maximum)
+        continue
+
+      while cumulative < rank:
+        bucket += 1
+        cumulative += self._buckets[bucket]
+
+      # middle of the bucket, though never beyond the values we've seen
+
+      estimate = 0 if bucket == 0 else 2 ** ((bucket - 0.5) / HISTOGRAM_BUCKETS_PER_DOUBLING)
+      results.append(min(self.maximum, max(self.minimum, estimate)))
+
+    return results
+
+  def clone(self):
+    histogram = LogHistogram()
+    histogram.merge(self)
+    return histogram
+
+
 class GraphData(object):
   """
   Graphable statistical information.
@@ -92,7 +471,11 @@ class GraphData(object):
   :var int latest_value: last value we recorded
   :var int total: sum of all values we've recorded
   :var int tick: number of events we've processed
-  :var dict values: mapping of intervals to an array of samplings from newest to oldest
+  :var dict values: mapping of intervals to a :class:`~nyx.panel.graph.RingBuffer`
+    of samplings from newest to oldest
+
+  Clones are a read-only snapshot of these values, so they're cheap to make
+  but can't be updated.
   """
 
   def __init__(self, clone = None, category = None, is_primary = True):
@@ -100,27 +483,44 @@ class GraphData(object):
       self.latest_value = clone.latest_value
       self.total = clone.total
       self.tick = clone.tick
-      self.values = copy.deepcopy(clone.values)
+      self.values = dict([(interval, values.snapshot()) for (interval, values) in clone.values.items()])
 
       self._category = clone._category
       self._is_primary = clone._is_primary
       self._in_process_value = dict(clone._in_process_value)
       self._max_value = dict(clone._max_value)
+      clone._shared_histograms = set(Interval)  # original copies these before it next changes them
+      self._histograms = dict(clone._histograms)
+      self._shared_histograms = set()
+      self._history = None
+      self._history_index = 0
+      self._store = clone._store
+      self._store_index = clone._store_index
+      self._glyph_cache = clone._glyph_cache
+      self._downsample_cache = clone._downsample_cache
     else:
       self.latest_value = 0
       self.total = 0
       self.tick = 0
-      self.values = dict([(i, CONFIG['features.graph.max_width'] * [0]) for i in Interval])
+      self.values = dict([(i, RingBuffer(CONFIG['features.graph.max_width'])) for i in Interval])
 
       self._category = category
       self._is_primary = is_primary
       self._in_process_value = dict([(i, 0) for i in Interval])
       self._max_value = dict([(i, 0) for i in Interval])  # interval => maximum value it's had
+      self._histograms = dict([(i, LogHistogram()) for i in Interval])  # interval => distribution of its values
+      self._shared_histograms = set()  # intervals whose histogram our clones reference
+      self._history = None  # RingFile we persist our values to
+      self._history_index = 0  # our position among the data saved in that file
+      self._store = None  # RoundRobinStore with our long term history
+      self._store_index = 0  # our series within that store
+      self._glyph_cache = {}  # (interval, style, columns, rows) => (tick, bounds, glyph rows), shared with our clones
+      self._downsample_cache = {}  # (step, offset, columns) => (tick, downsampled values), shared with our clones
 
   def average(self):
     return self.total / max(1, self.tick)
 
-  def update(self, new_value):
+  def update(self, new_value, timestamp = None):
     self.latest_value = new_value
     self.total += new_value
     self.tick += 1
@@ -131,20 +531,194 @@ class GraphData(object):
 
       if self.tick % interval_seconds == 0:
         new_entry = self._in_process_value[interval] / interval_seconds
-        self.values[interval] = [new_entry] + self.values[interval][:-1]
+        self.values[interval].append(new_entry)
         self._max_value[interval] = max(self._max_value[interval], new_entry)
+        self._histogram(interval).add(new_entry)
         self._in_process_value[interval] = 0
 
-  def header(self, width):
+        if self._history:
+          self._history.append(self._history_ring(interval), new_entry)
+
+    if self._history:
+      self._save_attrs()
+
+    if self._store:
+      self._store.add(self._store_index, time.time() if timestamp is None else timestamp, new_value)
+
+  def history(self, start, end = None):
+    """
+    Provides our values over a time range, at the finest resolution we've
+    retained for it.
+
+    :param float start: unix timestamp for the start of the range
+    :param float end: unix timestamp for the end of the range, the present
+      time if **None**
+
+    :returns: **tuple** of the form (step, samples) where samples are a
+      **list** of :class:`~nyx.history.Sample`, or **None** if we're not
+      saving our history
+    """
+
+    if not self._store:
+      return None
+
+    return self._store.query(self._store_index, start, end)
+
+  def _skip(self, seconds, value = 0):
+    """
+    Advances through a period we lack samples for, as though each second had
+    the given value. This is linear in our width rather than the duration, so
+    week long gaps are cheap.
+
+    :param int seconds: duration of the period we're skipping
+    :param int value: value to use for each second
+    """
+
+    if seconds <= 0:
+      return
+
+    for interval in Interval:
+      interval_seconds = INTERVAL_SECONDS[interval]
+      values = self.values[interval]
+      rollovers = (self.tick + seconds) // interval_seconds - self.tick // interval_seconds
+
+      if rollovers == 0:
+        self._in_process_value[interval] += value * seconds
+        continue
+
+      # complete the partially filled sampling we're in the middle of, then
+      # the ones that follow
+
+      first_entry = (self._in_process_value[interval] + value * (interval_seconds - self.tick % interval_seconds)) / interval_seconds
+      new_entries = [first_entry] + [value] * min(rollovers - 1, len(values))
+
+      for entry in new_entries:
+        values.append(entry)
+
+        if self._history:
+          self._history.append(self._history_ring(interval), entry)
+
+      self._max_value[interval] = max([self._max_value[interval]] + new_entries)
+      self._histogram(interval).add(first_entry)
+      self._histogram(interval).add(value, rollovers - 1)
+      self._in_process_value[interval] = value * ((self.tick + seconds) % interval_seconds)
+
+    self.tick += seconds
+    self.total += value * seconds
+
+    if self._history:
+      self._save_attrs()
+
+  def _restore(self, history, index):
+    """
+    Replaces our values with those saved in a history file.
+
+    :param nyx.history.RingFile history: file with our past values
+    :param int index: our position among the data saved in the file
+
+    :returns: **float** for when our values were last updated
+    """
+
+    attrs = history.attrs()[index * HISTORY_ATTRS:(index + 1) * HISTORY_ATTRS]
+    self.tick = int(attrs[1])
+    self.total = _to_number(attrs[2])
+    self.latest_value = _to_number(attrs[3])
+
+    for i, interval in enumerate(Interval):
+      self._in_process_value[interval] = _to_number(attrs[4 + 2 * i])
+      self._max_value[interval] = _to_number(attrs[5 + 2 * i])
+
+      values = RingBuffer(len(self.values[interval]))
+      histogram = LogHistogram()
+
+      for value in reversed(history.values(index * len(list(Interval)) + i)):
+        values.append(_to_number(value))
+
+      # seed our distribution with the values we had, skipping the slots they
+      # haven't yet filled
+
+      for value in values.view(min(len(values), self.tick // INTERVAL_SECONDS[interval])):
+        histogram.add(value)
+
+      self.values[interval] = values
+      self._histograms[interval] = histogram
+      self._shared_histograms.discard(interval)
+
+    return attrs[0]
+
+  def _persist(self, history, index):
+    """
+    Writes our values to a history file, and saves future updates to it.
+
+    :param nyx.history.RingFile history: file to persist our values to
+    :param int index: our position among the data saved in the file
+    """
+
+    self._history, self._history_index = history, index
+
+    for interval in Interval:
+      for value in reversed(list(self.values[interval])):
+        history.append(self._history_ring(interval), value)
+
+    self._save_attrs()
+
+  def _histogram(self, interval):
+    """
+    Provides an interval's histogram so it can be updated. If our clones
+    reference it we copy it first, so histograms are only copied when they
+    change rather than each time we're cloned.
+    """
+
+    if interval in self._shared_histograms:
+      self._histograms[interval] = self._histograms[interval].clone()
+      self._shared_histograms.discard(interval)
+
+    return self._histograms[interval]
+
+  def _history_ring(self, interval):
+    return self._history_index * len(list(Interval)) + list(Interval).index(interval)
+
+  def _save_attrs(self):
+    attrs = [time.time(), self.tick, self.total, self.latest_value]
+
+    for interval in Interval:
+      attrs += [self._in_process_value[interval], self._max_value[interval]]
+
+    self._history.set_attrs(self._history_index * HISTORY_ATTRS, attrs)
+
+  def distribution(self, interval):
+    """
+    Provides percentiles of the values we've had for an interval, and how
+    their peak compares with their mean.
+
+    :param Interval interval: timing interval of the values
+
+    :returns: :data:`~nyx.panel.graph.Distribution` for the interval's values,
+      or **None** if we lack any
+    """
+
+    histogram = self._histograms[interval]
+
+    if not histogram.count:
+      return None
+
+    p50, p95, p99 = histogram.percentiles(50, 95, 99)
+    mean = histogram.mean()
+
+    return Distribution(p50, p95, p99, histogram.maximum / mean if mean else None)
+
+  def header(self, width, interval = None):
     """
     Provides the description above a subgraph.
 
     :param int width: maximum length of the header
+    :param Interval interval: if provided, show percentiles of this
+      interval's values rather than our usual stats
 
     :returns: **str** with our graph header
     """
 
-    return self._category._header(width, self._is_primary)
+    return self._category._header(width, self._is_primary, self.distribution(interval) if interval else None)
 
   def bounds(self, bounds, interval, columns):
     """
@@ -158,15 +732,15 @@ class GraphData(object):
     """
 
     min_bound, max_bound = 0, 0
-    values = self.values[interval][:columns]
+    local_min, local_max = self.values[interval].bounds(columns)
 
     if bounds == Bounds.GLOBAL_MAX:
       max_bound = self._max_value[interval]
     elif columns > 0:
-      max_bound = max(values)  # local maxima
+      max_bound = local_max
 
     if bounds == Bounds.TIGHT and columns > 0:
-      min_bound = min(values)
+      min_bound = local_min
 
       # if the max = min pick zero so we still display something
 
@@ -175,6 +749,160 @@ class GraphData(object):
 
     return min_bound, max_bound
 
+  def downsample(self, step, offset, columns):
+    """
+    Provides our values at an arbitrary scale, for zooming and panning. Each
+    column has the average, minimum, and maximum of the values it spans. These
+    come from the coarsest of our intervals that retains the whole range, or
+    our long term history if none of them do. Results are cached until we're
+    next updated, and shared with our clones.
+
+    :param int step: seconds each column spans
+    :param int offset: seconds before the present that our newest column ends
+    :param int columns: number of columns to provide
+
+    :returns: :data:`~nyx.panel.graph.Downsampled` with lists of each column's
+      average, minimum, and maximum, newest first, these are **None** for
+      columns we lack values for
+    """
+
+    cache_key = (step, offset, columns)
+    cached = self._downsample_cache.get(cache_key)
+
+    if cached and cached[0] == self.tick:
+      return cached[1]
+
+    totals, counts = [0] * columns, [0] * columns
+    minimums, maximums = [None] * columns, [None] * columns
+
+    def add(column, average, minimum, maximum):
+      totals[column] += average
+      counts[column] += 1
+      minimums[column] = minimum if minimums[column] is None else min(minimums[column], minimum)
+      maximums[column] = maximum if maximums[column] is None else max(maximums[column], maximum)
+
+    # intervals whose samplings evenly divide our columns, and of those which
+    # retain the whole range
+
+    divisors = [interval for interval in Interval if step % INTERVAL_SECONDS[interval] == 0]
+    retaining = [interval for interval in divisors if len(self.values[interval]) * INTERVAL_SECONDS[interval] >= offset + step * columns]
+
+    if retaining or not self._store:
+      interval = retaining[-1] if retaining else divisors[-1]
+      interval_seconds = INTERVAL_SECONDS[interval]
+      newest = self.tick % interval_seconds  # seconds not yet in a sampling
+
+      for i, value in enumerate(self.values[interval].view()):
+        column = (newest + i * interval_seconds - offset) // step
+
+        if column >= columns:
+          break
+        elif column >= 0:
+          add(column, value, value, value)
+    else:
+      now = time.time()
+      end = now - offset
+      history_step, samples = self._store.query(self._store_index, end - step * columns, end)
+
+      # samples cover the history_step seconds after their timestamp, which
+      # can span several columns when zoomed in further than that
+
+      for sample in samples:
+        first = max(0, int((end - sample.timestamp - history_step) // step))
+        last = min(columns - 1, int(math.ceil(float(end - sample.timestamp) / step)) - 1)
+
+        for column in range(first, min(columns, max(first, last) + 1)):
+          add(column, sample.average, sample.minimum, sample.maximum)
+
+    averages = [(float(total) / count if count else None) for total, count in zip(totals, counts)]
+    downsampled = Downsampled(averages, minimums, maximums)
+
+    _cache(self._downsample_cache, cache_key, self.tick, downsampled)
+    return downsampled
+
+  def glyph_rows(self, interval, style, columns, rows, min_bound, max_bound):
+    """
+    Renders our values with unicode block or braille characters, which have a
+    higher resolution than a cell. These are cached until we're next updated,
+    and shared with our clones, so redrawing is cheap.
+
+    :param Interval,Zoom interval: timing interval of the values, or the
+      scale we're zoomed to
+    :param Style style: characters to render with, this can't be **BLOCK**
+    :param int columns: number of characters in each row
+    :param int rows: number of rows to provide
+    :param int min_bound: value at the bottom of the graph
+    :param int max_bound: value at the top of the graph
+
+    :returns: **list** of unicode strings, from the top row to the bottom
+    """
+
+    cache_key = (interval, style, columns, rows)
+    cached = self._glyph_cache.get(cache_key)
+
+    if cached and cached[:2] == (self.tick, (min_bound, max_bound)):
+      return cached[2]
+
+    samples_per_column, levels_per_row = STYLE_RESOLUTION[style]
+    levels = rows * levels_per_row
+    scale = float(levels) / (max(1, max_bound) - min_bound)
+    heights = [max(0, int(min(levels, (value - min_bound) * scale))) for value in self._view(interval, columns * samples_per_column)]
+    heights += [0] * (columns * samples_per_column - len(heights))
+
+    glyph_rows = []
+
+    for row in range(rows):
+      row_bottom = (rows - 1 - row) * levels_per_row
+      filled = [min(levels_per_row, max(0, height - row_bottom)) for height in heights]
+
+      if style == Style.EIGHTHS:
+        glyph_rows.append(u''.join([EIGHTHS_GLYPHS[fill] for fill in filled]))
+      else:
+        glyph_rows.append(u''.join([(u'%c' % (0x2800 + BRAILLE_LEFT[left] + BRAILLE_RIGHT[right])) if (left or right) else u' ' for left, right in zip(filled[::2], filled[1::2])]))
+
+    _cache(self._glyph_cache, cache_key, self.tick, (min_bound, max_bound), glyph_rows)
+    return glyph_rows
+
+  def zoomed_bounds(self, bounds, zoom, columns):
+    """
+    Range of values for a zoomed graph. Global maximums are the highest value
+    within its range, rather than the average of a column.
+
+    :param Bounds bounds: boundary type for the range we want
+    :param Zoom zoom: scale and position of the graph
+    :param int columns: number of columns to take into account
+
+    :returns: **tuple** of the form (min, max)
+    """
+
+    downsampled = self.downsample(zoom.step, zoom.offset, columns)
+    averages = [value for value in downsampled.average if value is not None]
+
+    if not averages:
+      return 0, 0
+
+    if bounds == Bounds.GLOBAL_MAX:
+      max_bound = max([value for value in downsampled.maximum if value is not None])
+    else:
+      max_bound = max(averages)
+
+    min_bound = min(averages) if bounds == Bounds.TIGHT else 0
+
+    if min_bound == max_bound:
+      min_bound = 0
+
+    return int(math.floor(min_bound)), int(math.ceil(max_bound))
+
+  def _view(self, interval, count):
+    """
+    Provides our newest values for an interval or zoomed scale.
+    """
+
+    if isinstance(interval, Zoom):
+      return [(0 if value is None else value) for value in self.downsample(interval.step, interval.offset, count).average]
+    else:
+      return self.values[interval].view(count)
+
   def y_axis_label(self, value):
     """
     Provides the label we should display on our y-axis.
@@ -195,9 +923,14 @@ class GraphCategory(object):
   :var GraphData primary: first subgraph
   :var GraphData secondary: second subgraph
   :var float start_time: unix timestamp for when we started
+
+  :param GraphCategory clone: category to make a read-only copy of
+  :param str history_path: file to restore our values from and persist them
+    to, with our long term history alongside it, our values only reside in
+    memory if **None**
   """
 
-  def __init__(self, clone = None):
+  def __init__(self, clone = None, history_path = None):
     if clone:
       self.primary = GraphData(clone.primary)
       self.secondary = GraphData(clone.secondary)
@@ -213,6 +946,8 @@ class GraphCategory(object):
       self._primary_header_stats = []
       self._secondary_header_stats = []
 
+      self._restore_history(history_path, self._recent_samples())
+
   def stat_type(self):
     """
     Provides the GraphStat this graph is for.
@@ -243,7 +978,80 @@ class GraphCategory(object):
 
     pass
 
-  def _header(self, width, is_primary):
+  def _recent_samples(self):
+    """
+    Provides samples tor has for the seconds leading up to now.
+
+    :returns: **list** of (primary, secondary) tuples, oldest first
+    """
+
+    return []
+
+  def _gap_values(self, seconds, last_updated, recent):
+    """
+    Provides the values we should use for each second of a period we lack
+    samples for, which defaults to zero.
+
+    :param int seconds: duration of the gap
+    :param float last_updated: unix timestamp of the gap's start
+    :param list recent: samples that follow the gap
+
+    :returns: **tuple** of the form (primary, secondary)
+    """
+
+    return 0, 0
+
+  def _restore_history(self, history_path, recent):
+    """
+    Restores values we persisted on prior runs, then the recent samples we've
+    been given. Seconds between our last save and those samples are filled by
+    our _gap_values().
+
+    :param str history_path: file with our persisted values, we're in memory
+      only if **None**
+    :param list recent: (primary, secondary) tuples for the seconds leading up
+      to now, oldest first
+    """
+
+    history = None
+
+    if history_path:
+      try:
+        history = nyx.history.RingFile(history_path, 2 * len(list(Interval)), CONFIG['features.graph.max_width'], 2 * HISTORY_ATTRS)
+
+        # long term history, at several resolutions
+
+        store = nyx.history.RoundRobinStore(history_path + '.rrd', series_count = 2)
+        self.primary._store, self.primary._store_index = store, 0
+        self.secondary._store, self.secondary._store_index = store, 1
+      except (IOError, OSError) as exc:
+        log.info(msg('panel.graphing.unable_to_load_history', path = history_path, error = exc))
+
+    if history and not history.is_new:
+      last_updated = min(self.primary._restore(history, 0), self.secondary._restore(history, 1))
+      gap = int(time.time() - last_updated)
+      recent = recent[-gap:] if gap > 0 else []
+      unknown_seconds = gap - len(recent)
+
+      if unknown_seconds > 0:
+        primary_value, secondary_value = self._gap_values(unknown_seconds, last_updated, recent)
+        self.primary._skip(unknown_seconds, primary_value)
+        self.secondary._skip(unknown_seconds, secondary_value)
+
+      log.info(msg('panel.graphing.history_restored', path = history_path, duration = str_tools.time_label(max(0, gap), is_long = True)))
+
+    now = int(time.time())
+
+    for i, (primary_value, secondary_value) in enumerate(recent):
+      timestamp = now - len(recent) + i + 1
+      self.primary.update(primary_value, timestamp)
+      self.secondary.update(secondary_value, timestamp)
+
+    if history:
+      self.primary._persist(history, 0)
+      self.secondary._persist(history, 1)
+
+  def _header(self, width, is_primary, distribution = None):
     if is_primary:
       header = CONFIG['attr.graph.header.primary'].get(self.stat_type(), '')
       header_stats = self._primary_header_stats
@@ -251,6 +1059,16 @@ class GraphCategory(object):
       header = CONFIG['attr.graph.header.secondary'].get(self.stat_type(), '')
       header_stats = self._secondary_header_stats
 
+    if distribution:
+      header_stats = [
+        'p50: %s' % self._y_axis_label(int(round(distribution.p50)), is_primary),
+        ', p95: %s' % self._y_axis_label(int(round(distribution.p95)), is_primary),
+        ', p99: %s' % self._y_axis_label(int(round(distribution.p99)), is_primary),
+      ]
+
+      if distribution.peak_to_mean:
+        header_stats.append(', peak/mean: %0.1f' % distribution.peak_to_mean)
+
     header_stats = join(header_stats, '', width - len(header) - 4).rstrip()
     return '%s (%s):' % (header, header_stats) if header_stats else '%s:' % header
 
@@ -263,30 +1081,11 @@ class BandwidthStats(GraphCategory):
   Tracks tor's bandwidth usage.
   """
 
-  def __init__(self, clone = None):
-    GraphCategory.__init__(self, clone)
+  def __init__(self, clone = None, history_path = None):
+    GraphCategory.__init__(self, clone, history_path)
 
     if not clone:
-      # fill in past bandwidth information
-
       controller = tor_controller()
-      bw_entries, is_successful = controller.get_info('bw-event-cache', None), True
-
-      if bw_entries:
-        for entry in bw_entries.split():
-          entry_comp = entry.split(',')
-
-          if len(entry_comp) != 2 or not entry_comp[0].isdigit() or not entry_comp[1].isdigit():
-            log.warn(msg('panel.graphing.bw_event_cache_malformed', response = bw_entries))
-            is_successful = False
-            break
-
-          self.primary.update(int(entry_comp[0]))
-          self.secondary.update(int(entry_comp[1]))
-
-        if is_successful:
-          log.info(msg('panel.graphing.prepopulation_successful', duration = str_tools.time_label(len(bw_entries.split()), is_long = True)))
-
       read_total = controller.get_info('traffic/read', None)
       write_total = controller.get_info('traffic/written', None)
       start_time = system.start_time(controller.get_pid(None))
@@ -299,6 +1098,44 @@ class BandwidthStats(GraphCategory):
   def stat_type(self):
     return GraphStat.BANDWIDTH
 
+  def _recent_samples(self):
+    # fill in past bandwidth information
+
+    bw_entries, samples = tor_controller().get_info('bw-event-cache', None), []
+
+    if bw_entries:
+      for entry in bw_entries.split():
+        entry_comp = entry.split(',')
+
+        if len(entry_comp) != 2 or not entry_comp[0].isdigit() or not entry_comp[1].isdigit():
+          log.warn(msg('panel.graphing.bw_event_cache_malformed', response = bw_entries))
+          return samples
+
+        samples.append((int(entry_comp[0]), int(entry_comp[1])))
+
+      log.info(msg('panel.graphing.prepopulation_successful', duration = str_tools.time_label(len(samples), is_long = True)))
+
+    return samples
+
+  def _gap_values(self, seconds, last_updated, recent):
+    # If tor's been running since we last saved then its traffic counters
+    # tell us how much it transferred while we weren't running, which we
+    # average over the gap. Otherwise tor was down for at least part of it,
+    # and we don't know when.
+
+    controller = tor_controller()
+    start_time = system.start_time(controller.get_pid(None))
+    read_total = controller.get_info('traffic/read', None)
+    write_total = controller.get_info('traffic/written', None)
+
+    if not start_time or start_time > last_updated or not read_total or not write_total:
+      return 0, 0
+
+    unaccounted_read = int(read_total) - self.primary.total - sum([sample[0] for sample in recent])
+    unaccounted_written = int(write_total) - self.secondary.total - sum([sample[1] for sample in recent])
+
+    return max(0, unaccounted_read) // seconds, max(0, unaccounted_written) // seconds
+
   def _y_axis_label(self, value, is_primary):
     return _size_label(value, 0)
 
@@ -357,24 +1194,21 @@ class ConnectionStats(GraphCategory):
   Tracks number of inbound and outbound connections.
   """
 
+  def __init__(self, clone = None, history_path = None):
+    if clone:
+      self._counted_run = clone._counted_run
+      self._counts = clone._counts
+    else:
+      self._counted_run = None  # connection tracker run we last counted
+      self._counts = (0, 0)  # inbound and outbound connections of that run
+
+    GraphCategory.__init__(self, clone, history_path)
+
   def stat_type(self):
     return GraphStat.CONNECTIONS
 
   def bandwidth_event(self, event):
-    inbound_count, outbound_count = 0, 0
-
-    controller = tor_controller()
-    or_ports = controller.get_ports(Listener.OR, [])
-    dir_ports = controller.get_ports(Listener.DIR, [])
-    control_ports = controller.get_ports(Listener.CONTROL, [])
-
-    for entry in nyx.tracker.get_connection_tracker().get_value():
-      if entry.local_port in or_ports or entry.local_port in dir_ports:
-        inbound_count += 1
-      elif entry.local_port in control_ports:
-        pass  # control connection
-      else:
-        outbound_count += 1
+    inbound_count, outbound_count = self._connection_counts()
 
     self.primary.update(inbound_count)
     self.secondary.update(outbound_count)
@@ -382,6 +1216,37 @@ class ConnectionStats(GraphCategory):
     self._primary_header_stats = [str(self.primary.latest_value), ', avg: %s' % self.primary.average()]
     self._secondary_header_stats = [str(self.secondary.latest_value), ', avg: %s' % self.secondary.average()]
 
+  def _connection_counts(self):
+    """
+    Provides the number of inbound and outbound connections. The connection
+    tracker only checks for new connections every few seconds, so we only
+    count them when it has new results rather than each second.
+
+    :returns: **tuple** of the form (inbound, outbound)
+    """
+
+    tracker = nyx.tracker.get_connection_tracker()
+    run_counter = tracker.run_counter()
+
+    if run_counter != self._counted_run:
+      inbound_count, outbound_count = 0, 0
+
+      controller = tor_controller()
+      inbound_ports = set(controller.get_ports(Listener.OR, []) + controller.get_ports(Listener.DIR, []))
+      control_ports = set(controller.get_ports(Listener.CONTROL, []))
+
+      for entry in tracker.get_value():
+        if entry.local_port in inbound_ports:
+          inbound_count += 1
+        elif entry.local_port in control_ports:
+          pass  # control connection
+        else:
+          outbound_count += 1
+
+      self._counted_run, self._counts = run_counter, (inbound_count, outbound_count)
+
+    return self._counts
+
 
 class ResourceStats(GraphCategory):
   """
@@ -403,6 +1268,40 @@ class ResourceStats(GraphCategory):
     self._secondary_header_stats = [str_tools.size_label(self.secondary.latest_value, 1), ', avg: %s' % str_tools.size_label(self.secondary.average(), 1)]
 
 
+class TalkerStats(GraphCategory):
+  """
+  Tracks the throughput of our busiest connections and circuits.
+  """
+
+  def stat_type(self):
+    return GraphStat.TALKERS
+
+  def _y_axis_label(self, value, is_primary):
+    return _size_label(value, 0)
+
+  def bandwidth_event(self, event):
+    tracker = nyx.tracker.get_throughput_tracker()
+    count = CONFIG['features.graph.talkers.count']
+
+    connections = tracker.get_top_talkers(count, nyx.tracker.TalkerType.CONNECTION)
+    circuits = tracker.get_top_talkers(count, nyx.tracker.TalkerType.CIRCUIT)
+
+    self.primary.update(int(sum([talker.rate.read + talker.rate.written for talker in connections])))
+    self.secondary.update(int(sum([talker.rate.read + talker.rate.written for talker in circuits])))
+
+    self._primary_header_stats = ['%s/sec' % _size_label(self.primary.latest_value), ', top %i' % count]
+    self._secondary_header_stats = ['%s/sec' % _size_label(self.secondary.latest_value), ', top %i' % count]
+
+    stats = []
+
+    for label, talkers in (('connection', connections), ('circuit', circuits)):
+      if talkers:
+        busiest = talkers[0]
+        stats.append('busiest %s %s: %s/sec' % (label, busiest.id, _size_label(busiest.rate.read + busiest.rate.written)))
+
+    self._title_stats = stats
+
+
 class GraphPanel(nyx.panel.Panel):
   """
   Panel displaying graphical information of GraphCategory instances.
@@ -415,19 +1314,22 @@ class GraphPanel(nyx.panel.Panel):
     self._update_interval = CONFIG['features.graph.interval']
     self._bounds = CONFIG['features.graph.bound']
     self._graph_height = CONFIG['features.graph.height']
+    self._show_percentiles = CONFIG['features.graph.showPercentiles']
+    self._zoom = Zoom(INTERVAL_SECONDS[self._update_interval], 0)
 
     self._accounting_stats = None
     self._accounting_stats_paused = None
 
     self._stats = {
-      GraphStat.BANDWIDTH: BandwidthStats(),
-      GraphStat.SYSTEM_RESOURCES: ResourceStats(),
+      GraphStat.BANDWIDTH: BandwidthStats(history_path = _history_path(GraphStat.BANDWIDTH)),
+      GraphStat.SYSTEM_RESOURCES: ResourceStats(history_path = _history_path(GraphStat.SYSTEM_RESOURCES)),
+      GraphStat.TALKERS: TalkerStats(history_path = _history_path(GraphStat.TALKERS)),
     }
 
     self._stats_paused = None
 
     if CONFIG['features.panels.show.connection']:
-      self._stats[GraphStat.CONNECTIONS] = ConnectionStats()
+      self._stats[GraphStat.CONNECTIONS] = ConnectionStats(history_path = _history_path(GraphStat.CONNECTIONS))
     elif self._displayed_stat == GraphStat.CONNECTIONS:
       log.warn("The connection graph is unavailble when you set 'features.panels.show.connection false'.")
       self._displayed_stat = GraphStat.BANDWIDTH
@@ -461,6 +1363,18 @@ class GraphPanel(nyx.panel.Panel):
       raise ValueError("%s isn't a valid graphing update interval" % value)
 
     self._update_interval = value
+    self._zoom = Zoom(INTERVAL_SECONDS[value], 0)
+
+  @property
+  def zoom(self):
+    return self._zoom
+
+  @zoom.setter
+  def zoom(self, value):
+    if value.step < 1 or value.offset < 0:
+      raise ValueError("Graphs can't be zoomed to %i second columns that end %i seconds ago" % (value.step, value.offset))
+
+    self._zoom = value
 
   @property
   def bounds_type(self):
@@ -547,11 +1461,45 @@ class GraphPanel(nyx.panel.Panel):
       self.update_interval = nyx.popups.select_from_list('Update Interval:', list(Interval), self.update_interval)
       self.redraw()
 
+    def _toggle_percentiles():
+      self._show_percentiles = not self._show_percentiles
+      self.redraw()
+
+    def _zoom_in():
+      finer = [step for step in ZOOM_STEPS if step < self.zoom.step]
+
+      if finer:
+        self.zoom = Zoom(finer[-1], self.zoom.offset)
+        self.redraw()
+
+    def _zoom_out():
+      coarser = [step for step in ZOOM_STEPS if step > self.zoom.step]
+
+      if coarser:
+        self.zoom = Zoom(coarser[0], self.zoom.offset)
+        self.redraw()
+
+    def _pan_back():
+      self.zoom = Zoom(self.zoom.step, self.zoom.offset + PAN_COLUMNS * self.zoom.step)
+      self.redraw()
+
+    def _pan_forward():
+      self.zoom = Zoom(self.zoom.step, max(0, self.zoom.offset - PAN_COLUMNS * self.zoom.step))
+      self.redraw()
+
+    zoom_label = '%s per column' % str_tools.time_label(self.zoom.step)
+    pan_label = '%s ago' % str_tools.time_label(self.zoom.offset) if self.zoom.offset else 'present'
+
     return (
       nyx.panel.KeyHandler('g', 'resize graph', self.resize_graph),
       nyx.panel.KeyHandler('s', 'graphed stats', _pick_stats, self.displayed_stat if self.displayed_stat else 'none'),
       nyx.panel.KeyHandler('b', 'graph bounds', _next_bounds, self.bounds_type.replace('_', ' ')),
       nyx.panel.KeyHandler('i', 'graph update interval', _pick_interval, self.update_interval),
+      nyx.panel.KeyHandler('d', 'graph header stats', _toggle_percentiles, 'percentiles' if self._show_percentiles else 'averages'),
+      nyx.panel.KeyHandler('+', 'zoom in', _zoom_in, zoom_label, key_func = lambda key: key.match('+', '=')),
+      nyx.panel.KeyHandler('-', 'zoom out', _zoom_out),
+      nyx.panel.KeyHandler('[', 'pan back', _pan_back, pan_label),
+      nyx.panel.KeyHandler(']', 'pan forward', _pan_forward),
     )
 
   def set_paused(self, is_pause):
@@ -579,8 +1527,8 @@ class GraphPanel(nyx.panel.Panel):
 
     subwindow.addstr(0, 0, stat.title(subwindow.width), HIGHLIGHT)
 
-    _draw_subgraph(subwindow, stat.primary, 0, subgraph_width, subgraph_height, bounds_type, interval, PRIMARY_COLOR)
-    _draw_subgraph(subwindow, stat.secondary, subgraph_width, subgraph_width, subgraph_height, bounds_type, interval, SECONDARY_COLOR)
+    _draw_subgraph(subwindow, stat.primary, 0, subgraph_width, subgraph_height, bounds_type, interval, PRIMARY_COLOR, style = CONFIG['features.graph.style'], show_percentiles = self._show_percentiles, zoom = self._zoom)
+    _draw_subgraph(subwindow, stat.secondary, subgraph_width, subgraph_width, subgraph_height, bounds_type, interval, SECONDARY_COLOR, style = CONFIG['features.graph.style'], show_percentiles = self._show_percentiles, zoom = self._zoom)
 
     if stat.stat_type() == GraphStat.BANDWIDTH and accounting_stats:
       _draw_accounting_stats(subwindow, DEFAULT_CONTENT_HEIGHT + subgraph_height - 2, accounting_stats)
@@ -612,20 +1560,33 @@ class GraphPanel(nyx.panel.Panel):
         self.redraw()
 
 
-def _draw_subgraph(subwindow, data, x, width, height, bounds_type, interval, color, fill_char = ' '):
+def _draw_subgraph(subwindow, data, x, width, height, bounds_type, interval, color, fill_char = ' ', style = Style.BLOCK, show_percentiles = False, zoom = None):
   """
-  Renders subgraph including its title, labeled axis, and content.
+  Renders subgraph including its title, labeled axis, and content. Unicode
+  styles fall back to blocks if curses can't render wide characters. If zoomed
+  to anything other than the interval's own scale then we draw downsampled
+  values for that range instead.
   """
 
+  if style != Style.BLOCK and not nyx.curses.is_wide_characters_supported():
+    style = Style.BLOCK
+
+  samples_per_column = STYLE_RESOLUTION[style][0]
   columns = width - 8  # y-axis labels can be at most six characters wide with a space on either side
-  min_bound, max_bound = data.bounds(bounds_type, interval, columns)
 
-  x_axis_labels = _x_axis_labels(interval, columns)
+  if zoom and zoom != Zoom(INTERVAL_SECONDS[interval], 0):
+    source = zoom
+    min_bound, max_bound = data.zoomed_bounds(bounds_type, zoom, columns * samples_per_column)
+    x_axis_labels = _x_axis_labels(Interval.EACH_SECOND, columns, zoom.step * samples_per_column, zoom.offset)
+  else:
+    min_bound, max_bound = data.bounds(bounds_type, interval, columns * samples_per_column)
+    x_axis_labels = _x_axis_labels(interval, columns, samples_per_column)
+    source = interval
   y_axis_labels = _y_axis_labels(height, data, min_bound, max_bound)
   columns = max(columns, width - max([len(label) for label in y_axis_labels.values()]) - 2)
   axis_offset = max([len(label) for label in y_axis_labels.values()])
 
-  subwindow.addstr(x, 1, data.header(width), color, BOLD)
+  subwindow.addstr(x, 1, data.header(width, interval if show_percentiles else None), color, BOLD)
 
   for x_offset, label in x_axis_labels.items():
     subwindow.addstr(x + x_offset + axis_offset, height, label, color)
@@ -633,31 +1594,113 @@ def _draw_subgraph(subwindow, data, x, width, height, bounds_type, interval, col
   for y, label in y_axis_labels.items():
     subwindow.addstr(x, y, label, color)
 
-  for col in range(columns):
-    column_count = int(data.values[interval][col]) - min_bound
-    column_height = int(min(height - 2, (height - 2) * column_count / (max(1, max_bound) - min_bound)))
+  left = x + axis_offset + 1
+
+  if style != Style.BLOCK:
+    for row, glyphs in enumerate(data.glyph_rows(source, style, columns, height - 2, min_bound, max_bound)):
+      if not stem.prereq.is_python_3():
+        glyphs = glyphs.encode('utf-8')  # python 2 curses can only draw bytes
+
+      subwindow.addstr(left, row + 2, glyphs, color)
+
+    return
+
+  # Heights for all our columns, each drawn with a single curses call rather
+  # than a call per cell.
+
+  graph_height, graph_range = height - 2, max(1, max_bound) - min_bound
+  column_heights = [int(min(graph_height, graph_height * (int(value) - min_bound) / graph_range)) for value in data._view(source, columns)]
+
+  for col, column_height in enumerate(column_heights):
+    if column_height > 0:
+      subwindow.vfill(left + col, height - column_height, column_height, fill_char, color, HIGHLIGHT)
+
+
+def _histogram_bucket(value):
+  """
+  Provides the :class:`~nyx.panel.graph.LogHistogram` bucket a value belongs
+  in.
+  """
+
+  if value < 1:
+    return 0
+
+  return min(HISTOGRAM_BUCKETS - 1, 1 + int(math.log(value, 2) * HISTOGRAM_BUCKETS_PER_DOUBLING))
+
+
+def _history_path(stat):
+  """
+  Provides the path where we persist a graph's values. This is specific to
+  the relay we're attached to, so switching relays doesn't mingle their
+  history.
+
+  :param GraphStat stat: graph to provide the path for
+
+  :returns: **str** path for its history, or **None** if we're not saving it
+  """
+
+  if not CONFIG['features.graph.saveHistory']:
+    return None
+
+  fingerprint = tor_controller().get_info('fingerprint', None)
+  return os.path.join(DATA_DIR, 'graph_history', '%s.%s' % (fingerprint if fingerprint else 'client', stat))
+
+
+def _cache(cache, key, tick, *value):
+  """
+  Stores a rendering in one of our caches. Pans and resizes each make a new
+  key, so we drop renderings from prior ticks and keep the cache bounded.
+  """
+
+  for stale_key in [k for k, entry in list(cache.items()) if entry[0] != tick]:
+    cache.pop(stale_key, None)
+
+  while len(cache) >= GRAPH_CACHE_SIZE:
+    cache.pop(next(iter(cache)), None)
 
-    for row in range(column_height):
-      subwindow.addstr(x + col + axis_offset + 1, height - 1 - row, fill_char, color, HIGHLIGHT)
+  cache[key] = (tick,) + value
 
 
-def _x_axis_labels(interval, columns):
+def _to_number(value):
+  """
+  Converts a float read from a history file back to an int if it's whole, so
+  integer statistics are labeled as they were before we saved them.
+  """
+
+  return int(value) if isinstance(value, float) and value.is_integer() else value
+
+
+def _merge_bounds(min_value, max_value, bounds):
+  """
+  Widens a (min, max) range to include another, either of which can be
+  **None** if not yet set.
+  """
+
+  if min_value is None:
+    return bounds
+
+  return min(min_value, bounds[0]), max(max_value, bounds[1])
+
+
+def _x_axis_labels(interval, columns, samples_per_column = 1, offset = 0):
   """
   Provides the labels for the x-axis. We include the units for only its first
   value, then bump the precision for subsequent units. For example...
 
     10s, 20, 30, 40, 50, 1m, 1.1, 1.3, 1.5
+
+  If panned then the labels are offset by how far back in time we are.
   """
 
   x_axis_labels = {}
 
-  interval_sec = INTERVAL_SECONDS[interval]
+  interval_sec = INTERVAL_SECONDS[interval] * samples_per_column
   interval_spacing = 10 if columns >= WIDE_LABELING_GRAPH_COL else 5
-  previous_units, decimal_precision = None, 0
+  previous_units, decimal_precision = None, 1 if offset else 0
 
   for i in range((columns - 4) / interval_spacing):
     x = (i + 1) * interval_spacing
-    time_label = str_tools.time_label(x * interval_sec, decimal_precision)
+    time_label = str_tools.time_label(x * interval_sec + offset, decimal_precision)
 
     if not previous_units:
       previous_units = time_label[-1]
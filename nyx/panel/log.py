@@ -4,9 +4,11 @@
 """
 Panel providing a chronological log of events its been configured to listen
 for. This provides prepopulation from the log file and supports filtering by
-regular expressions.
+regular expressions and searching.
 """
 
+import collections
+import functools
 import os
 import time
 
@@ -20,7 +22,7 @@ import nyx.popups
 import nyx.log
 
 from nyx import join, tor_controller
-from nyx.curses import GREEN, YELLOW, WHITE, NORMAL, BOLD, HIGHLIGHT
+from nyx.curses import GREEN, YELLOW, WHITE, NORMAL, BOLD, UNDERLINE, HIGHLIGHT
 from stem.util import conf, log
 
 
@@ -29,21 +31,59 @@ def conf_handler(key, value):
     return max(0, value)
   elif key == 'cache.log_panel.size':
     return max(1000, value)
+  elif key in ('features.logFile.maxSize', 'features.logFile.backups'):
+    return max(0, value)
+  elif key in ('features.logFile.queueSize', 'features.log.queueSize'):
+    return max(1, value)
+  elif key == 'features.logFile.flushRate':
+    return max(0.1, value)
+  elif key in ('features.log.rateLimit.perType', 'features.log.rateLimit.perMessage'):
+    return max(0, value)
+  elif key == 'features.log.rateLimit.summaryInterval':
+    return max(1, value)
+  elif key == 'features.log.rateLimit.type':
+    type_rates = {}
+
+    for event_type, rate in value.items():
+      if rate.isdigit():
+        type_rates[event_type] = int(rate)
+      else:
+        log.info("Rate limit for %s events should be a non-negative integer, but was '%s'" % (event_type, rate))
+
+    return type_rates
 
 
 CONFIG = conf.config_dict('nyx', {
   'attr.log_color': {},
   'cache.log_panel.size': 1000,
   'features.logFile': '',
+  'features.logFile.maxSize': 0,
+  'features.logFile.backups': 5,
+  'features.logFile.compress': False,
+  'features.logFile.queueSize': 10000,
+  'features.logFile.flushRate': 1.0,
   'features.log.showDuplicateEntries': False,
   'features.log.prepopulate': True,
   'features.log.prepopulateReadLimit': 5000,
+  'features.log.followLogFile': False,
+  'features.log.queueSize': 100000,
   'features.log.regex': [],
+  'features.log.rateLimit.perType': 100,
+  'features.log.rateLimit.perMessage': 10,
+  'features.log.rateLimit.summaryInterval': 10,
+  'features.log.rateLimit.type': {},
   'startup.events': 'NOTICE,WARN,ERR,NYX_NOTICE,NYX_WARNING,NYX_ERROR',
 }, conf_handler)
 
 UPDATE_RATE = 0.3
 
+# Seconds events can wait to be processed before we note our backlog in the
+# title.
+
+INGESTION_LAG = 1.0
+
+IngestionMetrics = collections.namedtuple('IngestionMetrics', ['queue_depth', 'drain_latency', 'dropped'])
+
 # The height of the drawn content is estimated based on the last time we redrew
 # the panel. It's chiefly used for scrolling and the bar indicating its
 # position. Letting the estimate be too inaccurate results in a display bug, so
@@ -62,7 +102,8 @@ stem_logger.addHandler(NYX_LOGGER)
 class LogPanel(nyx.panel.DaemonPanel):
   """
   Listens for and displays tor, nyx, and stem events. This prepopulates
-  from tor's log file if it exists.
+  from tor's log file if it exists, and can follow it for tor's runlevel
+  events rather than listening on the control port.
   """
 
   def __init__(self):
@@ -78,38 +119,92 @@ class LogPanel(nyx.panel.DaemonPanel):
 
     self._event_log = nyx.log.LogGroup(CONFIG['cache.log_panel.size'], group_by_day = True)
     self._event_log_paused = None
-    self._event_types = nyx.log.listen_for_events(self._register_tor_event, logged_events)
-    self._log_file = nyx.log.LogFileOutput(CONFIG['features.logFile'])
+    self._log_file = nyx.log.LogFileOutput(
+      CONFIG['features.logFile'],
+      max_size = CONFIG['features.logFile.maxSize'],
+      backup_count = CONFIG['features.logFile.backups'],
+      compress = CONFIG['features.logFile.compress'],
+      queue_size = CONFIG['features.logFile.queueSize'],
+      flush_rate = CONFIG['features.logFile.flushRate'],
+    )
+
     self._filter = nyx.log.LogFilters(initial_filters = CONFIG['features.log.regex'])
     self._show_duplicates = CONFIG['features.log.showDuplicateEntries']
 
     self._scroller = nyx.curses.Scroller()
     self._has_new_event = False
+
+    self._search_query = None
+    self._search_position = 0  # index of the match we've selected, newest first
+    self._scroll_to_match = False
     self._last_day = nyx.log.day_count(time.time())
 
-    # fetches past tor events from log file, if available
+    self._rate_limiter = nyx.log.LogRateLimiter(
+      type_rate = CONFIG['features.log.rateLimit.perType'],
+      message_rate = CONFIG['features.log.rateLimit.perMessage'],
+      summary_interval = CONFIG['features.log.rateLimit.summaryInterval'],
+      type_rates = CONFIG['features.log.rateLimit.type'],
+    )
+
+    # Events are queued as they arrive and processed in batches by our
+    # ingestor's thread, so high volume events (like DEBUG) don't back up
+    # stem's event thread.
 
-    if CONFIG['features.log.prepopulate']:
+    self._event_types = []
+    self._ingestor = nyx.log.LogIngestor(self._register_events, queue_size = CONFIG['features.log.queueSize'])
+
+    # If following tor's log file then its runlevel events come from there
+    # rather than our control port.
+
+    log_location = None
+    self._follower = None
+
+    if CONFIG['features.log.prepopulate'] or CONFIG['features.log.followLogFile']:
       log_location = nyx.log.log_file_path(tor_controller())
 
-      if log_location:
-        try:
-          for entry in reversed(list(nyx.log.read_tor_log(log_location, CONFIG['features.log.prepopulateReadLimit']))):
-            if entry.type in self._event_types:
-              self._event_log.add(entry)
-        except IOError as exc:
-          log.info('Unable to read log located at %s: %s' % (log_location, exc))
-        except ValueError as exc:
-          log.info(str(exc))
+    if log_location and CONFIG['features.log.followLogFile']:
+      try:
+        self._follower = nyx.log.LogFileFollower(log_location, self._register_log_file_entries)
+      except IOError as exc:
+        log.info('Unable to follow log located at %s: %s' % (log_location, exc))
+
+    self._event_types = self._listen_for_events(logged_events)
+
+    # fetches past tor events from log file, if available
+
+    if log_location and CONFIG['features.log.prepopulate']:
+      try:
+        for entry in reversed(list(nyx.log.read_tor_log(log_location, CONFIG['features.log.prepopulateReadLimit']))):
+          if entry.type in self._event_types:
+            self._event_log.add(entry)
+      except IOError as exc:
+        log.info('Unable to read log located at %s: %s' % (log_location, exc))
+      except ValueError as exc:
+        log.info(str(exc))
+
+    if self._follower:
+      self._follower.start()
 
     self._last_content_height = len(self._event_log)  # height of the rendered content when last drawn
 
     # merge NYX_LOGGER into us, and listen for its future events
 
-    for event in NYX_LOGGER:
-      self._register_nyx_event(event)
+    self._register_events(list(NYX_LOGGER))
+    NYX_LOGGER.emit = self._ingestor.add
+
+  def stop(self):
+    """
+    Halts our updates and flushes any events we've yet to process or write to
+    our log file.
+    """
+
+    nyx.panel.DaemonPanel.stop(self)
+
+    if self._follower:
+      self._follower.stop()
 
-    NYX_LOGGER.emit = self._register_nyx_event
+    self._ingestor.stop()
+    self._log_file.close()
 
   def set_duplicate_visability(self, is_visible):
     """
@@ -138,6 +233,44 @@ class LogPanel(nyx.panel.DaemonPanel):
     if regex_input:
       self._filter.select(regex_input)
 
+  def show_search_prompt(self):
+    """
+    Prompts the user for words to search the log for, clearing our search if
+    left blank.
+    """
+
+    query = nyx.controller.input_prompt('Search: ')
+
+    if query is not None:
+      self.search(query)
+
+  def search(self, query):
+    """
+    Highlights log entries containing the given words, scrolling to the newest
+    match.
+
+    :param str query: words to search for, clears the search if **None** or
+      blank
+    """
+
+    self._search_query = query.strip() if query and query.strip() else None
+    self._search_position = 0
+    self._scroll_to_match = True
+    self.redraw()
+
+  def select_match(self, offset):
+    """
+    Moves our selection among the search matches, scrolling to it.
+
+    :param int offset: number of matches to move by, positive values selecting
+      older entries and negative selecting newer
+    """
+
+    if self._search_query:
+      self._search_position = max(0, self._search_position + offset)
+      self._scroll_to_match = True
+      self.redraw()
+
   def show_event_selection_prompt(self):
     """
     Prompts the user to select the events being listened for.
@@ -147,7 +280,7 @@ class LogPanel(nyx.panel.DaemonPanel):
     event_types = nyx.popups.select_event_types(self._event_types)
 
     if event_types and event_types != self._event_types:
-      self._event_types = nyx.log.listen_for_events(self._register_tor_event, event_types)
+      self._event_types = self._listen_for_events(event_types)
       self.redraw()
 
   def show_snapshot_prompt(self):
@@ -242,6 +375,9 @@ class LogPanel(nyx.panel.DaemonPanel):
       nyx.panel.KeyHandler('a', 'save snapshot of the log', self.show_snapshot_prompt),
       nyx.panel.KeyHandler('e', 'change logged events', self.show_event_selection_prompt),
       nyx.panel.KeyHandler('f', 'log regex filter', _pick_filter, 'enabled' if self._filter.selection() else 'disabled'),
+      nyx.panel.KeyHandler('/', 'search the log', self.show_search_prompt, self._search_query if self._search_query else 'none'),
+      nyx.panel.KeyHandler('.', 'next search match', functools.partial(self.select_match, 1)),
+      nyx.panel.KeyHandler(',', 'previous search match', functools.partial(self.select_match, -1)),
       nyx.panel.KeyHandler('u', 'duplicate log entries', _toggle_deduplication, 'visible' if self._show_duplicates else 'hidden'),
       nyx.panel.KeyHandler('c', 'clear event log', _clear_log),
     )
@@ -259,9 +395,23 @@ class LogPanel(nyx.panel.DaemonPanel):
     last_content_height = self._last_content_height
     show_duplicates = self._show_duplicates
 
-    event_log = self._event_log_paused if nyx_controller.is_paused() else self._event_log
-    event_log = filter(lambda entry: event_filter.match(entry.display_message), event_log)
-    event_log = filter(lambda entry: not entry.is_duplicate or show_duplicates, event_log)
+    def is_shown(entry):
+      return event_filter.match(entry.display_message) and (not entry.is_duplicate or show_duplicates)
+
+    event_group = self._event_log_paused if nyx_controller.is_paused() else self._event_log
+    event_log = filter(is_shown, event_group)
+
+    search_matches, search_label, focused_match = [], None, None
+
+    if self._search_query:
+      search_matches = [entry for entry in event_group.search(self._search_query) if is_shown(entry)]
+
+      if search_matches:
+        self._search_position = min(self._search_position, len(search_matches) - 1)
+        focused_match = search_matches[self._search_position]
+        search_label = '%s (%i/%i)' % (self._search_query, self._search_position + 1, len(search_matches))
+      else:
+        search_label = '%s (no matches)' % self._search_query
 
     is_scrollbar_visible = last_content_height > subwindow.height - 1
 
@@ -269,11 +419,11 @@ class LogPanel(nyx.panel.DaemonPanel):
       subwindow.scrollbar(1, scroll, last_content_height - 1)
 
     x, y = 3 if is_scrollbar_visible else 1, 1 - scroll
-    y = _draw_entries(subwindow, x, y, event_log, show_duplicates)
+    y, focused_y = _draw_entries(subwindow, x, y, event_log, show_duplicates, search_matches, focused_match)
 
     # drawing the title after the content, so we'll clear content from the top line
 
-    _draw_title(subwindow, event_types, event_filter)
+    _draw_title(subwindow, event_types, event_filter, search_label, self.ingestion_metrics())
 
     # redraw the display if...
     # - last_content_height was off by too much
@@ -283,7 +433,11 @@ class LogPanel(nyx.panel.DaemonPanel):
     content_height_delta = abs(last_content_height - new_content_height)
     force_redraw, force_redraw_reason = True, ''
 
-    if content_height_delta >= CONTENT_HEIGHT_REDRAW_THRESHOLD:
+    if self._scroll_to_match and focused_y is not None and not (1 <= focused_y < subwindow.height):
+      self._scroller.scroll_to(focused_y + scroll - 1)
+      self._scroll_to_match = False
+      force_redraw_reason = 'scrolling to the selected search match'
+    elif content_height_delta >= CONTENT_HEIGHT_REDRAW_THRESHOLD:
       force_redraw_reason = 'estimate was off by %i' % content_height_delta
     elif new_content_height > subwindow.height and scroll + subwindow.height - 1 > new_content_height:
       force_redraw_reason = 'scrolled off the bottom of the page'
@@ -297,6 +451,9 @@ class LogPanel(nyx.panel.DaemonPanel):
     self._last_content_height = new_content_height
     self._has_new_event = False
 
+    if not force_redraw:
+      self._scroll_to_match = False
+
     if force_redraw:
       log.debug('redrawing the log panel with the corrected content height (%s)' % force_redraw_reason)
       self.redraw()
@@ -308,41 +465,116 @@ class LogPanel(nyx.panel.DaemonPanel):
     responsive if additions are less frequent.
     """
 
+    self._add_entries(self._rate_limiter.summaries())
     current_day = nyx.log.day_count(time.time())
 
     if self._has_new_event or self._last_day != current_day:
       self._last_day = current_day
       self.redraw()
 
+  def ingestion_metrics(self):
+    """
+    Provides the backlog of events we've yet to process, how long our last
+    batch waited, and how many events we've dropped because we couldn't keep
+    up. These are noted in our title when we fall behind.
+
+    :returns: :data:`~nyx.panel.log.IngestionMetrics` for our event processing
+    """
+
+    return IngestionMetrics(self._ingestor.queue_depth(), self._ingestor.drain_latency(), self._ingestor.dropped())
+
+  def _listen_for_events(self, event_types):
+    """
+    Listens for the given events, taking tor's runlevels from its log file
+    rather than our control port if we're following it.
+
+    :param list event_types: events to listen for
+
+    :returns: **list** of event types we're now listening to
+    """
+
+    if not self._follower:
+      return nyx.log.listen_for_events(self._register_tor_event, event_types)
+
+    followed = [event_type for event_type in event_types if event_type in nyx.log.TOR_RUNLEVELS]
+    subscribed = [event_type for event_type in event_types if event_type not in nyx.log.TOR_RUNLEVELS]
+
+    return sorted(set(nyx.log.listen_for_events(self._register_tor_event, subscribed) + followed))
+
   def _register_tor_event(self, event):
-    msg = ' '.join(str(event).split(' ')[1:])
+    self._ingestor.add(event)
 
-    if isinstance(event, stem.response.events.BandwidthEvent):
-      msg = 'READ: %i, WRITTEN: %i' % (event.read, event.written)
-    elif isinstance(event, stem.response.events.LogEvent):
-      msg = event.message
+  def _register_log_file_entries(self, entries):
+    for entry in entries:
+      self._ingestor.add(entry)
 
-    self._register_event(nyx.log.LogEntry(event.arrived_at, event.type, msg))
+  def _register_events(self, events):
+    """
+    Processes a batch of tor events and NYX_LOGGER records.
 
-  def _register_nyx_event(self, record):
-    self._register_event(nyx.log.LogEntry(int(record.created), 'NYX_%s' % record.levelname, record.msg))
+    :param list events: raw events to process, oldest first
+    """
+
+    entries = []
+
+    for event in events:
+      entry = _to_log_entry(event)
+
+      if entry.type in self._event_types and self._rate_limiter.allow(entry):
+        entries.append(entry)
+
+    self._add_entries(entries + self._rate_limiter.summaries())
+
+  def _add_entries(self, entries):
+    """
+    Adds entries to our log and file, and notes if we have new content to show.
 
-  def _register_event(self, event):
-    if event.type not in self._event_types:
+    :param list entries: :class:`~nyx.log.LogEntry` to add, oldest first
+    """
+
+    if not entries:
       return
 
-    self._event_log.add(event)
-    self._log_file.write(event.display_message)
+    self._event_log.extend(entries)
+
+    for entry in entries:
+      self._log_file.write(entry.display_message)
 
     # notifies the display that it has new content
 
-    if self._filter.match(event.display_message):
+    if any([self._filter.match(entry.display_message) for entry in entries]):
       self._has_new_event = True
 
 
-def _draw_title(subwindow, event_types, event_filter):
+def _to_log_entry(event):
   """
-  Panel title with the event types we're logging and our regex filter if set.
+  Converts a tor event, NYX_LOGGER record, or entry from tor's log file to a
+  LogEntry.
+
+  :param object event: event to convert
+
+  :returns: :class:`~nyx.log.LogEntry` for the event
+  """
+
+  if isinstance(event, nyx.log.LogEntry):
+    return event  # already parsed, such as entries from tor's log file
+  elif isinstance(event, stem.response.events.Event):
+    msg = ' '.join(str(event).split(' ')[1:])
+
+    if isinstance(event, stem.response.events.BandwidthEvent):
+      msg = 'READ: %i, WRITTEN: %i' % (event.read, event.written)
+    elif isinstance(event, stem.response.events.LogEvent):
+      msg = event.message
+
+    return nyx.log.LogEntry(event.arrived_at, event.type, msg)
+  else:
+    return nyx.log.LogEntry(int(event.created), 'NYX_%s' % event.levelname, event.msg)
+
+
+def _draw_title(subwindow, event_types, event_filter, search_label = None, ingestion = None):
+  """
+  Panel title with the event types we're logging, our regex filter, and search
+  if set. If we're falling behind on processing events that's noted too.
   """
 
   subwindow.addstr(0, 0, ' ' * subwindow.width)  # clear line
@@ -351,18 +583,40 @@ def _draw_title(subwindow, event_types, event_filter):
   if event_filter.selection():
     title_comp.append('filter: %s' % event_filter.selection())
 
+  if search_label:
+    title_comp.append('search: %s' % search_label)
+
+  if ingestion and ingestion.queue_depth and ingestion.drain_latency >= INGESTION_LAG:
+    title_comp.append('backlog: %i (%0.1fs)' % (ingestion.queue_depth, ingestion.drain_latency))
+
+  if ingestion and ingestion.dropped:
+    title_comp.append('dropped: %i' % ingestion.dropped)
+
   title_comp_str = join(title_comp, ', ', subwindow.width - 10)
   title = 'Events (%s):' % title_comp_str if title_comp_str else 'Events:'
 
   subwindow.addstr(0, 0, title, HIGHLIGHT)
 
 
-def _draw_entries(subwindow, x, y, event_log, show_duplicates):
+def _draw_entries(subwindow, x, y, event_log, show_duplicates, search_matches = (), focused_match = None):
   """
-  Presents a list of log entries, grouped by the day they appeared.
+  Presents a list of log entries, grouped by the day they appeared. Search
+  matches are underlined, and the one we've selected is highlighted.
+
+  :returns: **tuple** of the form (y, focused_y) with the vertical position we
+    drew to and where our focused match was drawn (**None** if it wasn't)
   """
 
   day_to_entries, today = {}, nyx.log.day_count(time.time())
+  search_matches, focused_y = set([id(entry) for entry in search_matches]), None
+
+  def highlight(entry):
+    if entry is focused_match:
+      return HIGHLIGHT
+    elif id(entry) in search_matches:
+      return UNDERLINE
+    else:
+      return None
 
   for entry in event_log:
     day_to_entries.setdefault(entry.day_count(), []).append(entry)
@@ -370,12 +624,18 @@ def _draw_entries(subwindow, x, y, event_log, show_duplicates):
   for day in sorted(day_to_entries.keys(), reverse = True):
     if day == today:
       for entry in day_to_entries[day]:
-        y = _draw_entry(subwindow, x, y, subwindow.width, entry, show_duplicates)
+        if entry is focused_match:
+          focused_y = y
+
+        y = _draw_entry(subwindow, x, y, subwindow.width, entry, show_duplicates, highlight(entry))
     else:
       original_y, y = y, y + 1
 
       for entry in day_to_entries[day]:
-        y = _draw_entry(subwindow, x, y, subwindow.width - 1, entry, show_duplicates)
+        if entry is focused_match:
+          focused_y = y
+
+        y = _draw_entry(subwindow, x, y, subwindow.width - 1, entry, show_duplicates, highlight(entry))
 
       subwindow.box(original_y, x - 1, subwindow.width - x + 1, y - original_y + 1, YELLOW, BOLD)
       time_label = time.strftime(' %B %d, %Y ', time.localtime(day_to_entries[day][0].timestamp))
@@ -383,20 +643,21 @@ def _draw_entries(subwindow, x, y, event_log, show_duplicates):
 
       y += 1
 
-  return y
+  return y, focused_y
 
 
-def _draw_entry(subwindow, x, y, width, entry, show_duplicates):
+def _draw_entry(subwindow, x, y, width, entry, show_duplicates, highlight = None):
   """
   Presents an individual log entry with line wrapping.
   """
 
   color = CONFIG['attr.log_color'].get(entry.type, WHITE)
   boldness = BOLD if entry.type in ('ERR', 'ERROR') else NORMAL  # emphasize ERROR messages
+  attr = (boldness, color, highlight) if highlight else (boldness, color)
   min_x = x + 2
 
   for line in entry.display_message.splitlines():
-    x, y = subwindow.addstr_wrap(x, y, line, width, min_x, boldness, color)
+    x, y = subwindow.addstr_wrap(x, y, line, width, min_x, *attr)
 
   if entry.duplicates and not show_duplicates:
     duplicate_count = len(entry.duplicates) - 1
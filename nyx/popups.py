@@ -123,13 +123,40 @@ def show_about():
 def show_counts(title, counts, fill_char = ' '):
   """
   Provides a dialog with bar graphs and percentages for the given set of
-  counts. Pressing any key closes the dialog.
+  counts. Counts can be provided for several periods, in which case the left
+  and right arrow keys switch between them. Pressing any other key closes the
+  dialog.
+
+  Periods can also note labels whose counts are estimates, which are shown
+  with a '~' prefix.
 
   :param str title: dialog title
-  :param dict counts: mapping of labels to their value
+  :param dict counts: mapping of labels to their value, or **list** of
+    (period, counts) or (period, counts, estimated) tuples
   :param str fill_char: character to use for rendering the bar graph
   """
 
+  if isinstance(counts, dict):
+    periods = [(None, counts, ())]
+  else:
+    periods = [period if len(period) == 3 else (period[0], period[1], ()) for period in counts]
+
+  index = 0
+
+  while True:
+    period, period_counts, estimated = periods[index]
+    key = _show_period_counts('%s (%s)' % (title, period) if period else title, period_counts, estimated, fill_char, len(periods) > 1)
+
+    if len(periods) > 1 and key and key.match('left'):
+      index = (index - 1) % len(periods)
+    elif len(periods) > 1 and key and key.match('right'):
+      index = (index + 1) % len(periods)
+    else:
+      break
+
+
+def _show_period_counts(title, counts, estimated, fill_char, has_periods):
+
   def _render_no_stats(subwindow):
     subwindow.box()
     subwindow.addstr(0, 0, title, HIGHLIGHT)
@@ -137,10 +164,11 @@ def show_counts(title, counts, fill_char = ' '):
 
   def _render_stats(subwindow):
     key_width, val_width, value_total = 3, 1, 0
+    val_labels = dict([(k, ('~%i' if k in estimated else '%i') % v) for k, v in counts.items()])
 
     for k, v in counts.items():
       key_width = max(key_width, len(k))
-      val_width = max(val_width, len(str(v)))
+      val_width = max(val_width, len(val_labels[k]))
       value_total += v
 
     subwindow.box()
@@ -150,21 +178,21 @@ def show_counts(title, counts, fill_char = ' '):
     sorted_counts = sorted(counts.iteritems(), key = operator.itemgetter(1), reverse = True)
 
     for y, (k, v) in enumerate(sorted_counts):
-      label = '%s %s (%-2i%%)' % (k.ljust(key_width), str(v).rjust(val_width), v * 100 / value_total)
+      label = '%s %s (%-2i%%)' % (k.ljust(key_width), val_labels[k].rjust(val_width), v * 100 / value_total)
       x = subwindow.addstr(2, y + 1, label, GREEN, BOLD)
 
       for j in range(graph_width * v / value_total):
         subwindow.addstr(x + j + 1, y + 1, fill_char, RED, HIGHLIGHT)
 
-    subwindow.addstr(2, subwindow.height - 2, 'Press any key...')
+    subwindow.addstr(2, subwindow.height - 2, 'Press left or right to change the period, or any other key...' if has_periods else 'Press any key...')
 
   with nyx.curses.CURSES_LOCK:
     if not counts:
-      nyx.curses.draw(_render_no_stats, top = _top(), width = len(NO_STATS_MSG) + 4, height = 3)
+      nyx.curses.draw(_render_no_stats, top = _top(), width = max(len(NO_STATS_MSG), len(title)) + 4, height = 3)
     else:
       nyx.curses.draw(_render_stats, top = _top(), width = 80, height = 4 + max(1, len(counts)))
 
-    nyx.curses.key_input()
+    return nyx.curses.key_input()
 
 
 def show_descriptor(fingerprint, color, is_close_key):
@@ -10,6 +10,8 @@ Background tasks for gathering information about the tor process.
   get_resource_tracker - provides a ResourceTracker for our tor process
   get_port_usage_tracker - provides a PortUsageTracker for our system
   get_consensus_tracker - provides a ConsensusTracker for our tor process
+  get_throughput_tracker - provides a ThroughputTracker for our tor process
+  get_circuit_tracker - provides a CircuitTracker for our tor process
 
   stop_trackers - halts any active trackers
 
@@ -33,10 +35,21 @@ Background tasks for gathering information about the tor process.
 
   ConsensusTracker - performant lookups for consensus related information
     |- update - updates the consensus information we're based on
+    |- generation - number of times we've been updated
     |- get_relay_nickname - provides the nickname for a given relay
     |- get_relay_fingerprints - provides relays running at a location
     +- get_relay_address - provides the address a relay is running at
 
+  ThroughputTracker - rates tor is sending data over connections and circuits
+    |- get_connection_rate - provides the rate of a connection
+    |- get_circuit_rate - provides the rate of a circuit
+    +- get_top_talkers - provides our busiest connections and circuits
+
+  CircuitTracker - circuits tor presently has, maintained from CIRC events
+    |- get_circuits - provides our present circuits
+    |- generation - number of times our circuits have changed
+    +- reconcile - replaces our circuits with those tor reports
+
 .. data:: Resources
 
   Resource usage information retrieved about the tor process.
@@ -47,13 +60,30 @@ Background tasks for gathering information about the tor process.
   :var int memory_bytes: memory usage of the process in bytes
   :var float memory_percent: percentage of our memory used by this process
   :var float timestamp: unix timestamp for when this information was fetched
+
+.. data:: Rate
+
+  Bytes per second tor is sending over a connection or circuit.
+
+  :var float read: bytes per second we're receiving
+  :var float written: bytes per second we're sending
+
+.. data:: Talker
+
+  Connection or circuit, and the rate it's sending data at.
+
+  :var TalkerType talker_type: whether this is a connection or circuit
+  :var str id: tor's identifier for the connection or circuit
+  :var nyx.tracker.Rate rate: rate it's sending data at
 """
 
 import collections
+import heapq
 import os
 import time
 import threading
 
+import stem
 import stem.control
 
 from nyx import log, tor_controller
@@ -63,17 +93,23 @@ CONFIG = conf.config_dict('nyx', {
   'queries.connections.rate': 5,
   'queries.resources.rate': 5,
   'queries.port_usage.rate': 5,
+  'queries.throughput.window': 10,
+  'queries.circuits.reconcile_rate': 60,
 })
 
 CONNECTION_TRACKER = None
 RESOURCE_TRACKER = None
 PORT_USAGE_TRACKER = None
 CONSENSUS_TRACKER = None
+THROUGHPUT_TRACKER = None
+CIRCUIT_TRACKER = None
 
 CustomResolver = enum.Enum(
   ('INFERENCE', 'by inference'),
 )
 
+TalkerType = enum.Enum('CONNECTION', 'CIRCUIT')
+
 # Extending stem's Connection tuple with attributes for the uptime of the
 # connection.
 
@@ -96,6 +132,17 @@ Process = collections.namedtuple('Process', [
   'name',
 ])
 
+Rate = collections.namedtuple('Rate', [
+  'read',
+  'written',
+])
+
+Talker = collections.namedtuple('Talker', [
+  'talker_type',
+  'id',
+  'rate',
+])
+
 
 class UnresolvedResult(Exception):
   'Indicates the application being used by a port is still being determined.'
@@ -160,6 +207,33 @@ def get_consensus_tracker():
   return CONSENSUS_TRACKER
 
 
+def get_throughput_tracker():
+  """
+  Singleton for tracking the rate tor sends data over its connections and
+  circuits.
+  """
+
+  global THROUGHPUT_TRACKER
+
+  if THROUGHPUT_TRACKER is None:
+    THROUGHPUT_TRACKER = ThroughputTracker(CONFIG['queries.throughput.window'])
+
+  return THROUGHPUT_TRACKER
+
+
+def get_circuit_tracker():
+  """
+  Singleton for tracking the circuits tor has established.
+  """
+
+  global CIRCUIT_TRACKER
+
+  if CIRCUIT_TRACKER is None:
+    CIRCUIT_TRACKER = CircuitTracker(CONFIG['queries.circuits.reconcile_rate'])
+
+  return CIRCUIT_TRACKER
+
+
 def stop_trackers():
   """
   Halts active trackers, providing back the thread shutting them down.
@@ -348,6 +422,24 @@ def _process_for_ports(local_ports, remote_ports):
   raise IOError('no results from lsof')
 
 
+def _apply_circ_event(circuits, event):
+  """
+  Updates a table of circuits with a CIRC event.
+
+  :param collections.OrderedDict circuits: mapping of circuit ids to their
+    latest :class:`~stem.response.events.CircuitEvent`
+  :param stem.response.events.CircuitEvent event: event to apply
+
+  :returns: **True** if the circuits changed, **False** otherwise
+  """
+
+  if event.status in (stem.CircStatus.CLOSED, stem.CircStatus.FAILED):
+    return circuits.pop(event.id, None) is not None
+  else:
+    circuits[event.id] = event
+    return True
+
+
 class Daemon(threading.Thread):
   """
   Daemon that can perform a given action at a set rate. Subclasses are expected
@@ -815,6 +907,7 @@ class ConsensusTracker(object):
     self._fingerprint_cache = {}  # {address => [(port, fingerprint), ..]} for relays
     self._nickname_cache = {}  # fingerprint => nickname lookup cache
     self._address_cache = {}
+    self._generation = 0
 
     tor_controller().add_event_listener(self._new_consensus_event, stem.control.EventType.NEWCONSENSUS)
 
@@ -840,6 +933,17 @@ class ConsensusTracker(object):
     self._fingerprint_cache = new_fingerprint_cache
     self._address_cache = new_address_cache
     self._nickname_cache = new_nickname_cache
+    self._generation += 1
+
+  def generation(self):
+    """
+    Provides the number of times our consensus information has been updated,
+    so callers can tell when information they derived from it is stale.
+
+    :returns: **int** that's incremented with each update
+    """
+
+    return self._generation
 
   def get_relay_nickname(self, fingerprint):
     """
@@ -899,3 +1003,226 @@ class ConsensusTracker(object):
         return (my_address, my_or_ports[0])
 
     return self._address_cache.get(fingerprint, default)
+
+
+class ThroughputTracker(object):
+  """
+  Rates tor is sending data over each of its connections and circuits, from
+  its CONN_BW and CIRC_BW events. Relays can emit tens of thousands of these
+  each second so handling an event is just a couple dictionary updates.
+  Counts are bucketed by second, and as buckets age out of our window they're
+  subtracted from running totals, so a rate is constant time to look up.
+
+  Connections are correlated with their endpoint through ORCONN events. Tor
+  only emits CONN_BW events if TestingEnableConnBwEvent is set, so we often
+  only have circuit rates.
+
+  :param int window: seconds we average rates over
+  """
+
+  def __init__(self, window = 10):
+    self._window = max(1, window)
+    self._lock = threading.RLock()
+
+    self._buckets = collections.deque()  # (second, {(talker_type, id) => [read, written]}) within our window
+    self._totals = {}  # (talker_type, id) => [read, written] for our window
+    self._connection_ids = {}  # (address, port) or fingerprint => connection id
+
+    controller = tor_controller()
+
+    for event_type, handler in ((stem.control.EventType.ORCONN, self._orconn_event), (stem.control.EventType.CONN_BW, self._conn_bw_event), (stem.control.EventType.CIRC_BW, self._circ_bw_event)):
+      try:
+        controller.add_event_listener(handler, event_type)
+      except stem.ProtocolError as exc:
+        log.info('tracker.unable_to_track_throughput', event = event_type, exc = exc)
+
+  def get_connection_rate(self, address, port, fingerprint = None):
+    """
+    Provides the rate we're sending data over a connection.
+
+    :param str address: remote address of the connection
+    :param int port: remote port of the connection
+    :param str fingerprint: relay the connection is with, if known
+
+    :returns: :data:`~nyx.tracker.Rate` for the connection, or **None** if
+      it's unknown
+    """
+
+    connection_id = self._connection_ids.get((address, port))
+
+    if connection_id is None and fingerprint:
+      connection_id = self._connection_ids.get(fingerprint)
+
+    return self._rate((TalkerType.CONNECTION, connection_id)) if connection_id is not None else None
+
+  def get_circuit_rate(self, circuit_id):
+    """
+    Provides the rate we're sending data over a circuit.
+
+    :param str circuit_id: identifier of the circuit
+
+    :returns: :data:`~nyx.tracker.Rate` for the circuit, or **None** if it's
+      unknown
+    """
+
+    return self._rate((TalkerType.CIRCUIT, circuit_id))
+
+  def get_top_talkers(self, count, talker_type = None):
+    """
+    Provides the connections and circuits moving the most data.
+
+    :param int count: maximum number of results to provide
+    :param TalkerType talker_type: only provide this type if set
+
+    :returns: **list** of :data:`~nyx.tracker.Talker`, busiest first
+    """
+
+    with self._lock:
+      self._expire(int(time.time()))
+      totals = [(key, counts) for (key, counts) in self._totals.items() if talker_type is None or key[0] == talker_type]
+
+    busiest = heapq.nlargest(count, totals, key = lambda entry: entry[1][0] + entry[1][1])
+    return [Talker(key[0], key[1], Rate(float(read) / self._window, float(written) / self._window)) for (key, (read, written)) in busiest]
+
+  def _rate(self, key):
+    with self._lock:
+      self._expire(int(time.time()))
+      counts = self._totals.get(key)
+
+    return Rate(float(counts[0]) / self._window, float(counts[1]) / self._window) if counts else None
+
+  def _orconn_event(self, event):
+    endpoints = [(event.endpoint_address, event.endpoint_port), event.endpoint_fingerprint]
+
+    with self._lock:
+      for endpoint in endpoints:
+        if event.status in (stem.ORStatus.CLOSED, stem.ORStatus.FAILED):
+          if self._connection_ids.get(endpoint) == event.id:
+            del self._connection_ids[endpoint]
+        elif event.id and endpoint not in (None, (None, None)):
+          self._connection_ids[endpoint] = event.id
+
+  def _conn_bw_event(self, event):
+    self._add((TalkerType.CONNECTION, event.id), event.read, event.written)
+
+  def _circ_bw_event(self, event):
+    self._add((TalkerType.CIRCUIT, event.id), event.read, event.written)
+
+  def _add(self, key, read, written):
+    second = int(time.time())
+
+    with self._lock:
+      if not self._buckets or self._buckets[-1][0] != second:
+        self._expire(second)
+        self._buckets.append((second, {}))
+
+      counts = self._buckets[-1][1].setdefault(key, [0, 0])
+      counts[0] += read
+      counts[1] += written
+
+      totals = self._totals.setdefault(key, [0, 0])
+      totals[0] += read
+      totals[1] += written
+
+  def _expire(self, now):
+    """
+    Drops the buckets that have aged out of our window.
+    """
+
+    while self._buckets and self._buckets[0][0] <= now - self._window:
+      second, bucket = self._buckets.popleft()
+
+      for key, (read, written) in bucket.items():
+        totals = self._totals[key]
+        totals[0] -= read
+        totals[1] -= written
+
+        if totals == [0, 0]:
+          del self._totals[key]
+
+
+class CircuitTracker(object):
+  """
+  Circuits tor presently has. These are maintained from CIRC events so they
+  reflect changes as soon as tor reports them, and every once in a while
+  we reconcile them with GETINFO circuit-status in case we missed anything.
+
+  :param int reconcile_rate: seconds between fetching circuits from tor
+  """
+
+  def __init__(self, reconcile_rate = 60):
+    self._reconcile_rate = reconcile_rate
+    self._lock = threading.RLock()
+    self._reconcile_lock = threading.Lock()
+
+    self._circuits = collections.OrderedDict()  # circuit id => CircuitEvent
+    self._generation = 0
+    self._last_reconciled = -1  # time when we last fetched circuits from tor
+    self._pending_events = None  # CIRC events received while fetching circuits
+
+    controller = tor_controller()
+    controller.add_event_listener(self._circ_event, stem.control.EventType.CIRC)
+    controller.add_status_listener(self._tor_status_listener)
+
+  def get_circuits(self):
+    """
+    Provides the circuits tor presently has, reconciling them with tor if we
+    haven't recently.
+
+    :returns: **list** of :class:`~stem.response.events.CircuitEvent` for our
+      circuits, in the order they were established
+    """
+
+    if time.time() - self._last_reconciled >= self._reconcile_rate:
+      self.reconcile()
+
+    with self._lock:
+      return list(self._circuits.values())
+
+  def generation(self):
+    """
+    Provides the number of times our circuits have changed, so callers can
+    tell if there's anything new.
+
+    :returns: **int** that's incremented with each change
+    """
+
+    return self._generation
+
+  def reconcile(self):
+    """
+    Replaces our circuits with those tor presently reports. CIRC events that
+    arrive while we're fetching these are applied on top, so circuits that
+    close in the meantime aren't brought back.
+    """
+
+    with self._reconcile_lock:
+      self._last_reconciled = time.time()
+
+      with self._lock:
+        self._pending_events = []
+
+      circuits = tor_controller().get_circuits(None)
+
+      with self._lock:
+        pending_events, self._pending_events = self._pending_events, None
+
+        if circuits is not None:
+          self._circuits = collections.OrderedDict([(circ.id, circ) for circ in circuits])
+
+          for event in pending_events:
+            _apply_circ_event(self._circuits, event)
+
+          self._generation += 1
+
+  def _circ_event(self, event):
+    with self._lock:
+      if self._pending_events is not None:
+        self._pending_events.append(event)
+
+      if _apply_circ_event(self._circuits, event):
+        self._generation += 1
+
+  def _tor_status_listener(self, controller, event_type, _):
+    if event_type in (stem.control.State.INIT, stem.control.State.RESET):
+      self._last_reconciled = -1  # fetch circuits from our new tor instance
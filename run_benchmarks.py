@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+# Copyright 2016, Damian Johnson and The Tor Project
+# See LICENSE for licensing information
+
+"""
+Reports how long nyx takes to render its graphs. Timing depends on the system
+we're run on, so this is kept apart from our unit tests and only reports
+rather than checks these.
+"""
+
+import nyx
+import nyx.curses
+import nyx.panel.graph
+import test
+
+from mock import patch
+
+BENCHMARK_SIZES = ((30, 7), (80, 15), (160, 30), (200, 60))
+BENCHMARK_FRAMES = 20
+
+
+@nyx.uses_settings
+def main():
+  nyx.TESTING = True
+
+  with patch('nyx.panel.graph.tor_controller') as tor_controller_mock:
+    tor_controller_mock().get_info.return_value = ' '.join(['%i,%i' % (i * 37 % 900, i * 53 % 700) for i in range(300)])
+    data = nyx.panel.graph.BandwidthStats()
+
+    def draw_frames(subwindow, width, height):
+      for i in range(BENCHMARK_FRAMES):
+        nyx.panel.graph._draw_subgraph(subwindow, data.primary, 0, width, height, nyx.panel.graph.Bounds.LOCAL_MAX, nyx.panel.graph.Interval.EACH_SECOND, nyx.curses.Color.CYAN, '*')
+
+    frame_times = []
+
+    for width, height in BENCHMARK_SIZES:
+      rendered = test.render(draw_frames, width, height)
+      frame_times.append('  %ix%i: %0.2f ms' % (width, height, rendered.runtime * 1000 / BENCHMARK_FRAMES))
+
+  print('Graph render time per frame:')
+  print('\n'.join(frame_times))
+
+
+if __name__ == '__main__':
+  main()
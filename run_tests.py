@@ -21,6 +21,7 @@ SRC_PATHS = [os.path.join(NYX_BASE, path) for path in (
   'nyx',
   'test',
   'run_tests.py',
+  'run_benchmarks.py',
   'run_nyx',
 )]
 
@@ -15,6 +15,7 @@ from mock import patch, Mock
 __all__ = [
   'arguments',
   'curses',
+  'history',
   'installation',
   'log',
   'panel',
@@ -0,0 +1,226 @@
+"""
+Unit tests for nyx.history.
+"""
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from mock import patch
+
+from nyx.history import RingFile, RoundRobinStore, Sample, TopCounts, WindowedCounts
+
+
+class TestRingFile(unittest.TestCase):
+  def setUp(self):
+    self.tmp_dir = tempfile.mkdtemp()
+    self.path = os.path.join(self.tmp_dir, 'history', 'ring')
+
+  def tearDown(self):
+    shutil.rmtree(self.tmp_dir)
+
+  def test_new_file(self):
+    ring_file = RingFile(self.path, 2, 3, 4)
+
+    self.assertTrue(ring_file.is_new)
+    self.assertEqual((0.0, 0.0, 0.0, 0.0), ring_file.attrs())
+    self.assertEqual([0.0, 0.0, 0.0], ring_file.values(0))
+
+    ring_file.close()
+
+  def test_append(self):
+    ring_file = RingFile(self.path, 2, 3, 4)
+
+    for value in (1, 2, 3, 4):
+      ring_file.append(0, value)
+
+    ring_file.append(1, 5.5)
+
+    self.assertEqual([4.0, 3.0, 2.0], ring_file.values(0))
+    self.assertEqual([5.5, 0.0, 0.0], ring_file.values(1))
+    self.assertRaises(ValueError, ring_file.append, 2, 1)
+
+    ring_file.close()
+
+  def test_persists(self):
+    ring_file = RingFile(self.path, 2, 3, 4)
+    ring_file.append(1, 7)
+    ring_file.append(1, 8)
+    ring_file.set_attrs(1, [1.5, 2.5])
+    ring_file.close()
+
+    ring_file = RingFile(self.path, 2, 3, 4)
+    self.assertFalse(ring_file.is_new)
+    self.assertEqual([8.0, 7.0, 0.0], ring_file.values(1))
+    self.assertEqual((0.0, 1.5, 2.5, 0.0), ring_file.attrs())
+    self.assertRaises(ValueError, ring_file.set_attrs, 3, [1.0, 2.0])
+    ring_file.close()
+
+  def test_replaces_different_layout(self):
+    ring_file = RingFile(self.path, 2, 3, 4)
+    ring_file.append(0, 7)
+    ring_file.close()
+
+    ring_file = RingFile(self.path, 2, 5, 4)
+    self.assertTrue(ring_file.is_new)
+    self.assertEqual([0.0] * 5, ring_file.values(0))
+    ring_file.close()
+
+
+class TestRoundRobinStore(unittest.TestCase):
+  def setUp(self):
+    self.tmp_dir = tempfile.mkdtemp()
+    self.path = os.path.join(self.tmp_dir, 'history.rrd')
+
+  def tearDown(self):
+    shutil.rmtree(self.tmp_dir)
+
+  @patch('time.time', return_value = 1000000)
+  def test_consolidation(self, time_mock):
+    store = RoundRobinStore(self.path, 2, tiers = ((1, 10), (5, 10)))
+    self.assertTrue(store.is_new)
+
+    for i, value in enumerate((4, 8, 2, 6, 10, 7)):
+      store.add(0, 999994 + i, value)
+
+    store.add(1, 999999, 100)
+
+    self.assertEqual((1, [Sample(999997, 6.0, 6, 6), Sample(999998, 10.0, 10, 10), Sample(999999, 7.0, 7, 7)]), store.query(0, 999997))
+    self.assertEqual((1, [Sample(999999, 100.0, 100, 100)]), store.query(1, 999990))
+
+    # older ranges are provided by our coarser tier
+
+    self.assertEqual(5, store.resolution(999950))
+    self.assertEqual((5, [Sample(999990, 4.0, 4, 4), Sample(999995, 6.6, 2, 10)]), store.query(0, 999950))
+
+    # ranges beyond what we retain are given what we have
+
+    self.assertEqual((5, [Sample(999990, 4.0, 4, 4), Sample(999995, 6.6, 2, 10)]), store.query(0, 0))
+
+    self.assertRaises(ValueError, store.add, 2, 999999, 1)
+    store.close()
+
+  def test_buckets_are_reused(self):
+    store = RoundRobinStore(self.path, tiers = ((1, 10),))
+
+    store.add(0, 100, 5)
+    store.add(0, 110, 7)  # same slot, ten seconds later
+
+    with patch('time.time', return_value = 110):
+      self.assertEqual((1, [Sample(110, 7.0, 7, 7)]), store.query(0, 100))
+
+    store.close()
+
+  def test_persists(self):
+    store = RoundRobinStore(self.path, tiers = ((1, 10),))
+    store.add(0, time.time(), 5)
+    store.close()
+
+    store = RoundRobinStore(self.path, tiers = ((1, 10),))
+    self.assertFalse(store.is_new)
+    self.assertEqual([5.0], [sample.average for sample in store.query(0, time.time() - 5)[1]])
+    store.close()
+
+    store = RoundRobinStore(self.path, tiers = ((1, 20),))
+    self.assertTrue(store.is_new)
+    store.close()
+
+
+class TestTopCounts(unittest.TestCase):
+  def test_exact_within_capacity(self):
+    counts = TopCounts(3)
+
+    for label in ('80', '443', '80', '22'):
+      counts.add(label)
+
+    self.assertEqual({'80': 2, '443': 1, '22': 1}, counts.counts())
+    self.assertEqual({}, counts.errors())
+    self.assertEqual(1, counts.floor())
+
+  def test_eviction(self):
+    counts = TopCounts(2)
+
+    counts.add('80', 5)
+    counts.add('443', 2)
+    counts.add('22')  # replaces 443, inheriting its count as error
+
+    self.assertEqual({'80': 5, '22': 3}, counts.counts())
+    self.assertEqual({'22': 2}, counts.errors())
+
+  def test_heavy_hitters_are_kept(self):
+    counts = TopCounts(10)
+
+    for i in range(1000):
+      counts.add('80' if i % 2 else 'port %i' % i)
+
+    # anything over N / capacity occurrences is tracked, overestimated by at
+    # most that much
+
+    self.assertTrue(500 <= counts.counts()['80'] <= 600)
+    self.assertTrue(counts.counts()['80'] - counts.errors().get('80', 0) <= 500)
+
+
+class TestWindowedCounts(unittest.TestCase):
+  def setUp(self):
+    self.tmp_dir = tempfile.mkdtemp()
+    self.path = os.path.join(self.tmp_dir, 'usage', 'client_locales')
+
+  def tearDown(self):
+    shutil.rmtree(self.tmp_dir)
+
+  def test_counts(self):
+    usage = WindowedCounts(bucket_size = 10, bucket_count = 3)
+
+    usage.add('de', timestamp = 100)
+    usage.add('de', timestamp = 115)
+    usage.add('us', 3, timestamp = 125)
+    usage.add('fr', 2, in_window = False)
+
+    # periods include the whole bucket their start falls in
+
+    self.assertEqual({'us': 3}, usage.counts(5, now = 125))
+    self.assertEqual({'de': 1, 'us': 3}, usage.counts(10, now = 125))
+    self.assertEqual({'de': 2, 'us': 3}, usage.counts(25, now = 125))
+    self.assertEqual({'de': 2, 'us': 3, 'fr': 2}, usage.counts())
+
+  def test_expiration(self):
+    usage = WindowedCounts(bucket_size = 10, bucket_count = 3)
+
+    usage.add('de', timestamp = 100)
+    usage.add('us', timestamp = 135)  # our 'de' bucket falls out of the window
+
+    self.assertEqual({'us': 1}, usage.counts(100, now = 135))
+    self.assertEqual({'de': 1, 'us': 1}, usage.counts())
+
+  def test_capacity(self):
+    usage = WindowedCounts(bucket_size = 10, capacity = 2)
+
+    usage.add('80', 5, timestamp = 100)
+    usage.add('443', 2, timestamp = 100)
+    usage.add('22', timestamp = 100)
+
+    self.assertEqual({'80': 5, '22': 3}, usage.counts(10, now = 105))
+    self.assertEqual({'22': 2}, usage.errors(10, now = 105))
+
+    usage.add('443', 4, timestamp = 110)
+
+    # 443 wasn't tracked by our first bucket, so might've occurred up to its
+    # floor of three more times
+
+    self.assertEqual({'80': 5, '443': 4}, usage.counts(20, now = 110))
+    self.assertEqual({'443': 3}, usage.errors(20, now = 110))
+
+  def test_persists(self):
+    usage = WindowedCounts(self.path)
+    usage.add('de', 2)
+    usage.add('fr', 5, in_window = False)
+    usage.save()
+
+    usage = WindowedCounts(self.path)
+    self.assertEqual({'de': 2}, usage.counts(3600))
+    self.assertEqual({}, usage.counts())  # totals are only since we were created
+
+    usage = WindowedCounts(self.path, bucket_size = 60)
+    self.assertEqual({}, usage.counts(3600))
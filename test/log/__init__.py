@@ -4,5 +4,9 @@ Unit tests for nyx's log utilities.
 
 __all__ = [
   'deduplication',
+  'log_file_follower',
+  'log_file_output',
+  'log_ingestor',
+  'log_rate_limiter',
   'read_tor_log',
 ]
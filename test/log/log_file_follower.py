@@ -0,0 +1,90 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from nyx.log import LogFileFollower
+
+NOTICE_LINE = 'Apr 06 11:03:39.000 [notice] Tor %s opening new log file.\n'
+WARN_LINE = 'Apr 06 11:03:53.000 [warn] %s\n'
+
+
+class TestLogFileFollower(unittest.TestCase):
+  def setUp(self):
+    self.tmp_dir = tempfile.mkdtemp()
+    self.path = os.path.join(self.tmp_dir, 'tor.log')
+    self.entries = []
+
+    self._write(NOTICE_LINE % '0.2.7.6')
+    self.follower = LogFileFollower(self.path, self.entries.extend)
+
+  def tearDown(self):
+    self.follower.stop()
+    shutil.rmtree(self.tmp_dir)
+
+  def _write(self, content, mode = 'a'):
+    with open(self.path, mode) as log_file:
+      log_file.write(content)
+
+  def _messages(self):
+    return [(entry.type, entry.message) for entry in self.entries]
+
+  def test_reads_appended_lines(self):
+    self.follower._check_file()
+    self.assertEqual([], self.entries)  # prior content is skipped
+
+    self._write(WARN_LINE % 'first' + WARN_LINE % 'second')
+    self.follower._check_file()
+
+    self.assertEqual([('WARN', 'first'), ('WARN', 'second')], self._messages())
+
+  def test_partial_lines(self):
+    self._write('Apr 06 11:03:53.000 [warn] hel')
+    self.follower._check_file()
+    self.assertEqual([], self.entries)
+
+    self._write('lo world\n')
+    self.follower._check_file()
+    self.assertEqual([('WARN', 'hello world')], self._messages())
+
+  def test_skips_unrecognized_lines(self):
+    self._write('not a log entry\n' + WARN_LINE % 'first')
+    self.follower._check_file()
+    self.assertEqual([('WARN', 'first')], self._messages())
+
+  def test_rotation(self):
+    self._write(WARN_LINE % 'before rotation')
+    os.rename(self.path, self.path + '.1')
+    self.follower._check_file()  # file's moved aside and not yet recreated
+
+    self._write(WARN_LINE % 'after rotation')
+    self.follower._check_file()
+
+    self.assertEqual([('WARN', 'before rotation'), ('WARN', 'after rotation')], self._messages())
+
+  def test_truncation(self):
+    self._write(WARN_LINE % 'before truncation')
+    self.follower._check_file()
+
+    self._write(WARN_LINE % 'after', mode = 'w')
+    self.follower._check_file()
+
+    self.assertEqual([('WARN', 'before truncation'), ('WARN', 'after')], self._messages())
+
+  def test_follows_in_background(self):
+    received = threading.Event()
+
+    def handler(entries):
+      self.entries.extend(entries)
+      received.set()
+
+    self.follower = LogFileFollower(self.path, handler, poll_rate = 0.05)
+    self.follower.start()
+
+    self._write(WARN_LINE % 'hello')
+    received.wait(5)
+    self.follower.stop()
+    self.follower.join(5)
+
+    self.assertEqual([('WARN', 'hello')], self._messages())
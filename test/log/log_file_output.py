@@ -0,0 +1,86 @@
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+
+from mock import patch
+
+from nyx.log import LogFileOutput
+
+
+class TestLogFileOutput(unittest.TestCase):
+  def setUp(self):
+    self.tmp_dir = tempfile.mkdtemp()
+    self.path = os.path.join(self.tmp_dir, 'nyx.log')
+
+  def tearDown(self):
+    shutil.rmtree(self.tmp_dir)
+
+  def test_write(self):
+    log_file = LogFileOutput(self.path)
+    log_file.write('hello')
+    log_file.write('world')
+    log_file.close()
+
+    with open(self.path) as output:
+      self.assertEqual('hello\nworld\n', output.read())
+
+    self.assertEqual(0, log_file.dropped())
+
+  def test_creates_parent_directory(self):
+    path = os.path.join(self.tmp_dir, 'logs', 'nyx.log')
+
+    log_file = LogFileOutput(path)
+    log_file.write('hello')
+    log_file.close()
+
+    with open(path) as output:
+      self.assertEqual('hello\n', output.read())
+
+  def test_without_path(self):
+    log_file = LogFileOutput('')
+    log_file.write('hello')
+    log_file.close()
+
+    self.assertEqual(0, log_file.dropped())
+    self.assertEqual([], os.listdir(self.tmp_dir))
+
+  def test_rotation(self):
+    for msg in ('first', 'second'):
+      log_file = LogFileOutput(self.path, max_size = 5, backup_count = 1)
+      log_file.write(msg)
+      log_file.close()
+
+    # only a single backup is retained, so our first message is discarded
+
+    self.assertEqual(['nyx.log', 'nyx.log.1'], sorted(os.listdir(self.tmp_dir)))
+
+    with open(self.path) as output:
+      self.assertEqual('', output.read())
+
+    with open(self.path + '.1') as output:
+      self.assertEqual('second\n', output.read())
+
+  def test_rotation_with_compression(self):
+    for msg in ('first', 'second'):
+      log_file = LogFileOutput(self.path, max_size = 5, compress = True)
+      log_file.write(msg)
+      log_file.close()
+
+    self.assertEqual(['nyx.log', 'nyx.log.1.gz', 'nyx.log.2.gz'], sorted(os.listdir(self.tmp_dir)))
+
+    with gzip.open(self.path + '.1.gz') as output:
+      self.assertEqual(b'second\n', output.read())
+
+    with gzip.open(self.path + '.2.gz') as output:
+      self.assertEqual(b'first\n', output.read())
+
+  @patch('nyx.log.LogFileOutput._run')
+  def test_drops_when_full(self, run_mock):
+    log_file = LogFileOutput(self.path, queue_size = 2)
+
+    for i in range(5):
+      log_file.write('message %i' % i)
+
+    self.assertEqual(3, log_file.dropped())
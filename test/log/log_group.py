@@ -144,3 +144,62 @@ class TestLogGroup(unittest.TestCase):
     self.assertEqual("Heartbeat: Tor's uptime is 6:00 hours, with 0 circuits open. I've sent 539 kB and received 4.25 MB.", group_items[10].message)
     self.assertEqual(2, len(group_items[10].duplicates))
     self.assertTrue(group_items[10].is_duplicate)
+
+  def test_search(self):
+    group = LogGroup(5)
+    group.add(LogEntry(1333738410, 'NOTICE', 'New control connection opened from 127.0.0.1.'))
+    group.add(LogEntry(1333738420, 'WARN', 'Failed to find node for hop 1 of our path. Discarding this circuit.'))
+    group.add(LogEntry(1333738430, 'NOTICE', 'Opening Control listener on 127.0.0.1:9051'))
+    group.add(LogEntry(1333738440, 'INFO', 'circuit_mark_for_close_(): Circuit 0 (id: 3) marked for close at circuituse.c:1396 (orig reason: 8, new reason: 0)'))
+
+    self.assertEqual([1333738430, 1333738410], [e.timestamp for e in group.search('127.0.0.1')])
+    self.assertEqual([1333738430], [e.timestamp for e in group.search('127.0.0.1:9051')])
+    self.assertEqual([1333738430], [e.timestamp for e in group.search('9051')])
+    self.assertEqual([1333738430, 1333738410], [e.timestamp for e in group.search('CONTROL')])
+    self.assertEqual([1333738410], [e.timestamp for e in group.search('control opened')])
+    self.assertEqual([1333738420], [e.timestamp for e in group.search('warn')])
+    self.assertEqual([1333738440], [e.timestamp for e in group.search('circuit_mark_for_close_')])
+    self.assertEqual([], group.search('control circuit'))
+    self.assertEqual([], group.search('unrecognized'))
+    self.assertEqual([], group.search(''))
+
+  def test_search_prunes_evicted_entries(self):
+    group = LogGroup(3)
+
+    for i in range(10):
+      group.add(LogEntry(1333738410 + i, 'NOTICE', 'Bootstrapped %i0%%: Loading relay descriptors.' % i))
+
+    self.assertEqual([1333738419, 1333738418, 1333738417], [e.timestamp for e in group.search('bootstrapped')])
+    self.assertEqual([1333738418], [e.timestamp for e in group.search('80')])
+    self.assertEqual([], group.search('50'))
+
+    # tokens only used by evicted entries should no longer be indexed
+
+    self.assertFalse('50' in group._index)
+    self.assertEqual(set([7, 8, 9]), group._index['bootstrapped'])
+
+    # search results are carried over to clones
+
+    self.assertEqual([1333738418], [e.timestamp for e in group.clone().search('80')])
+
+  def test_extend(self):
+    entries = [LogEntry(1333738410 + i, 'NOTICE', 'Bootstrapped %i0%%: Loading relay descriptors.' % i) for i in range(5)]
+
+    group = LogGroup(3)
+    group.extend(entries)
+
+    group_entries = list(group)
+
+    self.assertEqual([1333738414, 1333738413, 1333738412], [e.timestamp for e in group_entries])
+    self.assertEqual(3, len(group_entries[0].duplicates))
+    self.assertFalse(group_entries[0].is_duplicate)
+    self.assertTrue(group_entries[1].is_duplicate)
+
+    # matches adding the entries individually
+
+    individually_added = LogGroup(3)
+
+    for entry in entries:
+      individually_added.add(entry.clone())
+
+    self.assertEqual(list(individually_added), list(group))
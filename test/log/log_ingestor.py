@@ -0,0 +1,72 @@
+import threading
+import time
+import unittest
+
+from nyx.log import LogIngestor
+
+
+class TestLogIngestor(unittest.TestCase):
+  def test_processes_in_batches(self):
+    batches = []
+    ingestor = LogIngestor(batches.append, drain_rate = 60, batch_size = 3)
+    ingestor.stop()  # halt our thread so we can drain deterministically
+
+    for i in range(7):
+      ingestor.add(i)
+
+    self.assertEqual(7, ingestor.queue_depth())
+
+    ingestor.flush()
+    self.assertEqual([[0, 1, 2], [3, 4, 5], [6]], batches)
+    self.assertEqual(0, ingestor.queue_depth())
+
+  def test_drops_when_full(self):
+    events = []
+    ingestor = LogIngestor(events.extend, drain_rate = 60, queue_size = 2)
+    ingestor.stop()
+
+    for i in range(5):
+      ingestor.add(i)
+
+    self.assertEqual(2, ingestor.queue_depth())
+    self.assertEqual(3, ingestor.dropped())
+
+    ingestor.flush()
+    self.assertEqual([0, 1], events)
+
+  def test_background_processing(self):
+    processed = threading.Event()
+    events = []
+
+    def handler(batch):
+      events.extend(batch)
+      processed.set()
+
+    ingestor = LogIngestor(handler, drain_rate = 0.01)
+    ingestor.add('hello')
+    processed.wait(5)
+    ingestor.stop()
+
+    self.assertEqual(['hello'], events)
+    self.assertTrue(0 <= ingestor.drain_latency() < 5)
+
+  def test_stop_processes_remaining_events(self):
+    events = []
+    ingestor = LogIngestor(events.extend, drain_rate = 60)
+
+    ingestor.add('hello')
+    ingestor.add('world')
+    ingestor.stop()
+
+    self.assertEqual(['hello', 'world'], events)
+
+  def test_drain_latency(self):
+    ingestor = LogIngestor(lambda batch: None, drain_rate = 60)
+    ingestor.stop()
+    self.assertEqual(0.0, ingestor.drain_latency())
+
+    ingestor.add('hello')
+    time.sleep(0.05)
+    ingestor.flush()
+
+    self.assertTrue(ingestor.drain_latency() >= 0.05)
@@ -0,0 +1,106 @@
+import unittest
+
+from nyx.log import LogEntry, LogGroup, LogRateLimiter
+
+
+def _entry(msg, event_type = 'WARN'):
+  return LogEntry(1333738410, event_type, msg)
+
+
+class TestLogRateLimiter(unittest.TestCase):
+  def test_message_rate(self):
+    limiter = LogRateLimiter(type_rate = 0, message_rate = 3)
+
+    self.assertEqual([True, True, True, False, False], [limiter.allow(_entry('flood'), now = 100) for i in range(5)])
+    self.assertTrue(limiter.allow(_entry('something else'), now = 100))
+
+    # tokens are refilled over time
+
+    self.assertFalse(limiter.allow(_entry('flood'), now = 100.1))
+    self.assertTrue(limiter.allow(_entry('flood'), now = 100.5))
+
+  def test_type_rate(self):
+    limiter = LogRateLimiter(type_rate = 2, message_rate = 0, type_rates = {'DEBUG': 4})
+
+    self.assertEqual([True, True, False], [limiter.allow(_entry('msg %i' % i), now = 100) for i in range(3)])
+    self.assertEqual([True, True, True, True, False], [limiter.allow(_entry('msg %i' % i, 'DEBUG'), now = 100) for i in range(5)])
+
+  def test_type_rate_preserves_message_tokens(self):
+    limiter = LogRateLimiter(type_rate = 10, message_rate = 1)
+
+    self.assertTrue(all([limiter.allow(_entry('msg %i' % i), now = 100) for i in range(10)]))
+    self.assertFalse(any([limiter.allow(_entry('flood'), now = 100) for i in range(5)]))
+
+    # those were rejected by our type bucket, so 'flood' retains its token
+
+    self.assertTrue(limiter.allow(_entry('flood'), now = 100.5))
+
+  def test_type_rate_summaries(self):
+    limiter = LogRateLimiter(type_rate = 1, message_rate = 5, summary_interval = 10)
+
+    for i in range(50):
+      limiter.allow(_entry('msg %i' % i), now = 100)
+
+    # distinct messages throttled by their type are summarized together
+
+    summaries = limiter.summaries(now = 110)
+    self.assertEqual(1, len(summaries))
+    self.assertEqual('49 similar messages suppressed in last 10s: msg 49', summaries[0].message)
+    self.assertEqual(('WARN', None), summaries[0].summary_of)
+
+  def test_unlimited(self):
+    limiter = LogRateLimiter(type_rate = 0, message_rate = 0)
+    self.assertTrue(all([limiter.allow(_entry('flood'), now = 100) for i in range(1000)]))
+    self.assertEqual([], limiter.summaries(now = 1000))
+
+  def test_summaries(self):
+    limiter = LogRateLimiter(type_rate = 0, message_rate = 1, summary_interval = 10)
+
+    for i in range(50):
+      limiter.allow(_entry('flood'), now = 100)
+
+    self.assertEqual([], limiter.summaries(now = 105))
+
+    summaries = limiter.summaries(now = 110)
+    self.assertEqual(1, len(summaries))
+    self.assertEqual('WARN', summaries[0].type)
+    self.assertEqual('49 similar messages suppressed in last 10s: flood', summaries[0].message)
+    self.assertEqual(('WARN', 'flood'), summaries[0].summary_of)
+
+    # counts are reset after being summarized
+
+    self.assertEqual([], limiter.summaries(now = 200))
+
+  def test_summaries_are_duplicates(self):
+    limiter = LogRateLimiter(type_rate = 0, message_rate = 1, summary_interval = 10)
+    group = LogGroup(10)
+
+    for start in (100, 200):
+      for i in range(5):
+        limiter.allow(_entry('flood'), now = start)
+
+      group.extend(limiter.summaries(now = start + 10))
+
+    first, second = list(group)
+    self.assertTrue(first.is_duplicate_of(second))
+    self.assertTrue(second.is_duplicate)
+    self.assertFalse(first.is_duplicate_of(_entry('flood')))
+
+  def test_common_messages_share_a_bucket(self):
+    limiter = LogRateLimiter(type_rate = 0, message_rate = 1)
+
+    self.assertTrue(limiter.allow(_entry('Bootstrapped 72%: Loading relay descriptors.', 'NOTICE'), now = 100))
+    self.assertFalse(limiter.allow(_entry('Bootstrapped 75%: Loading relay descriptors.', 'NOTICE'), now = 100))
+
+  def test_bounded_keys(self):
+    limiter = LogRateLimiter(type_rate = 0, message_rate = 1, summary_interval = 10, max_keys = 5)
+
+    for i in range(20):
+      limiter.allow(_entry('msg %i' % i), now = 100)
+      limiter.allow(_entry('msg %i' % i), now = 100)
+
+    self.assertEqual(5, len(limiter._message_buckets))
+
+    summaries = limiter.summaries(now = 110)
+    self.assertEqual(6, len(summaries))
+    self.assertEqual('15 similar messages suppressed in last 10s: msg 19', summaries[-1].message)
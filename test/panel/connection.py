@@ -2,15 +2,17 @@
 Unit tests for nyx.panel.connection.
 """
 
+import curses
 import datetime
 import unittest
 
 import stem.exit_policy
 import stem.version
+import nyx.curses
 import nyx.panel.connection
 import test
 
-from nyx.tracker import Connection
+from nyx.tracker import Connection, Rate
 from nyx.panel.connection import Category, LineType, Line, Entry
 from test import require_curses
 from mock import Mock, patch
@@ -80,20 +82,38 @@ DETAILS_FOR_MULTIPLE_MATCHES = """
 
 
 class MockEntry(Entry):
-  def __init__(self, lines = [], entry_type = Category.INBOUND, is_private = False):
+  def __init__(self, lines = [], entry_type = Category.INBOUND, is_private = False, rate = None):
     self._lines = lines
     self._type = entry_type
     self._is_private = is_private
+    self._rate = rate
 
   def lines(self):
     return self._lines
 
+  def get_lines(self):
+    return self._lines
+
   def get_type(self):
     return self._type
 
   def is_private(self):
     return self._is_private
 
+  def get_rate(self):
+    return self._rate
+
+
+class SortableEntry(MockEntry):
+  def __init__(self, **sort_values):
+    MockEntry.__init__(self)
+    self._sort_values = sort_values
+    self.lookups = 0
+
+  def sort_value(self, attr):
+    self.lookups += 1
+    return self._sort_values[attr]
+
 
 class MockCircuit(object):
   def __init__(self, circ_id = 7, status = 'BUILT', purpose = 'GENERAL', path = None):
@@ -116,6 +136,277 @@ def line(entry = MockEntry(), line_type = LineType.CONNECTION, connection = CONN
 
 
 class TestConnectionPanel(unittest.TestCase):
+  @patch('nyx.panel.connection.tor_controller')
+  @patch('nyx.tracker.get_consensus_tracker')
+  def test_entry_cache(self, consensus_tracker_mock, tor_controller_mock):
+    consensus_tracker_mock().generation.return_value = 1
+    consensus_tracker_mock().get_relay_fingerprints.return_value = {}
+    tor_controller_mock().get_ports.return_value = [3531]
+    tor_controller_mock().get_exit_policy.return_value = None
+
+    cache = nyx.panel.connection.EntryCache()
+    other_connection = Connection(TIMESTAMP, False, '127.0.0.1', 3532, '75.119.206.243', 22, 'tcp', False)
+
+    with patch('nyx.panel.connection.ENTRY_CACHE', cache), patch('nyx.panel.connection.CLASSIFICATION_CONTEXT', None):
+      entries = cache.get_entries([CONNECTION, other_connection], [MockCircuit()])
+      self.assertEqual(3, len(entries))
+      self.assertEqual((0, 3, 0, 3), tuple(cache.stats()))
+
+      # fetching again provides the same entries, and drops those that are gone
+
+      self.assertEqual(entries[:2], cache.get_entries([CONNECTION, other_connection], []))
+      self.assertEqual((2, 3, 1, 2), tuple(cache.stats()))
+
+      # classification is only done again after the cache is invalidated
+
+      self.assertEqual(Category.INBOUND, entries[0].get_type())
+      tor_controller_mock().get_ports.return_value = []
+      self.assertEqual(Category.INBOUND, entries[0].get_type())
+
+      nyx.panel.connection._reset_classification()
+      self.assertEqual(Category.OUTBOUND, entries[0].get_type())
+
+      tor_controller_mock().get_ports.return_value = [3531]
+      consensus_tracker_mock().generation.return_value = 2
+      self.assertEqual(Category.OUTBOUND, entries[0].get_type())  # still using the prior classification context
+
+      nyx.panel.connection._reset_classification()
+      self.assertEqual(Category.INBOUND, entries[0].get_type())
+
+      # circuits are updated in place as they change
+
+      circuit_entry = cache.get_entries([], [MockCircuit()])[0]
+      self.assertEqual([], cache.updated_entries())
+      self.assertEqual([circuit_entry], cache.get_entries([], [MockCircuit(status = 'EXTENDING')]))
+      self.assertEqual([circuit_entry], cache.updated_entries())
+
+  def test_classification_context(self):
+    controller = Mock()
+    controller.get_ports.side_effect = lambda listener, default: {'OR': [9001], 'DIR': [9030], 'SOCKS': [9050]}.get(listener, default)
+    controller.get_exit_policy.return_value = None
+
+    circuits = [
+      MockCircuit(path = [('1F43EE37A0670301AD9CB555D94AFEC2C89FDE86', 'Unnamed')]),
+      MockCircuit(status = 'EXTENDING', path = [('B6D83EC2D9E18B0A7A33428F8CFA9C536769E209', 'moria1')]),
+    ]
+
+    hs_conf = {'/var/lib/tor/hs': {'HiddenServicePort': [(80, '127.0.0.1', 8080)]}}
+
+    context = nyx.panel.connection._classification_context(controller, circuits, hs_conf)
+    self.assertEqual(set([9001, 9030]), context.inbound_ports)
+    self.assertEqual(set([9050]), context.socks_ports)
+    self.assertEqual(set(), context.control_ports)
+    self.assertEqual(set([8080]), context.hidden_service_ports)
+    self.assertEqual(set(['1F43EE37A0670301AD9CB555D94AFEC2C89FDE86']), context.directory_fingerprints)
+    self.assertTrue(context.has_circuits)
+
+  @patch('nyx.tracker.get_consensus_tracker')
+  def test_get_type_for_relay(self, consensus_tracker_mock):
+    consensus_tracker_mock().get_relay_fingerprints.return_value = {22: '1F43EE37A0670301AD9CB555D94AFEC2C89FDE86'}
+    exit_policy = stem.exit_policy.ExitPolicy('accept *:22', 'reject *:*')
+
+    def get_type(circuits):
+      context = nyx.panel.connection.ClassificationContext(set(), set(), set(), set(), set(), bool(circuits), exit_policy)
+
+      with patch('nyx.panel.connection.CLASSIFICATION_CONTEXT', context):
+        return nyx.panel.connection.ConnectionEntry(CONNECTION).get_type()
+
+    # relays can also be exit destinations, which we can only tell apart by
+    # our circuits
+
+    self.assertEqual(Category.EXIT, get_type([]))
+    self.assertEqual(Category.OUTBOUND, get_type([MockCircuit()]))
+
+  def test_parse_filter(self):
+    FilterAttr = nyx.panel.connection.FilterAttr
+    parse_filter = nyx.panel.connection.parse_filter
+
+    self.assertEqual([], parse_filter(''))
+    self.assertEqual([(None, '75.119')], parse_filter('75.119'))
+    self.assertEqual([(FilterAttr.CATEGORY, Category.EXIT), (FilterAttr.PORT, 443)], parse_filter('category:exit port:443'))
+    self.assertEqual([(FilterAttr.COUNTRY, 'de'), (FilterAttr.FINGERPRINT, '1F43'), (FilterAttr.NICKNAME, 'caer')], parse_filter('country:DE fingerprint:1f43 nickname:Caer'))
+    self.assertEqual([(FilterAttr.UPTIME, (False, 300)), (FilterAttr.UPTIME, (True, 7200))], parse_filter('uptime:5m uptime:<2h'))
+
+    for malformed in ('color:red', 'port:', 'port:http', 'category:relay', 'uptime:soon'):
+      self.assertRaises(ValueError, parse_filter, malformed)
+
+  @patch('nyx.panel.connection.ENTRY_CACHE')
+  def test_filter_index(self, entry_cache_mock):
+    entry_cache_mock.generation.return_value = 1
+    parse_filter = nyx.panel.connection.parse_filter
+
+    inbound, exit, private = MockEntry(), MockEntry(entry_type = Category.EXIT), MockEntry(entry_type = Category.EXIT, is_private = True)
+    inbound._lines = [line(entry = inbound, connection = Connection(TIMESTAMP - 3600, False, '127.0.0.1', 9001, '75.119.206.243', 22, 'tcp', False))]
+    exit._lines = [line(entry = exit, nickname = 'caerSidi', locale = 'us', connection = Connection(TIMESTAMP - 60, False, '127.0.0.1', 3531, '86.59.30.40', 443, 'tcp', False))]
+    private._lines = [line(entry = private, fingerprint = None, nickname = None, connection = Connection(TIMESTAMP, False, '127.0.0.1', 3532, '75.119.206.10', 443, 'tcp', False))]
+
+    index = nyx.panel.connection.FilterIndex()
+    index.update([inbound, exit, private])
+
+    def select(criteria):
+      return index.select(parse_filter(criteria), TIMESTAMP)
+
+    self.assertEqual(set([inbound, exit, private]), select(''))
+    self.assertEqual(set([exit, private]), select('category:exit'))
+    self.assertEqual(set([exit, private]), select('port:443'))
+    self.assertEqual(set([inbound]), select('port:9001'))
+    self.assertEqual(set([exit]), select('country:us port:443'))
+    self.assertEqual(set([inbound]), select('75.119'))  # scrubbed addresses aren't searchable
+    self.assertEqual(set([exit]), select('nickname:CAER'))
+    self.assertEqual(set([inbound, exit]), select('fingerprint:1f43'))
+    self.assertEqual(set([inbound, exit]), select('uptime:1m'))
+    self.assertEqual(set([exit, private]), select('uptime:<5m'))
+    self.assertEqual(set(), select('category:inbound uptime:<5m'))
+
+    # entries that are gone are dropped from our indexes
+
+    index.update([exit])
+    self.assertEqual(set([exit]), select('port:443'))
+    self.assertEqual(set([exit]), select(''))
+
+  @patch('nyx.panel.connection.ENTRY_CACHE')
+  def test_connection_groups(self, entry_cache_mock):
+    entry_cache_mock.generation.return_value = 1
+    GroupBy = nyx.panel.connection.GroupBy
+
+    def entry(port, start_time, entry_type = Category.INBOUND, locale = 'de'):
+      mock_entry = MockEntry(entry_type = entry_type)
+      mock_entry._lines = [line(entry = mock_entry, locale = locale, connection = Connection(start_time, False, '127.0.0.1', 9001, '75.119.206.243', port, 'tcp', False))]
+      return mock_entry
+
+    first, second, third = entry(443, TIMESTAMP - 60), entry(443, TIMESTAMP - 20), entry(80, TIMESTAMP - 10, Category.EXIT, None)
+
+    groups = nyx.panel.connection.ConnectionGroups(GroupBy.PORT)
+    groups.update([first, second, third])
+
+    https, http = groups.groups()
+    self.assertEqual((443, 2, set([first, second])), (https.key, https.count(), https.members()))
+    self.assertEqual((80, 1), (http.key, http.count()))
+    self.assertEqual((20, 40), https.uptime(TIMESTAMP))
+    self.assertEqual(443, groups.key_of(first))
+
+    # removing connections updates the aggregates, dropping empty groups
+
+    groups.update([first, third])
+    self.assertEqual([(443, 1), (80, 1)], [(group.key, group.count()) for group in groups.groups()])
+    self.assertEqual((60, 60), groups.groups()[0].uptime(TIMESTAMP))
+
+    groups.update([first])
+    self.assertEqual([443], [group.key for group in groups.groups()])
+
+    groups.update([first, second, third])
+    groups.set_group_by(GroupBy.COUNTRY)
+    self.assertEqual([('de', 2), (None, 1)], [(group.key, group.count()) for group in groups.groups()])
+
+    groups.set_group_by(GroupBy.CATEGORY)
+    self.assertEqual([(Category.INBOUND, 2), (Category.EXIT, 1)], [(group.key, group.count()) for group in groups.groups()])
+
+  @require_curses
+  def test_draw_group_line(self):
+    GroupBy = nyx.panel.connection.GroupBy
+
+    group = nyx.panel.connection.ConnectionGroup(GroupBy.PORT, 22)
+    group.add(MockEntry(lines = [line()]))
+    group.add(MockEntry(lines = [line(connection = Connection(TIMESTAMP - 30, False, '127.0.0.1', 3532, '75.119.206.243', 22, 'tcp', False))]))
+
+    rendered = test.render(nyx.panel.connection._draw_line, 0, 0, group.get_lines()[0], False, 80, TIMESTAMP + 15.4)
+    self.assertEqual(' 22 (SSH)                     2 connections, newest: 15.4s     30.4s (AVG)', rendered.content)
+
+  @patch('nyx.panel.connection.ENTRY_CACHE')
+  def test_sorted_entries(self, entry_cache_mock):
+    entry_cache_mock.generation.return_value = 1
+    SortAttr = nyx.panel.connection.SortAttr
+
+    def entry(port, uptime):
+      return SortableEntry(**{SortAttr.PORT: port, SortAttr.UPTIME: uptime})
+
+    first, second, third, fourth = entry(80, 5), entry(22, 7), entry(443, 1), entry(80, 2)
+
+    sorted_entries = nyx.panel.connection.SortedEntries([SortAttr.PORT, SortAttr.UPTIME])
+    sorted_entries.update([first, second, third])
+    self.assertEqual([second, first, third], sorted_entries.entries())
+
+    # new entries are placed among the old, and those that are gone removed
+
+    sorted_entries.update([first, third, fourth])
+    self.assertEqual([fourth, first, third], sorted_entries.entries())
+
+    # reordering and keeping entries doesn't fetch their values again
+
+    sorted_entries.set_order([SortAttr.UPTIME])
+    self.assertEqual([third, fourth, first], sorted_entries.entries())
+    self.assertEqual([2, 2, 2], [e.lookups for e in (first, third, fourth)])
+
+    sorted_entries.update([first, third, fourth])
+    self.assertEqual([2, 2, 2], [e.lookups for e in (first, third, fourth)])
+
+    # but they're fetched again when the entry cache is invalidated
+
+    entry_cache_mock.generation.return_value = 2
+    sorted_entries.update([first, third, fourth])
+    self.assertEqual([3, 3, 3], [e.lookups for e in (first, third, fourth)])
+
+  @patch('nyx.panel.connection.ENTRY_CACHE')
+  def test_line_index(self, entry_cache_mock):
+    entry_cache_mock.generation.return_value = 1
+
+    first, second, third = MockEntry(), MockEntry(entry_type = Category.CIRCUIT), MockEntry()
+    circuit_lines = [line(entry = second, line_type = LineType.CIRCUIT_HEADER), line(entry = second, line_type = LineType.CIRCUIT)]
+
+    first._lines = [line(entry = first)]
+    second._lines = circuit_lines
+    third._lines = [line(entry = third, nickname = 'caerSidi')]
+
+    lines = nyx.panel.connection.LineIndex([first, second, third])
+    self.assertEqual(4, len(lines))
+    self.assertEqual(first.get_lines() + circuit_lines + third.get_lines(), list(lines))
+    self.assertEqual(2, lines.index(circuit_lines[1]))
+    self.assertEqual(3, lines.index(third.get_lines()[0]))
+    self.assertRaises(ValueError, lines.index, line(entry = MockEntry()))
+    self.assertRaises(ValueError, lines.index, None)
+
+    # scrolling keeps its selection as entries change
+
+    scroller = nyx.curses.CursorScroller(indexed = True)
+    scroller.handle_key(nyx.curses.KeyInput(curses.KEY_DOWN), lines, 10)
+    scroller.handle_key(nyx.curses.KeyInput(curses.KEY_DOWN), lines, 10)
+    self.assertEqual((circuit_lines[1], 0), scroller.selection(lines, 10))
+
+    lines = nyx.panel.connection.LineIndex([second, third])
+    self.assertEqual((circuit_lines[1], 0), scroller.selection(lines, 10))
+
+    lines = nyx.panel.connection.LineIndex([third])
+    self.assertEqual((third.get_lines()[0], 0), scroller.selection(lines, 10))
+
+  @patch('nyx.panel.connection.tor_controller')
+  @patch('nyx.panel.connection._usage_counts', Mock())
+  @patch('nyx.tracker.get_throughput_tracker', Mock())
+  @patch('nyx.tracker.get_circuit_tracker', Mock())
+  @patch('nyx.tracker.get_consensus_tracker', Mock())
+  @patch('nyx.tracker.get_connection_tracker', Mock())
+  @patch('nyx.panel.Panel.redraw', Mock())
+  def test_show_details_without_connections(self, tor_controller_mock):
+    tor_controller_mock().get_info.return_value = None
+    panel = nyx.panel.connection.ConnectionPanel()
+    enter = [handler for handler in panel.key_handlers() if handler.key == 'enter'][0]
+
+    enter.handle(nyx.curses.KeyInput(curses.KEY_ENTER))
+    self.assertTrue(panel._show_details)
+
+  @patch('nyx.panel.connection.tor_controller')
+  @patch('nyx.panel.connection._usage_counts')
+  @patch('nyx.panel.DaemonPanel.run', Mock())
+  @patch('nyx.tracker.get_throughput_tracker', Mock())
+  @patch('nyx.tracker.get_circuit_tracker', Mock())
+  @patch('nyx.tracker.get_consensus_tracker', Mock())
+  def test_usage_saved_when_stopped(self, usage_counts_mock, tor_controller_mock):
+    tor_controller_mock().get_info.return_value = None
+
+    panel = nyx.panel.connection.ConnectionPanel()
+    panel.run()
+
+    usage_counts_mock().save.assert_called_with(True)
+
   @require_curses
   def test_draw_title(self):
     rendered = test.render(nyx.panel.connection._draw_title, [], True)
@@ -237,6 +528,19 @@ class TestConnectionPanel(unittest.TestCase):
       rendered = test.render(nyx.panel.connection._draw_address_column, 0, 0, test_line, ())
       self.assertEqual(expected, rendered.content)
 
+  @require_curses
+  def test_draw_rate_column(self):
+    test_data = {
+      line(): '',
+      line(entry = MockEntry(rate = Rate(1024, 512))): '   1 KB/s',
+      line(entry = MockEntry(entry_type = Category.CIRCUIT, rate = Rate(2048, 2048)), line_type = LineType.CIRCUIT_HEADER): '   4 KB/s',
+      line(entry = MockEntry(rate = Rate(1024, 512)), line_type = LineType.CIRCUIT): '',
+    }
+
+    for test_line, expected in test_data.items():
+      rendered = test.render(nyx.panel.connection._draw_rate_column, 0, 0, test_line, ())
+      self.assertEqual(expected, rendered.content)
+
   @require_curses
   @patch('nyx.tracker.get_port_usage_tracker')
   def test_draw_line_details(self, port_usage_tracker_mock):
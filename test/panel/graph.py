@@ -3,6 +3,10 @@ Unit tests for nyx.panel.graph.
 """
 
 import datetime
+import os
+import shutil
+import tempfile
+import time
 import unittest
 
 import stem.control
@@ -12,7 +16,7 @@ import nyx.panel.graph
 import test
 
 from test import require_curses
-from mock import patch
+from mock import Mock, patch
 
 EXPECTED_BLANK_GRAPH = """
 Download:
@@ -24,6 +28,16 @@ Download:
         5s   10   15
 """.rstrip()
 
+EXPECTED_ZOOMED_GRAPH = """
+Download:
+3 Kb    *
+       **
+1 Kb * **
+     * ***
+0 b  *****
+         10s  20   30
+""".rstrip()
+
 EXPECTED_ACCOUNTING = """
 Accounting (awake)                 Time to reset: 01:02
   37.7 Kb / 842.0 Kb                 16.0 Kb / 74.1 Kb
@@ -41,6 +55,176 @@ Download:
 
 
 class TestGraphPanel(unittest.TestCase):
+  def test_ring_buffer(self):
+    ring = nyx.panel.graph.RingBuffer(4)
+    self.assertEqual([0, 0, 0, 0], list(ring))
+
+    for i in range(1, 7):
+      ring.append(i)
+
+    self.assertEqual(4, len(ring))
+    self.assertEqual([6, 5, 4, 3], list(ring))
+    self.assertEqual([6, 5], list(ring.view(2)))
+    self.assertEqual([6, 5, 4, 3], list(ring.view(10)))
+    self.assertEqual([5, 4], ring[1:3])
+    self.assertEqual(6, ring[0])
+    self.assertEqual(3, ring[-1])
+    self.assertRaises(IndexError, ring.__getitem__, 4)
+
+  def test_ring_buffer_snapshot(self):
+    ring = nyx.panel.graph.RingBuffer(4)
+
+    for i in range(1, 5):
+      ring.append(i)
+
+    snapshot = ring.snapshot()
+    self.assertEqual([4, 3, 2, 1], list(snapshot))
+    self.assertEqual({}, snapshot._preserved)
+
+    ring.append(5)
+    ring.append(6)
+
+    self.assertEqual([6, 5, 4, 3], list(ring))
+    self.assertEqual([4, 3, 2, 1], list(snapshot))
+    self.assertEqual([4, 3], list(snapshot.view(2)))
+    self.assertEqual([3, 2], snapshot[1:3])
+    self.assertEqual(1, snapshot[-1])
+    self.assertEqual(2, len(snapshot._preserved))  # only overwritten values are copied
+    self.assertTrue(snapshot.snapshot() is snapshot)
+
+    # snapshots stop being updated once they're no longer referenced
+
+    del snapshot
+    self.assertEqual(0, len(ring._snapshots))
+
+  def test_ring_buffer_bounds(self):
+    ring = nyx.panel.graph.RingBuffer(5)
+    self.assertEqual((0, 0), ring.bounds())
+
+    for value in (7, 3, 9, 1, 4, 6, 2):
+      ring.append(value)
+
+    # newest to oldest our values are now 2, 6, 4, 1, 9 (wrapping around our list)
+
+    for count in range(1, 6):
+      expected = (min(ring[:count]), max(ring[:count]))
+      self.assertEqual(expected, ring.bounds(count))
+
+    self.assertEqual((1, 9), ring.bounds())
+    self.assertEqual((1, 9), ring.bounds(50))
+    self.assertEqual((0, 0), ring.bounds(0))
+
+    # snapshots retain the bounds of when they were made
+
+    snapshot = ring.snapshot()
+
+    for value in (100, 200):
+      ring.append(value)
+
+    self.assertEqual((100, 200), ring.bounds(2))
+    self.assertEqual((2, 6), snapshot.bounds(2))
+    self.assertEqual((1, 9), snapshot.bounds())
+
+  def test_log_histogram(self):
+    histogram = nyx.panel.graph.LogHistogram()
+    self.assertEqual([None, None], histogram.percentiles(50, 99))
+
+    for value in range(1, 1001):
+      histogram.add(value)
+
+    for expected, estimate in zip((500, 950, 990), histogram.percentiles(50, 95, 99)):
+      self.assertTrue(abs(estimate - expected) / expected < 0.05, 'estimated %s for %s' % (estimate, expected))
+
+    self.assertEqual([1, 1000], histogram.percentiles(0, 100))
+    self.assertEqual(500.5, histogram.mean())
+
+    # merging is the same as having added the values ourselves
+
+    other = nyx.panel.graph.LogHistogram()
+    other.add(0, 1000)
+    other.add(2 ** 60)  # beyond our largest bucket
+
+    merged = histogram.clone()
+    merged.merge(other)
+
+    self.assertEqual(2001, merged.count)
+    self.assertEqual(0, merged.minimum)
+    self.assertEqual(2 ** 60, merged.maximum)
+    self.assertEqual([0, 2 ** 60], merged.percentiles(25, 100))
+    self.assertEqual(1000, histogram.count)  # clones are independent
+
+  @patch('nyx.panel.graph.CONFIG', {'features.graph.max_width': 5, 'attr.graph.header.primary': {}})
+  def test_graph_data_distribution(self):
+    data = nyx.panel.graph.ConnectionStats().primary
+    self.assertEqual(None, data.distribution(nyx.panel.graph.Interval.EACH_SECOND))
+
+    for value in [10] * 98 + [100, 200]:
+      data.update(value)
+
+    distribution = data.distribution(nyx.panel.graph.Interval.EACH_SECOND)
+    self.assertTrue(abs(distribution.p50 - 10) < 0.5)
+    self.assertTrue(abs(distribution.p99 - 100) < 5)
+    self.assertAlmostEqual(200 / 12.8, distribution.peak_to_mean)
+
+    # each of the five second samplings are 10 except the last
+
+    distribution = data.distribution(nyx.panel.graph.Interval.FIVE_SECONDS)
+    self.assertTrue(abs(distribution.p95 - 10) < 0.5)
+    self.assertEqual(66, distribution.p99)
+
+    self.assertEqual(' (p50: 10, p95: 10, p99: 103, peak/mean: 15.6):', data.header(80, nyx.panel.graph.Interval.EACH_SECOND))
+
+    # clones share histograms until the original next changes them
+
+    clone = nyx.panel.graph.GraphData(data)
+    self.assertTrue(clone._histograms[nyx.panel.graph.Interval.EACH_SECOND] is data._histograms[nyx.panel.graph.Interval.EACH_SECOND])
+
+    data.update(1000)
+    self.assertEqual(100, clone._histograms[nyx.panel.graph.Interval.EACH_SECOND].count)
+    self.assertEqual(101, data._histograms[nyx.panel.graph.Interval.EACH_SECOND].count)
+    self.assertTrue(clone._histograms[nyx.panel.graph.Interval.DAILY] is data._histograms[nyx.panel.graph.Interval.DAILY])
+
+  @patch('nyx.panel.graph.CONFIG', {'features.graph.max_width': 5})
+  def test_graph_data_update(self):
+    data = nyx.panel.graph.GraphData()
+
+    for value in (10, 20, 30, 40, 50, 60, 70):
+      data.update(value)
+
+    self.assertEqual([70, 60, 50, 40, 30], list(data.values[nyx.panel.graph.Interval.EACH_SECOND]))
+    self.assertEqual([30, 0, 0, 0, 0], list(data.values[nyx.panel.graph.Interval.FIVE_SECONDS]))
+    self.assertEqual((0, 70), data.bounds(nyx.panel.graph.Bounds.LOCAL_MAX, nyx.panel.graph.Interval.EACH_SECOND, 3))
+    self.assertEqual((50, 70), data.bounds(nyx.panel.graph.Bounds.TIGHT, nyx.panel.graph.Interval.EACH_SECOND, 3))
+
+    # clones are independent of the original
+
+    clone = nyx.panel.graph.GraphData(data)
+    data.update(80)
+
+    self.assertEqual([70, 60, 50, 40, 30], list(clone.values[nyx.panel.graph.Interval.EACH_SECOND]))
+    self.assertEqual([80, 70, 60, 50, 40], list(data.values[nyx.panel.graph.Interval.EACH_SECOND]))
+
+  @patch('nyx.panel.graph.CONFIG', {'features.graph.max_width': 5})
+  def test_glyph_rows(self):
+    data = nyx.panel.graph.GraphData()
+
+    for value in (8, 4, 0, 2):
+      data.update(value)
+
+    eighths = data.glyph_rows(nyx.panel.graph.Interval.EACH_SECOND, nyx.panel.graph.Style.EIGHTHS, 5, 2, 0, 8)
+    self.assertEqual([u'   \u2588 ', u'\u2584 \u2588\u2588 '], eighths)
+    self.assertTrue(eighths is data.glyph_rows(nyx.panel.graph.Interval.EACH_SECOND, nyx.panel.graph.Style.EIGHTHS, 5, 2, 0, 8))
+
+    braille = data.glyph_rows(nyx.panel.graph.Interval.EACH_SECOND, nyx.panel.graph.Style.BRAILLE, 2, 1, 0, 8)
+    self.assertEqual([u'\u2840\u28fc'], braille)
+
+    # clones share our cache, but it's invalidated when we're updated
+
+    self.assertTrue(braille is nyx.panel.graph.GraphData(data).glyph_rows(nyx.panel.graph.Interval.EACH_SECOND, nyx.panel.graph.Style.BRAILLE, 2, 1, 0, 8))
+
+    data.update(8)
+    self.assertEqual([u'\u28c7\u28a0'], data.glyph_rows(nyx.panel.graph.Interval.EACH_SECOND, nyx.panel.graph.Style.BRAILLE, 2, 1, 0, 8))
+
   def test_x_axis_labels(self):
     test_inputs = {
       0: {},
@@ -79,6 +263,40 @@ class TestGraphPanel(unittest.TestCase):
     for interval, expected in test_inputs.items():
       self.assertEqual(expected, nyx.panel.graph._x_axis_labels(interval, 80))
 
+    # columns can span several values, such as with braille
+
+    self.assertEqual(test_inputs[nyx.panel.graph.Interval.FIVE_SECONDS], nyx.panel.graph._x_axis_labels(nyx.panel.graph.Interval.EACH_SECOND, 80, 5))
+
+    # when panned labels are how long ago each point is
+
+    self.assertEqual({5: '1.0m', 10: '1.1'}, nyx.panel.graph._x_axis_labels(nyx.panel.graph.Interval.EACH_SECOND, 15, 1, 60))
+
+  @patch('nyx.panel.graph.tor_controller')
+  @patch('nyx.tracker.get_connection_tracker')
+  def test_connection_stats(self, tracker_mock, tor_controller_mock):
+    tor_controller_mock().get_ports.side_effect = lambda listener, default: {stem.control.Listener.OR: [9001], stem.control.Listener.CONTROL: [9051]}.get(listener, default)
+
+    tracker_mock().run_counter.return_value = 1
+    tracker_mock().get_value.return_value = [Mock(local_port = 9001), Mock(local_port = 9001), Mock(local_port = 9051), Mock(local_port = 41234)]
+
+    stats = nyx.panel.graph.ConnectionStats()
+    stats.bandwidth_event(None)
+    stats.bandwidth_event(None)
+
+    self.assertEqual([2, 2], list(stats.primary.values[nyx.panel.graph.Interval.EACH_SECOND].view(2)))
+    self.assertEqual([1, 1], list(stats.secondary.values[nyx.panel.graph.Interval.EACH_SECOND].view(2)))
+
+    # connections are only counted when the tracker has new results
+
+    self.assertEqual(1, tracker_mock().get_value.call_count)
+
+    tracker_mock().run_counter.return_value = 2
+    tracker_mock().get_value.return_value = [Mock(local_port = 41234)]
+    stats.bandwidth_event(None)
+
+    self.assertEqual(0, stats.primary.latest_value)
+    self.assertEqual(1, stats.secondary.latest_value)
+
   def test_y_axis_labels(self):
     data = nyx.panel.graph.ConnectionStats()
 
@@ -91,6 +309,143 @@ class TestGraphPanel(unittest.TestCase):
 
     self.assertEqual({2: '0', 11: '0'}, nyx.panel.graph._y_axis_labels(12, data.primary, 0, 0))
 
+  @patch('nyx.panel.graph.CONFIG', {'features.graph.max_width': 5})
+  def test_graph_data_skip(self):
+    data, expected = nyx.panel.graph.GraphData(), nyx.panel.graph.GraphData()
+
+    for value in (10, 20, 30):
+      data.update(value)
+      expected.update(value)
+
+    data._skip(4000, 2)
+
+    for i in range(4000):
+      expected.update(2)
+
+    self.assertEqual(expected.tick, data.tick)
+    self.assertEqual(expected.total, data.total)
+
+    for interval in nyx.panel.graph.Interval:
+      self.assertEqual(list(expected.values[interval]), list(data.values[interval]))
+      self.assertEqual(expected._in_process_value[interval], data._in_process_value[interval])
+      self.assertEqual(expected._max_value[interval], data._max_value[interval])
+
+  @patch('nyx.panel.graph.CONFIG', {'features.graph.max_width': 5})
+  def test_history(self):
+    tmp_dir = tempfile.mkdtemp()
+    history_path = os.path.join(tmp_dir, 'connections')
+
+    try:
+      stats = nyx.panel.graph.ConnectionStats(history_path = history_path)
+
+      for value in (4, 6, 8, 10, 12, 14):
+        stats.primary.update(value)
+        stats.secondary.update(value + 1)
+
+      # long term history is available at multiple resolutions
+
+      step, samples = stats.primary.history(time.time() - 60)
+      self.assertEqual(1, step)
+      self.assertEqual(4, min([sample.minimum for sample in samples]))
+      self.assertEqual(14, max([sample.maximum for sample in samples]))
+      self.assertEqual(None, nyx.panel.graph.ConnectionStats().primary.history(0))
+
+      # restoring while the history is fresh
+
+      restored = nyx.panel.graph.ConnectionStats(history_path = history_path)
+      self.assertEqual([14, 12, 10, 8, 6], list(restored.primary.values[nyx.panel.graph.Interval.EACH_SECOND]))
+      self.assertEqual([15, 13, 11, 9, 7], list(restored.secondary.values[nyx.panel.graph.Interval.EACH_SECOND]))
+      self.assertEqual([8], restored.primary.values[nyx.panel.graph.Interval.FIVE_SECONDS][:1])
+      self.assertEqual((6, 54, 14), (restored.primary.tick, restored.primary.total, restored.primary.latest_value))
+      self.assertTrue(isinstance(restored.primary.values[nyx.panel.graph.Interval.EACH_SECOND][0], int))
+
+      # seconds since we last saved are filled with zeros
+
+      with patch('time.time', return_value = time.time() + 3):
+        restored = nyx.panel.graph.ConnectionStats(history_path = history_path)
+
+      self.assertEqual([0, 0, 0, 14, 12], list(restored.primary.values[nyx.panel.graph.Interval.EACH_SECOND]))
+      self.assertEqual(9, restored.primary.tick)
+    finally:
+      shutil.rmtree(tmp_dir)
+
+  @patch('nyx.panel.graph.CONFIG', {'features.graph.max_width': 5})
+  def test_downsample(self):
+    data = nyx.panel.graph.GraphData()
+
+    for value in range(1, 13):
+      data.update(value)
+
+    self.assertEqual(([11.5, 9.5], [11, 9], [12, 10]), data.downsample(2, 0, 2))
+    self.assertEqual(([10.0, 9.0], [10, 9], [10, 9]), data.downsample(1, 2, 2))
+
+    # uses the coarsest interval that retains the range
+
+    self.assertEqual([8.0, 3.0, 0.0], data.downsample(5, 0, 3).average)
+
+    # without long term history we show what we can
+
+    self.assertEqual([5.5, 0.0, 0.0, None], data.downsample(10, 0, 4).average)
+
+    # results are cached until we're next updated
+
+    self.assertTrue(data.downsample(2, 0, 2) is data.downsample(2, 0, 2))
+    self.assertTrue(data.downsample(2, 0, 2) is nyx.panel.graph.GraphData(data).downsample(2, 0, 2))
+
+    data.update(13)
+    self.assertEqual([12.5, 10.5], data.downsample(2, 0, 2).average)
+
+    # panning doesn't grow our cache without bound
+
+    for offset in range(100):
+      data.downsample(1, offset, 2)
+
+    self.assertEqual(nyx.panel.graph.GRAPH_CACHE_SIZE, len(data._downsample_cache))
+
+  @patch('nyx.panel.graph.CONFIG', {'features.graph.max_width': 5})
+  def test_downsample_from_history(self):
+    tmp_dir = tempfile.mkdtemp()
+    now = time.time()
+
+    try:
+      stats = nyx.panel.graph.ConnectionStats(history_path = os.path.join(tmp_dir, 'connections'))
+
+      for i in range(20):
+        stats.primary.update(100 if i == 10 else 10, now - 19 + i)
+
+      # ten minutes is more than our intervals retain, so this comes from
+      # our long term history
+
+      with patch('time.time', return_value = now):
+        downsampled = stats.primary.downsample(60, 0, 10)
+
+      self.assertEqual(([14.5] + [None] * 9, [10] + [None] * 9, [100] + [None] * 9), downsampled)
+      self.assertEqual((0, 15), stats.primary.zoomed_bounds(nyx.panel.graph.Bounds.LOCAL_MAX, nyx.panel.graph.Zoom(60, 0), 10))
+      self.assertEqual((0, 100), stats.primary.zoomed_bounds(nyx.panel.graph.Bounds.GLOBAL_MAX, nyx.panel.graph.Zoom(60, 0), 10))
+    finally:
+      shutil.rmtree(tmp_dir)
+
+  @patch('nyx.panel.graph.CONFIG', {'features.graph.max_width': 5})
+  def test_downsample_from_coarse_history(self):
+    tmp_dir = tempfile.mkdtemp()
+    now = time.time()
+
+    try:
+      stats = nyx.panel.graph.ConnectionStats(history_path = os.path.join(tmp_dir, 'connections'))
+
+      for i in range(200):
+        stats.primary.update(10, now - 3800 + i)
+
+      # over an hour ago our history has minutely samples, each of which
+      # spans several of our ten second columns
+
+      with patch('time.time', return_value = now):
+        downsampled = stats.primary.downsample(10, 3620, 10)
+
+      self.assertEqual([10.0] * 10, downsampled.average)
+    finally:
+      shutil.rmtree(tmp_dir)
+
   @require_curses
   @patch('nyx.panel.graph.tor_controller')
   def test_draw_subgraph_blank(self, tor_controller_mock):
@@ -109,6 +464,25 @@ class TestGraphPanel(unittest.TestCase):
     rendered = test.render(nyx.panel.graph._draw_subgraph, data.primary, 0, 30, 7, nyx.panel.graph.Bounds.LOCAL_MAX, nyx.panel.graph.Interval.EACH_SECOND, nyx.curses.Color.CYAN, '*')
     self.assertEqual(EXPECTED_GRAPH, rendered.content)
 
+  @require_curses
+  @patch('nyx.panel.graph.tor_controller')
+  def test_draw_subgraph_zoomed(self, tor_controller_mock):
+    tor_controller_mock().get_info.return_value = '543,543 421,421 551,551 710,710 200,200 175,175 188,188 250,250 377,377'
+    data = nyx.panel.graph.BandwidthStats()
+
+    rendered = test.render(nyx.panel.graph._draw_subgraph, data.primary, 0, 30, 7, nyx.panel.graph.Bounds.LOCAL_MAX, nyx.panel.graph.Interval.EACH_SECOND, nyx.curses.Color.CYAN, '*', zoom = nyx.panel.graph.Zoom(2, 0))
+    self.assertEqual(EXPECTED_ZOOMED_GRAPH, rendered.content)
+
+  @require_curses
+  @patch('nyx.curses.is_wide_characters_supported', Mock(return_value = False))
+  @patch('nyx.panel.graph.tor_controller')
+  def test_draw_subgraph_without_wide_characters(self, tor_controller_mock):
+    tor_controller_mock().get_info.return_value = '543,543 421,421 551,551 710,710 200,200 175,175 188,188 250,250 377,377'
+    data = nyx.panel.graph.BandwidthStats()
+
+    rendered = test.render(nyx.panel.graph._draw_subgraph, data.primary, 0, 30, 7, nyx.panel.graph.Bounds.LOCAL_MAX, nyx.panel.graph.Interval.EACH_SECOND, nyx.curses.Color.CYAN, '*', nyx.panel.graph.Style.BRAILLE)
+    self.assertEqual(EXPECTED_GRAPH, rendered.content)
+
   @require_curses
   @patch('nyx.panel.graph.tor_controller')
   def test_draw_accounting_stats(self, tor_controller_mock):
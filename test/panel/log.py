@@ -9,6 +9,7 @@ import nyx.panel.log
 import test
 
 from nyx.log import LogEntry, LogFilters
+from nyx.panel.log import IngestionMetrics
 from test import require_curses
 from mock import patch, Mock
 
@@ -77,6 +78,14 @@ class TestLogPanel(unittest.TestCase):
     rendered = test.render(nyx.panel.log._draw_title, ['NYX_DEBUG', 'NYX_INFO', 'NYX_NOTICE', 'NYX_WARNING', 'NYX_ERROR', 'NOTICE', 'WARN', 'ERR'], LogFilters())
     self.assertEqual('Events (NOTICE-ERR, NYX DEBUG-ERR):', rendered.content)
 
+  @require_curses
+  def test_draw_title_with_backlog(self):
+    rendered = test.render(nyx.panel.log._draw_title, ['NOTICE', 'WARN', 'ERR'], LogFilters(), None, IngestionMetrics(5, 0.1, 0))
+    self.assertEqual('Events (NOTICE-ERR):', rendered.content)
+
+    rendered = test.render(nyx.panel.log._draw_title, ['NOTICE', 'WARN', 'ERR'], LogFilters(), None, IngestionMetrics(2500, 3.25, 120))
+    self.assertEqual('Events (NOTICE-ERR, backlog: 2500 (3.2s), dropped: 120):', rendered.content)
+
   @require_curses
   def test_draw_title_with_filter(self):
     log_filter = LogFilters()
@@ -85,6 +94,11 @@ class TestLogPanel(unittest.TestCase):
     rendered = test.render(nyx.panel.log._draw_title, ['NOTICE', 'WARN', 'ERR'], log_filter)
     self.assertEqual('Events (NOTICE-ERR, filter: stuff*):', rendered.content)
 
+  @require_curses
+  def test_draw_title_with_search(self):
+    rendered = test.render(nyx.panel.log._draw_title, ['NOTICE', 'WARN', 'ERR'], LogFilters(), '127.0.0.1 (2/5)')
+    self.assertEqual('Events (NOTICE-ERR, search: 127.0.0.1 (2/5)):', rendered.content)
+
   @require_curses
   @patch('time.localtime', Mock(return_value = TIME_STRUCT))
   def test_draw_entry(self):
@@ -121,6 +135,19 @@ class TestLogPanel(unittest.TestCase):
     rendered = test.render(nyx.panel.log._draw_entries, 0, 0, entries(), True)
     self.assertEqual(EXPECTED_ENTRIES, rendered.content)
 
+  @require_curses
+  @patch('time.localtime', Mock(return_value = TIME_STRUCT))
+  @patch('nyx.log.day_count', Mock(return_value = 5))
+  def test_draw_entries_with_search_match(self):
+    log_entries, drawn_to = entries(), []
+
+    def _draw(subwindow):
+      drawn_to.append(nyx.panel.log._draw_entries(subwindow, 0, 0, log_entries, True, log_entries[3:5], log_entries[4]))
+
+    rendered = test.render(_draw)
+    self.assertEqual(EXPECTED_ENTRIES, rendered.content)
+    self.assertEqual([(11, 6)], drawn_to)
+
   @require_curses
   @patch('time.localtime', Mock(return_value = TIME_STRUCT))
   @patch('time.strftime', Mock(return_value = 'October 26, 2011'))
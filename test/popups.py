@@ -306,6 +306,25 @@ class TestPopups(unittest.TestCase):
     rendered = test.render(nyx.popups.show_counts, 'Client Locales', clients, fill_char = '*')
     self.assertEqual(EXPECTED_COUNTS, rendered.content)
 
+  @require_curses
+  @patch('nyx.popups._top', Mock(return_value = 0))
+  def test_counts_with_periods(self):
+    def draw_func():
+      with mock_keybindings(curses.KEY_RIGHT, curses.KEY_RIGHT, ord('q')):
+        return nyx.popups.show_counts('Client Locales', [('last hour', {}), ('last day', {}), ('since start', {'de': 5})])
+
+    rendered = test.render(draw_func)
+    self.assertTrue(rendered.content.startswith('Client Locales (since start)-'))
+    self.assertTrue('de  5 (100%)' in rendered.content)
+    self.assertTrue('Press left or right to change the period, or any other key...' in rendered.content)
+
+  @require_curses
+  @patch('nyx.popups._top', Mock(return_value = 0))
+  def test_counts_with_estimates(self):
+    rendered = test.render(nyx.popups.show_counts, 'Exiting Port Usage', [('last hour', {'80': 12, '443': 3}, set(['443']))])
+    self.assertTrue('80  12 (80%)' in rendered.content)
+    self.assertTrue('443 ~3 (20%)' in rendered.content)
+
   @require_curses
   @patch('nyx.popups._top', Mock(return_value = 0))
   def test_select_from_list(self):
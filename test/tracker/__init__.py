@@ -3,8 +3,10 @@ Unit tests for nyx's tracker utilities.
 """
 
 __all__ = [
+  'circuit_tracker',
   'connection_tracker',
   'daemon',
   'port_usage_tracker',
   'resource_tracker',
+  'throughput_tracker',
 ]
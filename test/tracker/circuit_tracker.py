@@ -0,0 +1,82 @@
+import unittest
+
+import stem
+
+from nyx.tracker import CircuitTracker
+
+from mock import Mock, patch
+
+
+def circ_event(circ_id, status = stem.CircStatus.BUILT, path = ()):
+  return Mock(id = circ_id, status = status, path = list(path))
+
+
+class TestCircuitTracker(unittest.TestCase):
+  @patch('time.time', Mock(return_value = 1000))
+  @patch('nyx.tracker.tor_controller')
+  def test_circuits_from_events(self, tor_controller_mock):
+    tor_controller_mock().get_circuits.return_value = [circ_event('1')]
+
+    tracker = CircuitTracker(reconcile_rate = 60)
+    self.assertEqual(['1'], [circ.id for circ in tracker.get_circuits()])
+    self.assertEqual(1, tracker.generation())
+
+    tracker._circ_event(circ_event('2', stem.CircStatus.LAUNCHED))
+    tracker._circ_event(circ_event('2', stem.CircStatus.EXTENDED, [('9695DFC35FFEB861329B9F1AB04C46397020CE31', 'moria1')]))
+    tracker._circ_event(circ_event('1', stem.CircStatus.CLOSED))
+    tracker._circ_event(circ_event('3', stem.CircStatus.FAILED))  # never known, so no change
+
+    circuits = tracker.get_circuits()
+    self.assertEqual(['2'], [circ.id for circ in circuits])
+    self.assertEqual(stem.CircStatus.EXTENDED, circuits[0].status)
+    self.assertEqual(4, tracker.generation())
+
+    # we shouldn't query tor again until it's time to reconcile
+
+    self.assertEqual(1, tor_controller_mock().get_circuits.call_count)
+
+  @patch('nyx.tracker.tor_controller')
+  def test_reconcile(self, tor_controller_mock):
+    tor_controller_mock().get_circuits.return_value = [circ_event('1')]
+
+    with patch('time.time', Mock(return_value = 1000)):
+      tracker = CircuitTracker(reconcile_rate = 60)
+      tracker.get_circuits()
+      tracker._circ_event(circ_event('2'))
+
+    # tor has circuits we missed the events for
+
+    tor_controller_mock().get_circuits.return_value = [circ_event('1'), circ_event('4')]
+
+    with patch('time.time', Mock(return_value = 1030)):
+      self.assertEqual(['1', '2'], [circ.id for circ in tracker.get_circuits()])
+
+    with patch('time.time', Mock(return_value = 1060)):
+      self.assertEqual(['1', '4'], [circ.id for circ in tracker.get_circuits()])
+
+    # if tor is unable to provide circuits we keep what we have
+
+    tor_controller_mock().get_circuits.return_value = None
+
+    with patch('time.time', Mock(return_value = 1120)):
+      self.assertEqual(['1', '4'], [circ.id for circ in tracker.get_circuits()])
+
+  @patch('time.time', Mock(return_value = 1000))
+  @patch('nyx.tracker.tor_controller')
+  def test_events_during_reconcile(self, tor_controller_mock):
+    tracker = CircuitTracker(reconcile_rate = 60)
+
+    # circuit 1 closes and 5 is launched after tor provided its circuits, but
+    # before we've received them
+
+    def get_circuits(default):
+      tracker._circ_event(circ_event('1', stem.CircStatus.CLOSED))
+      tracker._circ_event(circ_event('5', stem.CircStatus.LAUNCHED))
+      return [circ_event('1'), circ_event('4')]
+
+    tor_controller_mock().get_circuits.side_effect = get_circuits
+    self.assertEqual(['4', '5'], [circ.id for circ in tracker.get_circuits()])
+
+    # events are no longer queued once we're done
+
+    self.assertEqual(None, tracker._pending_events)
@@ -0,0 +1,72 @@
+import unittest
+
+import stem
+
+from nyx.tracker import Rate, Talker, TalkerType, ThroughputTracker
+
+from mock import Mock, patch
+
+
+def orconn_event(connection_id, address, port, fingerprint = None, status = stem.ORStatus.CONNECTED):
+  return Mock(id = connection_id, endpoint_address = address, endpoint_port = port, endpoint_fingerprint = fingerprint, status = status)
+
+
+def bw_event(event_id, read, written):
+  return Mock(id = event_id, read = read, written = written)
+
+
+class TestThroughputTracker(unittest.TestCase):
+  @patch('time.time', Mock(return_value = 1000))
+  @patch('nyx.tracker.tor_controller', Mock())
+  def test_rates(self):
+    tracker = ThroughputTracker(window = 10)
+    tracker._orconn_event(orconn_event('5', '86.59.30.40', 443))
+    tracker._orconn_event(orconn_event('6', None, None, fingerprint = '9695DFC35FFEB861329B9F1AB04C46397020CE31'))
+
+    for i in range(5):
+      tracker._conn_bw_event(bw_event('5', 1000, 200))
+      tracker._circ_bw_event(bw_event('12', 50, 50))
+
+    tracker._conn_bw_event(bw_event('6', 10, 10))
+
+    self.assertEqual(Rate(500.0, 100.0), tracker.get_connection_rate('86.59.30.40', 443))
+    self.assertEqual(Rate(1.0, 1.0), tracker.get_connection_rate('75.119.206.243', 9001, '9695DFC35FFEB861329B9F1AB04C46397020CE31'))
+    self.assertEqual(None, tracker.get_connection_rate('75.119.206.243', 22))
+    self.assertEqual(Rate(25.0, 25.0), tracker.get_circuit_rate('12'))
+    self.assertEqual(None, tracker.get_circuit_rate('13'))
+
+    self.assertEqual([Talker(TalkerType.CONNECTION, '5', Rate(500.0, 100.0)), Talker(TalkerType.CIRCUIT, '12', Rate(25.0, 25.0))], tracker.get_top_talkers(2))
+    self.assertEqual([Talker(TalkerType.CIRCUIT, '12', Rate(25.0, 25.0))], tracker.get_top_talkers(2, TalkerType.CIRCUIT))
+
+    # closed connections are no longer correlated with their endpoint
+
+    tracker._orconn_event(orconn_event('5', '86.59.30.40', 443, status = stem.ORStatus.CLOSED))
+    self.assertEqual(None, tracker.get_connection_rate('86.59.30.40', 443))
+
+  @patch('nyx.tracker.tor_controller', Mock())
+  def test_rates_expire(self):
+    tracker = ThroughputTracker(window = 10)
+
+    with patch('time.time', Mock(return_value = 1000)):
+      tracker._circ_bw_event(bw_event('12', 100, 0))
+
+    with patch('time.time', Mock(return_value = 1005)):
+      tracker._circ_bw_event(bw_event('12', 50, 0))
+      tracker._circ_bw_event(bw_event('14', 10, 0))
+      self.assertEqual(Rate(15.0, 0.0), tracker.get_circuit_rate('12'))
+
+    # counts leave our totals as they age out of the window
+
+    with patch('time.time', Mock(return_value = 1010)):
+      self.assertEqual(Rate(5.0, 0.0), tracker.get_circuit_rate('12'))
+
+    with patch('time.time', Mock(return_value = 1015)):
+      self.assertEqual(None, tracker.get_circuit_rate('12'))
+      self.assertEqual([], tracker.get_top_talkers(5))
+      self.assertEqual({}, tracker._totals)
+
+  @patch('nyx.tracker.tor_controller')
+  def test_unsupported_events(self, tor_controller_mock):
+    tor_controller_mock().add_event_listener.side_effect = stem.ProtocolError('Unrecognized event')
+    tracker = ThroughputTracker()
+    self.assertEqual([], tracker.get_top_talkers(5))